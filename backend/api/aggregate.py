@@ -0,0 +1,146 @@
+import numpy as np
+
+
+# Chart aggregates computed over whole stored columns. Every result is sized
+# by its bin/point count, not by the dataset, so a chart of millions of rows
+# is a few KB of JSON. Missing values are dropped and reported as "nulls".
+BOX_WHISKER = 1.5
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=float)
+    return values[np.isfinite(values)]
+
+
+def _bounds(values):
+    if not len(values):
+        return 0.0, 1.0
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+def histogram(columns, column, bins):
+    raw = np.asarray(columns.numeric[column])
+    values = _finite(raw)
+    counts, edges = np.histogram(values, bins=bins, range=_bounds(values))
+    return {
+        'edges': edges.tolist(),
+        'counts': counts.tolist(),
+        'nulls': int(len(raw) - len(values)),
+    }
+
+
+def _bin_index(values, low, high, bins):
+    # Same bins as np.histogram: equal widths, the last one closed on the right
+    index = ((values - low) * (bins / (high - low))).astype(np.int64)
+    return np.clip(index, 0, bins - 1)
+
+
+def density(columns, x_column, y_column, bins):
+    x = np.asarray(columns.numeric[x_column], dtype=float)
+    y = np.asarray(columns.numeric[y_column], dtype=float)
+    present = np.isfinite(x) & np.isfinite(y)
+    x, y = x[present], y[present]
+    (x_low, x_high), (y_low, y_high) = _bounds(x), _bounds(y)
+    # One bincount over the flattened cell index instead of np.histogram2d
+    cells = _bin_index(x, x_low, x_high, bins) * bins + _bin_index(y, y_low, y_high, bins)
+    counts = np.bincount(cells, minlength=bins * bins).reshape(bins, bins)
+    # counts[i][j]: rows with x in bin i and y in bin j
+    return {
+        'x': x_column,
+        'y': y_column,
+        'x_edges': np.linspace(x_low, x_high, bins + 1).tolist(),
+        'y_edges': np.linspace(y_low, y_high, bins + 1).tolist(),
+        'counts': counts.tolist(),
+        'nulls': int(len(present) - present.sum()),
+    }
+
+
+def _quantile(ordered, q):
+    # Linear-interpolated quantile of an already sorted array (numpy's default method)
+    position = q * (len(ordered) - 1)
+    low = int(np.floor(position))
+    high = min(low + 1, len(ordered) - 1)
+    return float(ordered[low] + (ordered[high] - ordered[low]) * (position - low))
+
+
+def _box(ordered):
+    if not len(ordered):
+        return None
+    q1, median, q3 = (_quantile(ordered, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    # Whiskers reach the most extreme values within 1.5 IQR of the box
+    low = ordered[np.searchsorted(ordered, q1 - BOX_WHISKER * iqr, side='left')]
+    high = ordered[np.searchsorted(ordered, q3 + BOX_WHISKER * iqr, side='right') - 1]
+    outliers = np.count_nonzero(ordered < low) + np.count_nonzero(ordered > high)
+    return {
+        'count': int(len(ordered)),
+        'min': float(ordered[0]),
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'max': float(ordered[-1]),
+        'whisker_low': float(low),
+        'whisker_high': float(high),
+        'outliers': int(outliers),
+    }
+
+
+def boxplot(columns, column):
+    # Per-Type box statistics: group rows with one stable sort of the integer
+    # type codes, then sort each group's values on their own.
+    values = np.asarray(columns.numeric[column], dtype=float)
+    codes = np.asarray(columns.type_codes)
+    present = np.isfinite(values) & (codes >= 0)
+    values, codes = values[present], codes[present]
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(columns.type_categories) + 1))
+    boxes = {}
+    for code, label in enumerate(columns.type_categories):
+        group = np.sort(values[order[bounds[code]:bounds[code + 1]]])
+        box = _box(group)
+        if box is not None:
+            boxes[label] = box
+    return boxes
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and, from
+    # each of threshold - 2 equal buckets in between, the point forming the
+    # largest triangle with the previously kept point and the next bucket's mean.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    # Mean of every bucket, with the last point as the "next bucket" of the final one
+    sums_x = np.add.reduceat(x[:n - 1], edges[:-1])
+    sums_y = np.add.reduceat(y[:n - 1], edges[:-1])
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    mean_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[a] - mean_x[i]) * (by - y[a]) - (x[a] - bx) * (mean_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def series(columns, column, points):
+    # Column values against row position, downsampled to at most `points`
+    y = np.asarray(columns.numeric[column], dtype=float)
+    x = np.flatnonzero(np.isfinite(y))
+    y = y[x]
+    keep = lttb(x.astype(float), y, points)
+    return {
+        'x': x[keep].tolist(),
+        'y': y[keep].tolist(),
+        'count': int(len(x)),
+    }
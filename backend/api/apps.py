@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+
+    def ready(self):
+        if settings.UPLOAD_WORKERS > 0:
+            from .jobs import recover_on_first_request
+            request_started.connect(recover_on_first_request, dispatch_uid='api.recover_jobs')
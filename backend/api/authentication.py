@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from .models import AppUser
+
+# API tokens are the user id signed with the SECRET_KEY and a timestamp
+# ("<user id>:<timestamp>:<signature>"), so checking one needs no database
+# access; they expire after AUTH_TOKEN_MAX_AGE seconds.
+TOKEN_SALT = 'api.token'
+
+
+def issue_token(user):
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.id))
+
+
+def read_token(token):
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.AUTH_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed("Token expired")
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed("Invalid token")
+
+
+class UserCache:
+    # Resolved users by id, least recently used evicted first. Entries expire
+    # after `ttl` seconds so changes made by other processes are picked up;
+    # saves and deletes in this process invalidate immediately.
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(str(instance.pk))
+
+
+def get_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = AppUser.objects.get(id=user_id)
+        except AppUser.DoesNotExist:
+            raise exceptions.AuthenticationFailed("Invalid user")
+        user_cache.set(user_id, user)
+    return user
+
+
+class TokenAuthentication(BaseAuthentication):
+    # "Authorization: Bearer <token>"; multipart uploads may send the token
+    # as a "token" form field instead.
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = request.headers.get('Authorization', '').split()
+        if auth and auth[0] == self.keyword:
+            if len(auth) != 2:
+                raise exceptions.AuthenticationFailed("Invalid token header")
+            token = auth[1]
+        elif request.content_type.startswith('multipart/form-data'):
+            token = request.data.get('token')
+        else:
+            token = None
+        if not token:
+            return None
+        return get_user(read_token(token)), token
+
+    def authenticate_header(self, request):
+        return self.keyword
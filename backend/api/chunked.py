@@ -0,0 +1,153 @@
+import hashlib
+import math
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+
+# Resumable uploads: a session preallocates the file under
+# UPLOAD_PARTIAL_ROOT, each chunk is written at its own offset and checked
+# against the SHA-256 the client sent with it, and finalizing checks that
+# every chunk arrived (and the whole-file SHA-256, when one was declared)
+# before the file is handed to the normal upload job. Chunks can arrive in
+# any order and in parallel; a chunk that failed can simply be sent again.
+
+
+class ChunkError(Exception):
+    pass
+
+
+def partial_root():
+    return Path(settings.UPLOAD_PARTIAL_ROOT)
+
+
+def chunk_count(session):
+    return math.ceil(session.size / session.chunk_size)
+
+
+def chunk_length(session, index):
+    return min(session.chunk_size, session.size - index * session.chunk_size)
+
+
+def create_session(user, filename, size, chunk_size=None, digest=''):
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    if not 0 < size <= settings.UPLOAD_MAX_BYTES:
+        raise ChunkError(f"size must be between 1 and {settings.UPLOAD_MAX_BYTES} bytes")
+    if not min(settings.UPLOAD_CHUNK_MIN, size) <= chunk_size <= settings.UPLOAD_CHUNK_MAX:
+        raise ChunkError(f"chunk_size must be between {settings.UPLOAD_CHUNK_MIN} and {settings.UPLOAD_CHUNK_MAX}")
+    if digest and (len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest.lower())):
+        raise ChunkError("sha256 must be 64 hex digits")
+    active = timezone.now() - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    if UploadSession.objects.filter(user=user, updated_at__gte=active).count() >= settings.UPLOAD_SESSIONS_PER_USER:
+        raise ChunkError(f"At most {settings.UPLOAD_SESSIONS_PER_USER} uploads can be in progress; "
+                         "finish or delete one first")
+
+    session_id = str(uuid.uuid4())
+    root = partial_root()
+    root.mkdir(parents=True, exist_ok=True)
+    file_path = root / f"{session_id}.part"
+    # Sparse on most filesystems; chunks fill it in at their offsets
+    try:
+        with open(file_path, 'wb') as f:
+            f.truncate(size)
+    except OSError as e:
+        file_path.unlink(missing_ok=True)
+        raise ChunkError(f"Cannot store a file of {size} bytes: {e.strerror}")
+    return UploadSession.objects.create(
+        id=session_id,
+        user=user,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        chunk_size=chunk_size,
+        content_hash=digest.lower(),
+        file_path=str(file_path),
+    )
+
+
+def received(session):
+    return sorted(session.chunks.values_list('index', flat=True))
+
+
+def write_chunk(session, index, stream, checksum):
+    if not 0 <= index < chunk_count(session):
+        raise ChunkError(f"Chunk index must be between 0 and {chunk_count(session) - 1}")
+    if not checksum:
+        raise ChunkError("X-Chunk-SHA256 header is required")
+
+    # Forget the chunk first: if this write fails half way, it has to be sent
+    # again. A failed write also forgets a copy of the same chunk that another
+    # request recorded meanwhile, since it may have overwritten its bytes.
+    chunk = UploadChunk.objects.filter(session=session, index=index)
+    chunk.delete()
+    expected = chunk_length(session, index)
+    sha256 = hashlib.sha256()
+    length = 0
+    try:
+        with open(session.file_path, 'r+b') as f:
+            f.seek(index * session.chunk_size)
+            while stream is not None:
+                block = stream.read(min(settings.INGEST_COPY_BLOCK_SIZE, expected + 1 - length))
+                if not block:
+                    break
+                length += len(block)
+                if length > expected:
+                    raise ChunkError(f"Chunk {index} must be {expected} bytes")
+                sha256.update(block)
+                f.write(block)
+        if length != expected:
+            raise ChunkError(f"Chunk {index} must be {expected} bytes, got {length}")
+        digest = sha256.hexdigest()
+        if checksum.lower() != digest:
+            raise ChunkError(f"Chunk {index} checksum mismatch (got {digest})")
+    except BaseException:
+        chunk.delete()
+        raise
+
+    # The same chunk may be sent twice at once (a retry racing the original):
+    # whichever finishes last records it, without tripping the unique constraint
+    try:
+        with transaction.atomic():
+            UploadChunk.objects.create(session=session, index=index, size=length, sha256=digest)
+    except IntegrityError:
+        chunk.update(size=length, sha256=digest)
+    # updated_at keeps an active session from expiring
+    UploadSession.objects.filter(id=session.id).update(updated_at=timezone.now())
+
+
+class AssembledFile(File):
+    # The completed part file, passed to jobs.create_job like an upload
+    # Django spooled to disk: it is moved into place, not copied.
+    def __init__(self, session, digest):
+        super().__init__(open(session.file_path, 'rb'), name=session.filename)
+        self.size = session.size
+        self.content_hash = digest
+        self.path = session.file_path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def assemble(session):
+    missing = chunk_count(session) - session.chunks.count()
+    if missing:
+        raise ChunkError(f"{missing} chunk(s) missing")
+    sha256 = hashlib.sha256()
+    with open(session.file_path, 'rb') as f:
+        for block in iter(lambda: f.read(settings.INGEST_COPY_BLOCK_SIZE), b''):
+            sha256.update(block)
+    digest = sha256.hexdigest()
+    if session.content_hash and digest != session.content_hash:
+        raise ChunkError(f"File checksum mismatch (got {digest})")
+    return AssembledFile(session, digest)
+
+
+def discard(session):
+    session.delete()
+    Path(session.file_path).unlink(missing_ok=True)
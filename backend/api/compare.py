@@ -0,0 +1,92 @@
+import numpy as np
+
+from .storage import NUMERIC_COLUMNS, open_dataset
+from .summary import SummaryAccumulator
+
+
+# Comparison of several datasets from their stored partial aggregates: the
+# merged statistics are the exact Chan merge of the per-dataset moments, so
+# no rows are read however many datasets are compared.
+STAT_KEYS = ('count', 'nulls', 'mean', 'std', 'min', 'max')
+
+
+def dataset_accumulator(dataset):
+    # Datasets from before aggregates were stored get them computed once from their rows
+    if dataset.aggregates is None:
+        table = open_dataset(dataset)
+        block = np.empty((len(table), len(NUMERIC_COLUMNS)), order='F')
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            block[:, i] = table.numeric[col]
+        acc = SummaryAccumulator()
+        acc.update_block(block, np.array(table.types(), dtype=object))
+        dataset.aggregates = acc.to_state()
+        dataset.save(update_fields=['aggregates'])
+    return SummaryAccumulator.from_state(dataset.aggregates)
+
+
+def _shares(acc):
+    total = acc.rows or 1
+    return {label: n / total for label, n in acc.type_distribution().items()}
+
+
+def _describe(acc):
+    stats = acc.column_stats()
+    return {
+        'count': acc.rows,
+        'stats': {col: {k: stats[col][k] for k in STAT_KEYS} for col in NUMERIC_COLUMNS},
+        'type_distribution': acc.type_distribution(),
+    }
+
+
+def _delta(value, reference):
+    if value is None or reference is None:
+        return None
+    return value - reference
+
+
+def _deltas(acc, reference):
+    stats, ref_stats = acc.column_stats(), reference.column_stats()
+    deltas = {}
+    for col in NUMERIC_COLUMNS:
+        mean, ref_mean = stats[col]['mean'], ref_stats[col]['mean']
+        deltas[col] = {
+            'mean': _delta(mean, ref_mean),
+            'mean_pct': _delta(mean, ref_mean) / abs(ref_mean) * 100 if mean is not None and ref_mean else None,
+            'std': _delta(stats[col]['std'], ref_stats[col]['std']),
+            'min': _delta(stats[col]['min'], ref_stats[col]['min']),
+            'max': _delta(stats[col]['max'], ref_stats[col]['max']),
+        }
+    shares, ref_shares = _shares(acc), _shares(reference)
+    # Change in each type's share of rows, in percentage points
+    deltas['type_share'] = {
+        label: (shares.get(label, 0.0) - ref_shares.get(label, 0.0)) * 100
+        for label in {**ref_shares, **shares}
+    }
+    return deltas
+
+
+def compare(datasets, baseline=None):
+    # datasets: Dataset rows in the order to report them. Deltas are against
+    # the merged statistics, or against the dataset with id `baseline`.
+    accumulators = [dataset_accumulator(d) for d in datasets]
+    merged = SummaryAccumulator.from_state(accumulators[0].to_state())
+    for acc in accumulators[1:]:
+        merged.merge(acc)
+    reference = merged
+    if baseline is not None:
+        reference = accumulators[[str(d.id) for d in datasets].index(str(baseline))]
+
+    return {
+        'baseline': str(baseline) if baseline is not None else 'merged',
+        'merged': _describe(merged),
+        'datasets': [
+            {
+                'id': str(d.id),
+                'filename': d.filename,
+                'uploaded_at': d.uploaded_at.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                **_describe(acc),
+                'delta': _deltas(acc, reference),
+            }
+            for d, acc in zip(datasets, accumulators)
+        ],
+    }
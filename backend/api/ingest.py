@@ -0,0 +1,429 @@
+import contextlib
+import csv
+import gzip
+import io
+import logging
+import os
+import re
+import shutil
+import time
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+
+from . import metrics
+from .metrics import span
+from .storage import NUMERIC_COLUMNS, REQUIRED_COLUMNS, ColumnarWriter, build_indexes
+from .summary import SummaryAccumulator
+
+logger = logging.getLogger(__name__)
+
+# Declared dtypes of the parsed columns: numerics parse straight to the
+# float64 the column store keeps, Type to a categorical of its few labels.
+# Any other column in the export is never parsed.
+CSV_DTYPES = {
+    'Equipment Name': object,
+    'Type': 'category',
+    **{col: 'float64' for col in NUMERIC_COLUMNS},
+}
+
+
+class IngestError(Exception):
+    pass
+
+
+class TypedParseError(Exception):
+    # A value in a numeric column is not a number: parse again without the
+    # declared float dtype so such values become missing, as they always have
+    pass
+
+
+class TeeReader:
+    # File-like wrapper handed to the parser: counts what it has consumed
+    # and, when a sink is given, writes every block straight through to it.
+    closed = False
+
+    def __init__(self, source, sink=None):
+        self.source = source
+        self.sink = sink
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        block = self.source.read(size)
+        if block:
+            if self.sink is not None:
+                self.sink.write(block)
+            self.bytes_read += len(block)
+        return block
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.source.readline()
+        if not line:
+            raise StopIteration
+        if self.sink is not None:
+            self.sink.write(line)
+        self.bytes_read += len(line)
+        return line
+
+
+class IngestResult:
+    def __init__(self, summary, aggregates, preview, row_count, bytes_read, schema):
+        self.summary = summary
+        self.aggregates = aggregates
+        self.preview = preview
+        self.row_count = row_count
+        self.bytes_read = bytes_read
+        self.schema = schema
+
+
+def raw_header(file_obj, compression=None):
+    file_obj.seek(0)
+    if compression:
+        first_line = open_decompressed(file_obj, compression).readline()
+    else:
+        first_line = file_obj.readline()
+    file_obj.seek(0)
+    if isinstance(first_line, bytes):
+        try:
+            first_line = first_line.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise IngestError("File is not UTF-8 encoded text")
+    return next(csv.reader(io.StringIO(first_line)), [])
+
+
+def validate_header(columns):
+    if not all(col in columns for col in REQUIRED_COLUMNS):
+        raise IngestError("File must contain columns: " + ", ".join(REQUIRED_COLUMNS))
+
+
+def required_fields(header):
+    # Raw header name of each required column (first occurrence), as the
+    # parsers see them before stripping
+    fields = {}
+    for name in header:
+        if name.strip() in REQUIRED_COLUMNS:
+            fields.setdefault(name.strip(), name)
+    return fields
+
+
+def csv_engine():
+    engine = settings.INGEST_CSV_ENGINE
+    if engine == 'pyarrow':
+        try:
+            import pyarrow.csv  # noqa: F401
+        except ImportError:
+            logger.warning("INGEST_CSV_ENGINE=pyarrow but pyarrow is not installed; using the C parser")
+            return 'c'
+    return engine
+
+
+def malformed(message):
+    # pandas: "Error tokenizing data. C error: Expected 5 fields in line 7, saw 6"
+    # pyarrow: "CSV parse error: Row #7: Expected 5 columns, got 6: ..."
+    match = re.search(r'Expected (\d+) fields in line (\d+), saw (\d+)', message)
+    if match:
+        expected, line, saw = match.groups()
+        return IngestError(f"Malformed CSV at line {line}: expected {expected} fields, found {saw}")
+    match = re.search(r'Row #(\d+): (.*)', message)
+    if match:
+        return IngestError(f"Malformed CSV at line {match.group(1)}: {match.group(2)[:200]}")
+    return IngestError(f"Malformed CSV: {message.strip()[:200]}")
+
+
+def _pandas_chunks(source, fields, chunk_rows, typed):
+    # With usecols the C parser ignores surplus fields at the end of a row
+    # instead of rejecting the row (pyarrow rejects it); a row the tokenizer
+    # cannot split is still reported with its line number.
+    dtypes = {raw: CSV_DTYPES[col] for col, raw in fields.items()
+              if typed or col not in NUMERIC_COLUMNS}
+    try:
+        yield from pd.read_csv(source, usecols=list(fields.values()), dtype=dtypes,
+                               chunksize=chunk_rows, engine='c')
+    except pd.errors.ParserError as e:
+        raise malformed(str(e))
+    except UnicodeDecodeError:
+        raise
+    except ValueError as e:
+        if typed:
+            raise TypedParseError(str(e))
+        raise
+
+
+def _arrow_chunks(source, fields, chunk_rows, typed):
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    types = {
+        fields['Equipment Name']: pa.string(),
+        fields['Type']: pa.dictionary(pa.int32(), pa.string()),
+    }
+    if typed:
+        types.update({fields[col]: pa.float64() for col in NUMERIC_COLUMNS})
+    try:
+        reader = pa_csv.open_csv(
+            source,
+            # Blocks of roughly chunk_rows rows of a typical export
+            read_options=pa_csv.ReadOptions(block_size=max(chunk_rows * 64, 1 << 20)),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=list(fields.values()), column_types=types, strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+    except pa.ArrowInvalid as e:
+        message = str(e)
+        if 'UTF8' in message:
+            raise IngestError("File is not UTF-8 encoded text")
+        if typed and 'conversion error' in message:
+            raise TypedParseError(message)
+        raise malformed(message)
+
+
+def read_chunks(source, fields, chunk_rows, typed=True):
+    # DataFrames of the required columns only, named as in REQUIRED_COLUMNS
+    parse = _arrow_chunks if csv_engine() == 'pyarrow' else _pandas_chunks
+    names = {raw: col for col, raw in fields.items()}
+    try:
+        for chunk in parse(source, fields, chunk_rows, typed):
+            yield chunk.rename(columns=names)
+    except UnicodeDecodeError:
+        raise IngestError("File is not UTF-8 encoded text")
+
+
+# Compressed CSV: 'gzip' (.csv.gz) or 'zstd' (.csv.zst, needs zstandard)
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise IngestError("zstd compressed files need zstandard installed on the server")
+    return zstandard
+
+
+def open_decompressed(file_obj, compression):
+    # Binary stream of the decompressed bytes, read as the parser pulls them
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file_obj, mode='rb')
+    reader = _zstandard().ZstdDecompressor().stream_reader(file_obj, read_across_frames=True, closefd=False)
+    return io.BufferedReader(reader, settings.INGEST_COPY_BLOCK_SIZE)
+
+
+def open_compressed(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'wb')
+    return _zstandard().ZstdCompressor().stream_writer(open(path, 'wb'))
+
+
+def compress_file(path, compression):
+    # Compressed copy of path next to it (path + .gz / .zst); returns its path
+    target = Path(f"{path}{COMPRESSION_SUFFIXES[compression]}")
+    try:
+        with open(path, 'rb') as src, open_compressed(target, compression) as dst:
+            shutil.copyfileobj(src, dst, settings.INGEST_COPY_BLOCK_SIZE)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return target
+
+
+# Upload formats by file extension. A format reads the raw header names and
+# yields DataFrames of the required columns chunk by chunk; validation,
+# summary and the column store are the same for all of them. Streaming
+# formats are read front to back (so they can be copied while parsed); the
+# others seek around the file.
+class CsvFormat:
+    name = 'CSV'
+    streaming = True
+
+    def __init__(self, compression=None):
+        # Compressed files are decompressed as they are parsed, never on disk
+        self.compression = compression
+
+    def header(self, file_obj):
+        try:
+            return raw_header(file_obj, self.compression)
+        except (OSError, EOFError) as e:
+            raise IngestError(f"File is not valid {self.compression} data ({e})")
+
+    def chunks(self, source, fields, chunk_rows, typed=True):
+        if self.compression is None:
+            yield from read_chunks(source, fields, chunk_rows, typed)
+            return
+        stream = open_decompressed(source, self.compression)
+        try:
+            yield from read_chunks(stream, fields, chunk_rows, typed)
+        except (OSError, EOFError) as e:
+            raise IngestError(f"File is not valid {self.compression} data ({e})")
+
+
+class XlsxFormat:
+    # openpyxl's read-only mode parses the sheet XML as it is iterated, so
+    # the workbook is never loaded whole. The first worksheet is read.
+    name = 'Excel'
+    streaming = False
+
+    def open(self, file_obj):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise IngestError("Excel uploads need openpyxl installed on the server")
+        file_obj.seek(0)
+        try:
+            return load_workbook(file_obj, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, KeyError, OSError, ValueError):
+            raise IngestError("File is not a readable .xlsx workbook")
+
+    def header(self, file_obj):
+        workbook = self.open(file_obj)
+        try:
+            first = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return ['' if value is None else str(value) for value in first]
+
+    def chunks(self, source, fields, chunk_rows, typed=True):
+        workbook = self.open(source)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = ['' if value is None else str(value) for value in next(rows, ())]
+            positions = [header.index(fields[col]) for col in REQUIRED_COLUMNS]
+            batch = []
+            for row in rows:
+                values = tuple(row[i] if i < len(row) else None for i in positions)
+                # Formatted but empty rows at the end of a sheet
+                if all(value is None for value in values):
+                    continue
+                batch.append(values)
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame.from_records(batch, columns=REQUIRED_COLUMNS)
+                    batch = []
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=REQUIRED_COLUMNS)
+        finally:
+            workbook.close()
+
+
+class ParquetFormat:
+    # Only the row groups' chunks of the required columns are read, as Arrow
+    # buffers, and converted batch by batch without any text parsing.
+    name = 'Parquet'
+    streaming = False
+
+    def open(self, file_obj):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise IngestError("Parquet uploads need pyarrow installed on the server")
+        file_obj.seek(0)
+        try:
+            return pq.ParquetFile(file_obj)
+        except (pa.ArrowException, OSError):
+            raise IngestError("File is not a readable Parquet file")
+
+    def header(self, file_obj):
+        return self.open(file_obj).schema_arrow.names
+
+    def chunks(self, source, fields, chunk_rows, typed=True):
+        for batch in self.open(source).iter_batches(batch_size=chunk_rows, columns=list(fields.values())):
+            yield batch.to_pandas()
+
+
+FORMATS = {
+    '.csv': CsvFormat(),
+    '.csv.gz': CsvFormat('gzip'),
+    '.csv.zst': CsvFormat('zstd'),
+    '.xlsx': XlsxFormat(),
+    '.parquet': ParquetFormat(),
+}
+
+
+def upload_format(filename):
+    name = filename.lower()
+    return next((fmt for ext, fmt in FORMATS.items() if name.endswith(ext)), None)
+
+
+def ingest_file(file_obj, dest_path, storage_dir, file_format=None, chunk_rows=None, progress=None):
+    # Stream an uploaded file into dest_path while parsing it chunk by chunk.
+    # Each chunk is appended to the columnar store in storage_dir, so only the
+    # running summary and a short preview stay in memory and peak usage does
+    # not grow with the size of the upload. With dest_path=None the file is
+    # only parsed (it is already where it should be stored). progress, if
+    # given, is called with the number of bytes consumed after every chunk
+    # and once more when the indexes are built.
+    file_format = file_format or FORMATS['.csv']
+    chunk_rows = chunk_rows or settings.INGEST_CHUNK_ROWS
+
+    header = file_format.header(file_obj)
+    validate_header([col.strip() for col in header])
+    fields = required_fields(header)
+
+    start = time.perf_counter()
+    try:
+        result = _ingest(file_obj, dest_path, storage_dir, file_format, fields, chunk_rows, progress, typed=True)
+    except TypedParseError as e:
+        # Rare: start over and parse the numeric columns leniently
+        logger.info("Non-numeric values in a numeric column (%s); parsing %s again", e, storage_dir)
+        file_obj.seek(0)
+        result = _ingest(file_obj, dest_path, storage_dir, file_format, fields, chunk_rows, progress, typed=False)
+    metrics.INGEST_BYTES.inc(result.bytes_read, file_format.name)
+    metrics.INGEST_ROWS.inc(result.row_count, file_format.name)
+    metrics.INGEST_SECONDS.inc(time.perf_counter() - start, file_format.name)
+    return result
+
+
+def _ingest(file_obj, dest_path, storage_dir, file_format, fields, chunk_rows, progress, typed):
+    summary = SummaryAccumulator()
+    preview = []
+    writer = ColumnarWriter(storage_dir)
+    try:
+        with contextlib.ExitStack() as stack:
+            sink = stack.enter_context(open(dest_path, 'wb')) if dest_path else None
+            if file_format.streaming:
+                source = TeeReader(file_obj, sink)
+                position = lambda: source.bytes_read  # noqa: E731
+            else:
+                # Seekable formats are stored first and read from the original
+                file_obj.seek(0)
+                if sink is not None:
+                    shutil.copyfileobj(file_obj, sink, settings.INGEST_COPY_BLOCK_SIZE)
+                    file_obj.seek(0)
+                source, position = file_obj, file_obj.tell
+            chunks = file_format.chunks(source, fields, chunk_rows, typed)
+            while True:
+                with span('ingest.parse'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                with span('ingest.summary'):
+                    summary.update(chunk)
+                with span('ingest.store'):
+                    writer.append(chunk)
+                if len(preview) < settings.INGEST_PREVIEW_ROWS:
+                    preview.extend(chunk.head(settings.INGEST_PREVIEW_ROWS - len(preview)).to_dict('records'))
+                if progress:
+                    progress(position())
+            # Flush anything the parser did not need to pull (e.g. trailing newline)
+            while file_format.streaming and sink is not None:
+                block = file_obj.read(settings.INGEST_COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                sink.write(block)
+                source.bytes_read += len(block)
+            bytes_read = source.bytes_read if file_format.streaming else file_obj.seek(0, os.SEEK_END)
+    except Exception:
+        writer.abort()
+        raise
+
+    with span('ingest.index'):
+        schema = build_indexes(storage_dir, writer.close())
+    if progress:
+        progress(bytes_read)
+    return IngestResult(summary.as_summary(), summary.to_state(), preview, summary.rows, bytes_read, schema)
@@ -0,0 +1,286 @@
+import hashlib
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.core.files.move import file_move_safe
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .ingest import FORMATS, IngestError, compress_file, ingest_file, upload_format
+from .metrics import span
+from .models import Dataset, UploadJob
+from .reports import delete_reports, get_report
+from .retention import enforce_quota
+from .storage import dataset_storage_dir, delete_storage
+
+logger = logging.getLogger(__name__)
+
+# Upload processing queue. Jobs live in the upload_jobs table; the in-process
+# pool (UPLOAD_WORKERS threads) picks them up right after the request commits,
+# and `manage.py process_upload_jobs` can drain the same table from a separate
+# process. A job is claimed with a conditional UPDATE, so each one runs once.
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix='upload')
+        return _executor
+
+
+def stage_upload(file_obj, dest_path):
+    # Large uploads are already on disk in Django's temporary file: move it
+    # into place instead of copying. Small in-memory uploads are written out.
+    if hasattr(file_obj, 'temporary_file_path'):
+        file_move_safe(file_obj.temporary_file_path(), str(dest_path), allow_overwrite=False)
+        return
+    with open(dest_path, 'wb') as f:
+        for chunk in file_obj.chunks():
+            f.write(chunk)
+
+
+def content_hash(file_obj):
+    # Set by the hashing upload handlers while the request body streamed in;
+    # hashed here only for files that arrived some other way.
+    digest = getattr(file_obj, 'content_hash', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        sha256.update(chunk)
+    file_obj.seek(0)
+    return sha256.hexdigest()
+
+
+def create_job(user, file_obj, digest=''):
+    job_id = str(uuid.uuid4())
+    upload_dir = Path(settings.MEDIA_ROOT)
+    upload_dir.mkdir(exist_ok=True)
+    file_path = upload_dir / f"{job_id}_{file_obj.name}"
+    stage_upload(file_obj, file_path)
+    return UploadJob.objects.create(
+        id=job_id,
+        user=user,
+        filename=file_obj.name,
+        file_path=str(file_path),
+        size=file_obj.size or 0,
+        content_hash=digest,
+    )
+
+
+def reuse_duplicate(user, file_obj, digest):
+    # A file the user already uploaded needs no parsing: the new dataset row
+    # shares the stored file, columns and summary of the earlier one, and the
+    # job is created already finished. Returns None when there is nothing to
+    # reuse (or the earlier dataset was deleted meanwhile).
+    source = (Dataset.objects.filter(user=user, content_hash=digest).exclude(storage_path='')
+              .defer('data').order_by('-uploaded_at').first())
+    if source is None:
+        return None
+    dataset = Dataset.objects.create(
+        id=str(uuid.uuid4()),
+        filename=file_obj.name,
+        summary=source.summary,
+        aggregates=source.aggregates,
+        file_path=source.file_path,
+        storage_path=source.storage_path,
+        schema=source.schema,
+        content_hash=digest,
+        user=user,
+    )
+    # Retention deletes rows before checking for other references to their
+    # files, so once this row exists the files are safe as long as the source
+    # row is still there too. If it is not, its files may be going away.
+    if not Dataset.objects.filter(id=source.id).exists():
+        dataset.delete()
+        return None
+    job = UploadJob.objects.create(
+        user=user,
+        filename=file_obj.name,
+        file_path=source.file_path,
+        size=file_obj.size or 0,
+        content_hash=digest,
+        status=UploadJob.SUCCEEDED,
+        progress=1.0,
+        dataset=dataset,
+    )
+    try:
+        enforce_quota(user)
+    except Exception:
+        logger.exception("Retention cleanup after upload job %s failed", job.id)
+    return job
+
+
+def submit(job):
+    if settings.UPLOAD_WORKERS > 0:
+        transaction.on_commit(lambda: executor().submit(run_job, job.id))
+
+
+class ClaimLost(Exception):
+    # The job was requeued (see requeue_stale) while this worker was still on
+    # it and may be running elsewhere now
+    pass
+
+
+def claim(job_id):
+    # The job, RUNNING under a fresh claim token, or None if it was not queued
+    token = uuid.uuid4().hex
+    claimed = UploadJob.objects.filter(id=job_id, status=UploadJob.QUEUED).update(
+        status=UploadJob.RUNNING, claim=token, updated_at=timezone.now()
+    )
+    if claimed != 1:
+        return None
+    return UploadJob.objects.select_related('user').filter(id=job_id, claim=token).first()
+
+
+def claim_next():
+    queued = UploadJob.objects.filter(status=UploadJob.QUEUED).order_by('created_at')
+    for job_id in queued.values_list('id', flat=True)[:20]:
+        job = claim(job_id)
+        if job is not None:
+            return job
+    return None
+
+
+def requeue_stale(older_than):
+    # updated_at is refreshed through every phase of process_job, so it doubles as a heartbeat
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return UploadJob.objects.filter(status=UploadJob.RUNNING, updated_at__lt=cutoff).update(status=UploadJob.QUEUED)
+
+
+def recover_jobs():
+    # Queue what an earlier server process left behind: stale running jobs
+    # go back to the queue and every queued job to this process's pool
+    requeued = requeue_stale(settings.UPLOAD_STALE_SECONDS)
+    if requeued:
+        logger.info("Requeued %d stale upload job(s)", requeued)
+    queued = list(UploadJob.objects.filter(status=UploadJob.QUEUED)
+                  .order_by('created_at').values_list('id', flat=True))
+    for job_id in queued:
+        executor().submit(run_job, job_id)
+    return len(queued)
+
+
+def recover_on_first_request(**kwargs):
+    # request_started receiver (see ApiConfig.ready). Running the DB queries
+    # on the first request rather than at import keeps them out of migrate
+    # and other management commands.
+    global _recovered
+    with _executor_lock:
+        if _recovered:
+            return
+        _recovered = True
+    request_started.disconnect(dispatch_uid='api.recover_jobs')
+    if settings.UPLOAD_WORKERS > 0:
+        try:
+            recover_jobs()
+        except Exception:
+            logger.exception("Could not recover queued upload jobs")
+
+
+def run_job(job_id):
+    try:
+        job = claim(job_id)
+        if job is not None:
+            process_job(job)
+    except Exception:
+        logger.exception("Upload job %s crashed", job_id)
+    finally:
+        # Pool threads keep their own DB connections; do not leak them between jobs
+        connections.close_all()
+
+
+def _update(job, **fields):
+    # Only while this worker holds the claim; raises ClaimLost otherwise.
+    # QuerySet.update() skips auto_now, so updated_at is refreshed explicitly.
+    updated = UploadJob.objects.filter(id=job.id, status=UploadJob.RUNNING, claim=job.claim).update(
+        updated_at=timezone.now(), **fields
+    )
+    if not updated:
+        raise ClaimLost(job.id)
+
+
+def process_job(job):
+    dataset_id = str(uuid.uuid4())
+    storage_dir = dataset_storage_dir(dataset_id)
+    total = max(job.size, 1)
+
+    def progress(bytes_read):
+        _update(job, progress=min(bytes_read / total, 0.99))
+
+    # Every phase starts with a heartbeat (_update), so a job is only seen as
+    # stale when a single phase outlasts UPLOAD_STALE_SECONDS
+    file_path = job.file_path
+    try:
+        with open(job.file_path, 'rb') as f:
+            result = ingest_file(f, None, storage_dir, upload_format(job.file_path), progress=progress)
+
+        # Plain CSV originals can be kept compressed; the copy is made before
+        # any dataset row points at the file
+        if settings.UPLOAD_COMPRESSION and upload_format(job.file_path) is FORMATS['.csv']:
+            _update(job)
+            with span('compress'):
+                file_path = str(compress_file(job.file_path, settings.UPLOAD_COMPRESSION))
+
+        dataset = Dataset(
+            id=dataset_id,
+            filename=job.filename,
+            summary=result.summary,
+            aggregates=result.aggregates,
+            file_path=file_path,
+            storage_path=str(storage_dir),
+            schema=result.schema,
+            content_hash=job.content_hash,
+            user=job.user,
+        )
+        if settings.REPORT_EAGER:
+            _update(job)
+            try:
+                get_report(dataset)
+            except Exception:
+                logger.exception("Report generation for upload job %s failed", job.id)
+
+        # The dataset row and the job's success commit together, and only
+        # while the claim holds: a requeued job cannot produce two datasets
+        _update(job)
+        with span('db.save'), transaction.atomic():
+            dataset.save(force_insert=True)
+            _update(job, status=UploadJob.SUCCEEDED, progress=1.0, dataset=dataset, file_path=file_path)
+    except ClaimLost:
+        # The staged and compressed files are the new worker's now
+        logger.warning("Upload job %s was requeued while running; left to its new worker", job.id)
+        delete_storage(storage_dir)
+        delete_reports(dataset_id)
+        return
+    except Exception as e:
+        if isinstance(e, IngestError):
+            error = str(e)
+        else:
+            logger.exception("Upload job %s failed", job.id)
+            error = f"Error processing file: {str(e)}"
+        delete_storage(storage_dir)
+        delete_reports(dataset_id)
+        try:
+            _update(job, status=UploadJob.FAILED, error=error)
+        except ClaimLost:
+            return
+        Path(job.file_path).unlink(missing_ok=True)
+        Path(file_path).unlink(missing_ok=True)
+        return
+
+    if file_path != job.file_path:
+        Path(job.file_path).unlink(missing_ok=True)
+    try:
+        enforce_quota(job.user)
+    except Exception:
+        logger.exception("Retention cleanup after upload job %s failed", job.id)
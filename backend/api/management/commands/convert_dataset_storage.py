@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from api.models import Dataset
+from api.ingest import ingest_file, upload_format
+from api.storage import REQUIRED_COLUMNS, ColumnarWriter, build_indexes, dataset_storage_dir, delete_storage
+from api.summary import SummaryAccumulator
+
+
+class Command(BaseCommand):
+    help = ("Move rows of datasets still stored in Dataset.data into columnar storage "
+            "and build the sorted indexes of stored datasets that lack them")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List datasets that would be converted")
+
+    def handle(self, *args, **options):
+        pending = Dataset.objects.filter(storage_path='')
+        converted = 0
+        for pk, file_path in pending.values_list('id', 'file_path').iterator():
+            if options['dry_run']:
+                self.stdout.write(f"would convert {pk}")
+                continue
+            dataset = Dataset.objects.get(pk=pk)
+            storage_dir = dataset_storage_dir(dataset.id)
+            try:
+                # Prefer the original upload: inline rows may have been truncated
+                source = Path(file_path)
+                if source.exists():
+                    with open(source, 'rb') as f:
+                        result = ingest_file(f, None, storage_dir, upload_format(source.name))
+                    schema, aggregates = result.schema, result.aggregates
+                else:
+                    writer = ColumnarWriter(storage_dir)
+                    summary = SummaryAccumulator()
+                    rows = pd.DataFrame.from_records(dataset.data or [], columns=REQUIRED_COLUMNS)
+                    writer.append(rows)
+                    summary.update(rows)
+                    schema, aggregates = build_indexes(storage_dir, writer.close()), summary.to_state()
+            except Exception as e:
+                delete_storage(storage_dir)
+                self.stderr.write(f"failed to convert {pk}: {e}")
+                continue
+
+            dataset.schema = schema
+            dataset.storage_path = str(storage_dir)
+            dataset.data = None
+            if dataset.aggregates is None:
+                dataset.aggregates = aggregates
+            dataset.save(update_fields=['schema', 'storage_path', 'data', 'aggregates'])
+            converted += 1
+            self.stdout.write(f"converted {pk} ({dataset.schema['row_count']} rows)")
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} dataset(s)"))
+
+        # Datasets stored before indexes existed; duplicates share a directory
+        unindexed = {}
+        for pk, storage_path, schema in Dataset.objects.exclude(storage_path='').values_list(
+                'id', 'storage_path', 'schema').iterator():
+            if schema and 'indexes' not in schema:
+                unindexed.setdefault(storage_path, (schema, []))[1].append(pk)
+        indexed = 0
+        for storage_path, (schema, ids) in unindexed.items():
+            if options['dry_run']:
+                self.stdout.write(f"would index {storage_path} ({len(ids)} dataset(s))")
+                continue
+            try:
+                schema = build_indexes(storage_path, schema)
+            except Exception as e:
+                self.stderr.write(f"failed to index {storage_path}: {e}")
+                continue
+            Dataset.objects.filter(id__in=ids).update(schema=schema)
+            indexed += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} dataset(s)"))
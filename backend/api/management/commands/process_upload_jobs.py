@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import claim_next, process_job, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Process queued upload jobs (an alternative or complement to the in-process worker pool)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls of an empty queue")
+        parser.add_argument('--requeue-stale', type=int, metavar='SECONDS',
+                            help="First requeue running jobs with no progress for this many seconds")
+
+    def handle(self, *args, **options):
+        if options['requeue_stale']:
+            count = requeue_stale(options['requeue_stale'])
+            self.stdout.write(f"Requeued {count} stale job(s)")
+
+        while True:
+            job = claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            self.stdout.write(f"Processing {job.id} ({job.filename})")
+            process_job(job)
+            job.refresh_from_db()
+            self.stdout.write(f"  {job.status}{': ' + job.error if job.error else ''}")
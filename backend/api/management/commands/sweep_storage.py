@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.retention import sweep
+
+
+class Command(BaseCommand):
+    help = ("Apply dataset quotas and remove orphaned uploads, column storage, stale reports and "
+            "abandoned chunked uploads (run periodically)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List orphaned paths without deleting anything")
+        parser.add_argument('--grace', type=int, metavar='SECONDS',
+                            help="Ignore files changed more recently than this (default: SWEEP_GRACE_SECONDS)")
+
+    def handle(self, *args, **options):
+        result = sweep(grace=options['grace'], dry_run=options['dry_run'])
+        verb = "would remove" if options['dry_run'] else "removed"
+        for path in result.paths:
+            self.stdout.write(f"{verb} {path}")
+        if not options['dry_run']:
+            self.stdout.write(f"Deleted {result.datasets} dataset(s) over quota, {result.jobs} finished job(s) "
+                              f"and {result.sessions} expired chunked upload(s)")
+        self.stdout.write(f"{len(result.paths)} orphaned path(s), {result.bytes / 1e6:.1f} MB")
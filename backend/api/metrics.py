@@ -0,0 +1,123 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+# In-process metrics in the Prometheus text format, served by /api/metrics/.
+# Each server process keeps its own; scrape every process (or run one) to
+# see them all. `manage.py process_upload_jobs` workers are not scraped.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "Request latency by view", ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', "Database queries per request by view", ('view', 'method'), COUNT_BUCKETS)
+SPAN_SECONDS = Histogram(
+    'span_duration_seconds', "Time spent in instrumented code paths (parse, summary, save, report...)", ('span',))
+INGEST_BYTES = Counter('ingest_bytes_total', "Bytes of uploaded files parsed", ('format',))
+INGEST_ROWS = Counter('ingest_rows_total', "Rows parsed from uploaded files", ('format',))
+INGEST_SECONDS = Counter(
+    'ingest_seconds_total', "Time spent parsing uploads; rows/s = rate(ingest_rows_total) / rate(this)", ('format',))
+
+REGISTRY = [REQUEST_SECONDS, REQUEST_QUERIES, SPAN_SECONDS, INGEST_BYTES, INGEST_ROWS, INGEST_SECONDS]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+# Spans of the request being handled (name -> total seconds), reported back
+# in its Server-Timing header; None outside requests (e.g. upload workers)
+request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+@contextlib.contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, name)
+        spans = request_spans.get()
+        if spans is not None:
+            spans[name] = spans.get(name, 0.0) + elapsed
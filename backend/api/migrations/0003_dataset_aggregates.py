@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dataset_columnar_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='aggregates',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
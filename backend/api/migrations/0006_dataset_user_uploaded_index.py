@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_content_hash'),
+    ]
+
+    operations = [
+        # The migration state still knows datasets.user_id as a plain column
+        # (see 0001_initial); it is the same column as Dataset.user.
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['user_id', '-uploaded_at'], name='datasets_user_uploaded_idx'),
+        ),
+    ]
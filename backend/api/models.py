@@ -17,6 +17,10 @@ class AppUser(models.Model):
     def check_password(self, password):
         return check_password(password, self.password)
 
+    @property
+    def is_authenticated(self):
+        return True
+
     class Meta:
         db_table = 'users'
 
@@ -26,9 +30,72 @@ class Dataset(models.Model):
     filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(default=datetime.now)
     summary = models.JSONField()
+    aggregates = models.JSONField(null=True, blank=True)  # Mergeable partial statistics, see api.summary
     user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name='datasets')
     file_path = models.CharField(max_length=500)
-    data = models.JSONField()  # Store the actual data
+    data = models.JSONField(null=True, blank=True)  # Legacy inline rows, see storage_path
+    storage_path = models.CharField(max_length=500, blank=True, default='')  # Columnar row storage
+    schema = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 of the upload
+
+    class Meta:
+        db_table = 'datasets'
+        # History listing: a user's datasets, newest first
+        indexes = [models.Index(fields=['user', '-uploaded_at'], name='datasets_user_uploaded_idx')]
+
+class UploadJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.CharField(max_length=36, primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name='upload_jobs')
+    filename = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)  # Staged upload, kept as the dataset's original file
+    size = models.BigIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.FloatField(default=0)
+    error = models.TextField(blank=True, default='')
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    claim = models.CharField(max_length=32, blank=True, default='')  # Token of the worker running the job
+    created_at = models.DateTimeField(default=datetime.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'upload_jobs'
+
+
+class UploadSession(models.Model):
+    # A chunked upload in progress: chunks are written into file_path at
+    # their offsets (in any order, possibly in parallel) until all are there
+    id = models.CharField(max_length=36, primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    content_hash = models.CharField(max_length=64, blank=True, default='')  # Declared SHA-256 of the whole file
+    file_path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(default=datetime.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'upload_sessions'
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    size = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
 
     class Meta:
-        db_table = 'datasets'
\ No newline at end of file
+        db_table = 'upload_chunks'
+        constraints = [models.UniqueConstraint(fields=['session', 'index'], name='upload_chunks_session_index_uniq')]
@@ -0,0 +1,276 @@
+import re
+
+import numpy as np
+
+from .storage import COLUMN_FILES, NUMERIC_COLUMNS, REQUIRED_COLUMNS
+
+
+# Filter expressions over the dataset columns, evaluated as boolean masks:
+#
+#   Type = 'Pump' AND Pressure > 6 AND Temperature BETWEEN 100 AND 130
+#   Type IN ('Pump', 'Valve') OR NOT (Flowrate >= 150)
+#   "Equipment Name" = 'Pump-1'   Flowrate IS NULL
+#
+# Columns are the five known ones, matched case-insensitively by name or file
+# stem (equipment_name); names with spaces go in double quotes. Strings are
+# single-quoted (bare words are accepted as values too). A comparison with a
+# missing value is false, and so are !=, NOT IN and NOT BETWEEN: they only
+# match rows that have a value. NOT in front of a condition or parentheses
+# does include them (NOT (Pressure > 6) is true where Pressure is missing).
+class QueryError(Exception):
+    pass
+
+
+KEYWORDS = {'AND', 'OR', 'NOT', 'IN', 'BETWEEN', 'IS', 'NULL'}
+OPERATORS = {'=': '==', '==': '==', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    | '(?P<string>(?:[^']|'')*)'
+    | "(?P<quoted>[^"]*)"
+    | (?P<op><=|>=|<>|!=|==|[=<>(),])
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+COLUMN_NAMES = {name.lower(): name for name in REQUIRED_COLUMNS}
+COLUMN_NAMES.update({stem: name for name, stem in COLUMN_FILES.items()})
+MAX_LENGTH = 2000
+MAX_DEPTH = 50  # Nested NOTs and parentheses, well within Python's recursion limit
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise QueryError(f"Unexpected character at position {pos}: {text[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        value, start = match.group(kind), match.start(kind)
+        if kind == 'word' and value.upper() in KEYWORDS:
+            kind, value = 'keyword', value.upper()
+        elif kind == 'string':
+            value = value.replace("''", "'")
+        tokens.append((kind, value, start))
+        pos = match.end()
+    return tokens
+
+
+class Parser:
+    def __init__(self, text):
+        if len(text) > MAX_LENGTH:
+            raise QueryError(f"Expression longer than {MAX_LENGTH} characters")
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.depth = 0
+
+    def peek(self, kind=None, value=None):
+        if self.pos >= len(self.tokens):
+            return None
+        token = self.tokens[self.pos]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            return None
+        return token
+
+    def take(self, kind=None, value=None):
+        token = self.peek(kind, value)
+        if token is None:
+            found = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+            expected = value or kind
+            if found is None:
+                raise QueryError(f"Expected {expected} at end of expression")
+            raise QueryError(f"Expected {expected} at position {found[2]}, found {found[1]!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty expression")
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            raise QueryError(f"Unexpected {token[1]!r} at position {token[2]}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek('keyword', 'OR'):
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek('keyword', 'AND'):
+            self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek('keyword', 'NOT'):
+            self.take()
+            self.nest()
+            node = ('not', self.parse_not())
+            self.depth -= 1
+            return node
+        if self.peek('op', '('):
+            self.take()
+            self.nest()
+            node = self.parse_or()
+            self.take('op', ')')
+            self.depth -= 1
+            return node
+        return self.parse_condition()
+
+    def nest(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise QueryError(f"Expression nested deeper than {MAX_DEPTH} levels at position {self.tokens[self.pos - 1][2]}")
+
+    def parse_column(self):
+        token = self.peek('word') or self.peek('quoted')
+        if token is None:
+            found = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+            raise QueryError(f"Expected a column at position {found[2]}" if found else "Expected a column")
+        self.take()
+        column = COLUMN_NAMES.get(token[1].strip().lower())
+        if column is None:
+            raise QueryError(f"Unknown column {token[1]!r}. Available: {', '.join(REQUIRED_COLUMNS)}")
+        return column
+
+    def parse_value(self, column):
+        token = self.peek('number') or self.peek('string') or self.peek('word') or self.peek('quoted')
+        if token is None:
+            found = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+            raise QueryError(f"Expected a value at position {found[2]}" if found else "Expected a value")
+        self.take()
+        if column in NUMERIC_COLUMNS:
+            if token[0] != 'number':
+                raise QueryError(f"{column} is numeric; {token[1]!r} is not a number")
+            return float(token[1])
+        return token[1]
+
+    def parse_condition(self):
+        column = self.parse_column()
+        if self.peek('keyword', 'IS'):
+            self.take()
+            negate = bool(self.peek('keyword', 'NOT'))
+            if negate:
+                self.take()
+            self.take('keyword', 'NULL')
+            return ('null', column, negate)
+        negate = bool(self.peek('keyword', 'NOT'))
+        if negate:
+            self.take()
+        if self.peek('keyword', 'IN'):
+            self.take()
+            self.take('op', '(')
+            values = [self.parse_value(column)]
+            while self.peek('op', ','):
+                self.take()
+                values.append(self.parse_value(column))
+            self.take('op', ')')
+            return ('in', column, values, negate)
+        if self.peek('keyword', 'BETWEEN'):
+            self.take()
+            if column not in NUMERIC_COLUMNS:
+                raise QueryError(f"{column} does not support BETWEEN")
+            low = self.parse_value(column)
+            self.take('keyword', 'AND')
+            high = self.parse_value(column)
+            return ('between', column, low, high, negate)
+        if negate:
+            raise QueryError(f"Expected IN or BETWEEN after NOT at position {self.tokens[self.pos - 1][2]}")
+        op = self.take('op')
+        if op[1] not in OPERATORS:
+            raise QueryError(f"Expected a comparison at position {op[2]}, found {op[1]!r}")
+        op = OPERATORS[op[1]]
+        if column not in NUMERIC_COLUMNS and op not in ('==', '!='):
+            raise QueryError(f"{column} only supports =, != and IN")
+        return ('cmp', column, op, self.parse_value(column))
+
+
+def parse(text):
+    return Parser(text).parse()
+
+
+def _present(columns, column):
+    if column in NUMERIC_COLUMNS:
+        return ~np.isnan(np.asarray(columns.numeric[column]))
+    if column == 'Type':
+        return np.asarray(columns.type_codes) >= 0
+    return np.ones(len(columns), dtype=bool)
+
+
+def _name_equals(names, value):
+    # Byte-wise equality against the offsets/bytes layout, without decoding every name
+    target = np.frombuffer(value.encode('utf-8'), dtype=np.uint8)
+    offsets = np.asarray(names.offsets)
+    starts = offsets[:-1]
+    mask = np.diff(offsets) == len(target)
+    if len(target) and mask.any():
+        # Check one byte position at a time over the rows whose length matches,
+        # dropping mismatches as we go, so memory stays O(candidates)
+        rows = np.flatnonzero(mask)
+        data = np.asarray(names.data)
+        for i, byte in enumerate(target):
+            rows = rows[data[starts[rows] + i] == byte]
+            if not len(rows):
+                break
+        mask[:] = False
+        mask[rows] = True
+    return mask
+
+
+def _equals_any(columns, column, values):
+    if column in NUMERIC_COLUMNS:
+        return np.isin(np.asarray(columns.numeric[column]), np.asarray(values, dtype=float))
+    if column == 'Type':
+        lookup = {label: code for code, label in enumerate(columns.type_categories)}
+        wanted = [lookup[v] for v in values if v in lookup]
+        return np.isin(np.asarray(columns.type_codes), np.asarray(wanted, dtype=np.int64))
+    mask = np.zeros(len(columns), dtype=bool)
+    for value in dict.fromkeys(values):
+        mask |= _name_equals(columns.names, value)
+    return mask
+
+
+def evaluate(node, columns):
+    kind = node[0]
+    if kind == 'and':
+        return evaluate(node[1], columns) & evaluate(node[2], columns)
+    if kind == 'or':
+        return evaluate(node[1], columns) | evaluate(node[2], columns)
+    if kind == 'not':
+        return ~evaluate(node[1], columns)
+    if kind == 'null':
+        present = _present(columns, node[1])
+        return present if node[2] else ~present
+    if kind == 'in':
+        mask = _equals_any(columns, node[1], node[2])
+        return (~mask & _present(columns, node[1])) if node[3] else mask
+    if kind == 'between':
+        values = np.asarray(columns.numeric[node[1]])
+        with np.errstate(invalid='ignore'):
+            mask = (values >= node[2]) & (values <= node[3])
+        return (~mask & _present(columns, node[1])) if node[4] else mask
+
+    _, column, op, value = node
+    if op in ('==', '!='):
+        mask = _equals_any(columns, column, [value])
+        return (~mask & _present(columns, column)) if op == '!=' else mask
+    values = np.asarray(columns.numeric[column])
+    with np.errstate(invalid='ignore'):
+        if op == '<':
+            return values < value
+        if op == '<=':
+            return values <= value
+        if op == '>':
+            return values > value
+        return values >= value
+
+
+def filter_index(columns, text):
+    # Row positions matching the expression, in dataset order
+    return np.flatnonzero(evaluate(parse(text), columns))
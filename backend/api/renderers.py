@@ -0,0 +1,69 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.mediatypes import _MediaType, media_type_matches
+
+from .storage import RowBlock
+
+
+class MessagePackRenderer(BaseRenderer):
+    # Accept: application/msgpack (needs msgpack installed on the server).
+    # The same document as the JSON responses, except that rows are sent as
+    # columns of typed arrays instead of one object per row:
+    #   {"length": n, "columns": {
+    #       "Equipment Name": [str, ...],
+    #       "Type": {"codes": <bin int32 LE, -1 = missing>, "categories": [str, ...]},
+    #       "Flowrate": <bin float64 LE, NaN = missing>, ...}}
+    # so clients can view the numeric columns as arrays without decoding
+    # a value at a time.
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encode, use_bin_type=True)
+
+    def encode(self, obj):
+        if isinstance(obj, RowBlock):
+            columns = {}
+            for col, values in obj.arrays().items():
+                if col == 'Type':
+                    codes, categories = values
+                    columns[col] = {'codes': codes.tobytes(), 'categories': categories}
+                elif isinstance(values, list):
+                    columns[col] = values
+                else:
+                    columns[col] = values.tobytes()
+            return {'length': len(obj), 'columns': columns}
+        # Dates, decimals, numpy scalars etc. as in JSON
+        return JSONEncoder().default(obj)
+
+
+class QualityContentNegotiation(DefaultContentNegotiation):
+    # DRF ranks Accept entries by how specific they are and ignores q, so
+    # "application/msgpack, application/json;q=0.9" would get JSON. Only the
+    # entries of the highest q that some renderer can serve are considered
+    # (none left: 406).
+    def select_renderer(self, request, renderers, format_suffix=None):
+        self.renderers = renderers
+        return super().select_renderer(request, renderers, format_suffix)
+
+    def get_accept_list(self, request):
+        accepts = super().get_accept_list(request)
+        by_quality = {}
+        for media_type in accepts:
+            try:
+                quality = float(_MediaType(media_type).params.get('q', 1))
+            except ValueError:
+                quality = 1.0
+            by_quality.setdefault(quality, []).append(media_type)
+        for quality in sorted(by_quality, reverse=True):
+            group = by_quality[quality]
+            if quality > 0 and any(media_type_matches(r.media_type, m) for r in self.renderers for m in group):
+                return group
+        return []
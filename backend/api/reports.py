@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .metrics import span
+
+
+# Rendered reports are cached as report_<dataset id>_<key>.pdf. The key hashes
+# everything the document is built from, so a report is only rendered once per
+# dataset summary and the key doubles as the HTTP ETag. Bump REPORT_VERSION
+# when the layout changes to invalidate every cached file.
+REPORT_VERSION = 1
+
+
+def report_root():
+    return Path(settings.REPORT_CACHE_ROOT)
+
+
+def report_key(dataset):
+    payload = json.dumps(
+        {'version': REPORT_VERSION, 'filename': dataset.filename, 'summary': dataset.summary},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def report_path(dataset, key=None):
+    return report_root() / f"report_{dataset.id}_{key or report_key(dataset)}.pdf"
+
+
+def delete_reports(dataset_id, keep=None):
+    for path in report_root().glob(f"report_{dataset_id}_*.pdf"):
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+
+def format_value(value):
+    # Summary statistics are None for a column without any numeric value
+    return 'N/A' if value is None else f"{value:.2f}"
+
+
+def build_report(dataset, pdf_path):
+    doc = SimpleDocTemplate(str(pdf_path), pagesize=letter)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    title = Paragraph(f"<b>Equipment Report: {dataset.filename}</b>", styles['Title'])
+    elements.append(title)
+    elements.append(Spacer(1, 12))
+
+    # Summary
+    summary_text = f"""<b>Summary Statistics</b><br/>
+    Equipment Count: {dataset.summary['equipment_count']}<br/>
+    Average Flowrate: {format_value(dataset.summary['avg_flowrate'])}<br/>
+    Average Pressure: {format_value(dataset.summary['avg_pressure'])}<br/>
+    Average Temperature: {format_value(dataset.summary['avg_temperature'])}<br/>
+    """
+    elements.append(Paragraph(summary_text, styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Type Distribution Table
+    type_dist = dataset.summary['type_distribution']
+    table_data = [['Equipment Type', 'Count']]
+    for eq_type, count in type_dist.items():
+        table_data.append([str(eq_type), str(count)])
+
+    table = Table(table_data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(table)
+
+    doc.build(elements)
+
+
+def get_report(dataset):
+    # Path of the cached report for the dataset's current summary, rendering it
+    # on a miss. The PDF is built in a temporary file and renamed into place so
+    # concurrent requests never serve a half-written document.
+    key = report_key(dataset)
+    pdf_path = report_path(dataset, key)
+    if pdf_path.exists():
+        return pdf_path, key
+
+    root = report_root()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".report_{dataset.id}_", suffix='.pdf', dir=root)
+    os.close(fd)
+    try:
+        with span('report.build'):
+            build_report(dataset, tmp_path)
+        os.replace(tmp_path, pdf_path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    delete_reports(dataset.id, keep=pdf_path)
+    return pdf_path, key
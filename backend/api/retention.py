@@ -0,0 +1,137 @@
+import logging
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import span
+from .models import AppUser, Dataset, UploadJob, UploadSession
+from .reports import delete_reports, report_key, report_root
+from .storage import delete_storage, storage_root
+
+logger = logging.getLogger(__name__)
+
+# Rows go first, files only once the delete has committed: a crash in
+# between can leave unreferenced files behind, which the sweeper collects,
+# but never a dataset pointing at files that are gone.
+
+
+def remove_files(doomed):
+    # Datasets deduplicated by content share files; those are reference
+    # counted by the remaining rows and only removed with the last of them.
+    for dataset_id, file_path, storage_path in doomed:
+        if file_path and not Dataset.objects.filter(file_path=file_path).exists():
+            Path(file_path).unlink(missing_ok=True)
+        if storage_path and not Dataset.objects.filter(storage_path=storage_path).exists():
+            delete_storage(storage_path)
+        delete_reports(dataset_id)
+
+
+@span('retention.quota')
+def enforce_quota(user, quota=None):
+    # Keep the user's `quota` most recent datasets and delete the rest with
+    # one bulk delete. Only ids that were already beyond the quota when read
+    # are deleted, so concurrent uploads of the same user can at worst each
+    # delete the same old rows again, never a dataset that is still in the
+    # newest `quota`. No lock is held while reading, which matters on SQLite,
+    # where a read-then-write transaction fails instead of waiting.
+    quota = settings.DATASET_QUOTA if quota is None else quota
+    datasets = Dataset.objects.filter(user=user).order_by('-uploaded_at', '-id')
+    doomed = list(datasets.values_list('id', 'file_path', 'storage_path')[quota:])
+    if doomed:
+        Dataset.objects.filter(id__in=[d[0] for d in doomed]).delete()
+        transaction.on_commit(lambda: remove_files(doomed))
+    return len(doomed)
+
+
+def _age(path):
+    # Seconds since anything in `path` (a file or a directory of files) last changed
+    path = Path(path)
+    mtime = path.stat().st_mtime
+    if path.is_dir():
+        mtime = max([mtime] + [f.stat().st_mtime for f in path.iterdir()])
+    return time.time() - mtime
+
+
+def _remove(path):
+    if path.is_dir():
+        delete_storage(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class SweepResult:
+    def __init__(self):
+        self.datasets = 0
+        self.jobs = 0
+        self.sessions = 0
+        self.paths = []
+        self.bytes = 0
+
+
+def _size(path):
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+    return path.stat().st_size
+
+
+def find_orphans(grace):
+    # Files under MEDIA_ROOT that no dataset or pending job refers to, plus
+    # cached reports that no longer match their dataset. Anything touched in
+    # the last `grace` seconds is left alone: it may belong to an upload that
+    # is still being processed.
+    media_root = Path(settings.MEDIA_ROOT)
+    referenced = set()
+    report_keys = {}
+    for dataset in Dataset.objects.only('id', 'filename', 'summary', 'file_path', 'storage_path'):
+        referenced.update(str(Path(p)) for p in (dataset.file_path, dataset.storage_path) if p)
+        report_keys[str(dataset.id)] = report_key(dataset)
+    pending = UploadJob.objects.filter(status__in=[UploadJob.QUEUED, UploadJob.RUNNING])
+    referenced.update(str(Path(p)) for p in pending.values_list('file_path', flat=True))
+    referenced.update(str(Path(p)) for p in UploadSession.objects.values_list('file_path', flat=True))
+    partial_root = Path(settings.UPLOAD_PARTIAL_ROOT)
+    managed = {str(storage_root()), str(report_root()), str(partial_root)}
+
+    candidates = []
+    if media_root.exists():
+        candidates += [p for p in media_root.iterdir() if str(p) not in managed | referenced]
+    if storage_root().exists():
+        candidates += [p for p in storage_root().iterdir() if str(p) not in referenced]
+    if partial_root.exists():
+        candidates += [p for p in partial_root.iterdir() if str(p) not in referenced]
+    if report_root().exists():
+        for path in report_root().iterdir():
+            # report_<dataset id>_<key>.pdf is stale once the dataset is gone or its summary changed
+            dataset_id, _, key = path.stem.partition('report_')[2].rpartition('_')
+            if report_keys.get(dataset_id) != key:
+                candidates.append(path)
+    return [p for p in candidates if _age(p) >= grace]
+
+
+@span('retention.sweep')
+def sweep(grace=None, dry_run=False):
+    # Periodic cleanup: re-apply quotas, drop finished job records past
+    # UPLOAD_JOB_RETENTION_DAYS and chunked uploads idle for longer than
+    # UPLOAD_SESSION_TTL_HOURS, then remove orphaned files (including the
+    # partial files of those uploads)
+    grace = settings.SWEEP_GRACE_SECONDS if grace is None else grace
+    result = SweepResult()
+    if not dry_run:
+        for user in AppUser.objects.filter(datasets__isnull=False).distinct():
+            result.datasets += enforce_quota(user)
+        cutoff = timezone.now() - timedelta(days=settings.UPLOAD_JOB_RETENTION_DAYS)
+        finished = UploadJob.objects.filter(status__in=[UploadJob.SUCCEEDED, UploadJob.FAILED], updated_at__lt=cutoff)
+        result.jobs, _ = finished.delete()
+        expired = timezone.now() - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+        result.sessions = UploadSession.objects.filter(updated_at__lt=expired).delete()[1].get('api.UploadSession', 0)
+
+    result.paths = find_orphans(grace)
+    result.bytes = sum(_size(p) for p in result.paths)
+    if not dry_run:
+        for path in result.paths:
+            _remove(path)
+        logger.info("Swept %d orphaned path(s), %d bytes", len(result.paths), result.bytes)
+    return result
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import AppUser, Dataset
+from .models import AppUser, Dataset, UploadJob
+from .storage import open_dataset
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -47,9 +48,35 @@ class DatasetSerializer(serializers.ModelSerializer):
         fields = ['id', 'filename', 'uploaded_at', 'summary']
 
 
+class DatasetListSerializer(serializers.ModelSerializer):
+    uploaded_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S.%fZ')
+
+    class Meta:
+        model = Dataset
+        fields = ['id', 'filename', 'uploaded_at']
+
+
 class DatasetDetailSerializer(serializers.ModelSerializer):
     uploaded_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S.%fZ')
+    data = serializers.SerializerMethodField()
 
     class Meta:
         model = Dataset
-        fields = ['id', 'filename', 'uploaded_at', 'summary', 'data']
\ No newline at end of file
+        fields = ['id', 'filename', 'uploaded_at', 'summary', 'data']
+
+    def get_data(self, obj):
+        return open_dataset(obj).block()
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    created_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S.%fZ')
+    updated_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S.%fZ')
+    dataset_id = serializers.CharField(allow_null=True)
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadJob
+        fields = ['id', 'filename', 'status', 'progress', 'error', 'dataset_id', 'summary', 'created_at', 'updated_at']
+
+    def get_summary(self, obj):
+        return obj.dataset.summary if obj.dataset_id and obj.dataset else None
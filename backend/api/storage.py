@@ -0,0 +1,465 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Columnar layout of a stored dataset, one raw little-endian file per column:
+#   Flowrate/Pressure/Temperature  float64 values (NaN for missing)
+#   Type                           int32 codes into schema["categories"] (-1 for missing)
+#   Equipment Name                 int64 offsets (row_count + 1) + concatenated UTF-8 bytes
+# The schema stored on the Dataset row describes the files, so readers can
+# memory-map them without parsing anything. Once a dataset is complete,
+# build_indexes() adds sorted indexes next to the columns (schema "indexes"):
+#   flowrate.order etc.  row positions in ascending value order, ties in row
+#                        order, missing values last ("valid" = non-missing count)
+#   type.rows            row positions grouped by type code, each group in row
+#                        order; rows of code c are bounds[c]:bounds[c + 1]
+SCHEMA_VERSION = 1
+FLOAT_DTYPE = '<f8'
+CODE_DTYPE = '<i4'
+OFFSET_DTYPE = '<i8'
+
+COLUMN_FILES = {
+    'Equipment Name': 'equipment_name',
+    'Type': 'type',
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
+
+
+def storage_root():
+    return Path(settings.DATASET_STORAGE_ROOT)
+
+
+def dataset_storage_dir(dataset_id):
+    return storage_root() / str(dataset_id)
+
+
+def delete_storage(path):
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class ColumnarWriter:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.row_count = 0
+        self.categories = {}
+        self.name_bytes = 0
+        self._files = {}
+        for col in NUMERIC_COLUMNS:
+            self._files[col] = open(self._path(col, 'f8'), 'wb')
+        self._files['Type'] = open(self._path('Type', 'codes'), 'wb')
+        self._files['names'] = open(self._path('Equipment Name', 'data'), 'wb')
+        self._files['offsets'] = open(self._path('Equipment Name', 'offsets'), 'wb')
+        self._files['offsets'].write(np.zeros(1, dtype=OFFSET_DTYPE).tobytes())
+
+    def _path(self, column, kind):
+        return self.directory / f"{COLUMN_FILES[column]}.{kind}"
+
+    def append(self, df):
+        for col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=FLOAT_DTYPE, na_value=np.nan)
+            self._files[col].write(values.tobytes())
+
+        types = df['Type']
+        codes = np.full(len(df), -1, dtype=CODE_DTYPE)
+        present = types.notna().to_numpy()
+        if present.any():
+            labels, uniques = pd.factorize(types[present].astype(str))
+            lookup = np.array([self.categories.setdefault(u, len(self.categories)) for u in uniques],
+                              dtype=CODE_DTYPE)
+            codes[present] = lookup[labels]
+        self._files['Type'].write(codes.tobytes())
+
+        encoded = [s.encode('utf-8') for s in df['Equipment Name'].fillna('').astype(str)]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=OFFSET_DTYPE, count=len(encoded))
+        offsets = self.name_bytes + np.cumsum(lengths, dtype=OFFSET_DTYPE)
+        self._files['names'].write(b''.join(encoded))
+        self._files['offsets'].write(offsets.tobytes())
+        if len(offsets):
+            self.name_bytes = int(offsets[-1])
+
+        self.row_count += len(df)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        return self.schema()
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        delete_storage(self.directory)
+
+    def schema(self):
+        return {
+            'version': SCHEMA_VERSION,
+            'row_count': self.row_count,
+            'columns': {
+                **{col: {'kind': 'float', 'dtype': FLOAT_DTYPE, 'file': self._path(col, 'f8').name}
+                   for col in NUMERIC_COLUMNS},
+                'Type': {
+                    'kind': 'dictionary',
+                    'dtype': CODE_DTYPE,
+                    'file': self._path('Type', 'codes').name,
+                    'categories': list(self.categories),
+                },
+                'Equipment Name': {
+                    'kind': 'string',
+                    'file': self._path('Equipment Name', 'data').name,
+                    'offsets': self._path('Equipment Name', 'offsets').name,
+                },
+            },
+        }
+
+
+class StringColumn:
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [('' if pd.isna(v) else str(v)).encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=OFFSET_DTYPE)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def take(self, index):
+        if isinstance(index, slice) and index.step in (None, 1):
+            # Contiguous rows: copy their bytes once and split in Python
+            start, stop, _ = index.indices(len(self))
+            if stop <= start:
+                return []
+            bounds = np.asarray(self.offsets[start:stop + 1]) - self.offsets[start]
+            buf = bytes(self.data[self.offsets[start]:self.offsets[stop]])
+            bounds = bounds.tolist()
+            return [buf[a:b].decode('utf-8') for a, b in zip(bounds[:-1], bounds[1:])]
+        if isinstance(index, slice):
+            index = range(*index.indices(len(self)))
+        return [self.get(i) for i in index]
+
+
+class DatasetColumns:
+    def __init__(self, numeric, type_codes, type_categories, names, orders=None, type_index=None):
+        self.numeric = numeric
+        self.type_codes = type_codes
+        self.type_categories = list(type_categories)
+        self.names = names
+        # column -> (row positions in value order, non-missing count); see build_indexes()
+        self.orders = dict(orders or {})
+        # (row positions grouped by type code, per-code bounds)
+        self.type_index = type_index
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    @classmethod
+    def open(cls, directory, schema):
+        directory = Path(directory)
+        columns = schema['columns']
+        n = schema['row_count']
+
+        def mapped(filename, dtype, length):
+            if length == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(directory / filename, dtype=dtype, mode='r', shape=(length,))
+
+        numeric = {col: mapped(columns[col]['file'], columns[col]['dtype'], n) for col in NUMERIC_COLUMNS}
+        type_spec = columns['Type']
+        name_spec = columns['Equipment Name']
+        offsets = mapped(name_spec['offsets'], OFFSET_DTYPE, n + 1)
+        name_data = mapped(name_spec['file'], np.uint8, int(offsets[-1]) if n else 0)
+        indexes = schema.get('indexes') or {}
+        orders = {
+            col: (mapped(spec['file'], spec['dtype'], n), spec['valid'])
+            for col, spec in indexes.items() if col in NUMERIC_COLUMNS
+        }
+        type_index = None
+        if 'Type' in indexes:
+            spec = indexes['Type']
+            type_index = (mapped(spec['file'], spec['dtype'], spec['bounds'][-1]), spec['bounds'])
+        return cls(
+            numeric,
+            mapped(type_spec['file'], type_spec['dtype'], n),
+            type_spec['categories'],
+            StringColumn(offsets, name_data),
+            orders,
+            type_index,
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        df = pd.DataFrame.from_records(records or [], columns=REQUIRED_COLUMNS)
+        numeric = {
+            col: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=FLOAT_DTYPE, na_value=np.nan)
+            for col in NUMERIC_COLUMNS
+        }
+        codes, uniques = pd.factorize(df['Type'].where(df['Type'].isna(), df['Type'].astype(str)))
+        return cls(numeric, codes.astype(CODE_DTYPE), list(uniques), StringColumn.from_values(df['Equipment Name']))
+
+    def types(self, index=slice(None)):
+        codes = np.asarray(self.type_codes[index])
+        lookup = np.array(self.type_categories + [None], dtype=object)
+        return lookup[codes].tolist()
+
+    def values(self, column, index=slice(None)):
+        if column == 'Type':
+            return self.types(index)
+        if column == 'Equipment Name':
+            return self.names.take(index)
+        values = np.asarray(self.numeric[column][index], dtype=float)
+        return [None if v != v else v for v in values.tolist()]
+
+    def rows(self, index=slice(None), columns=None):
+        columns = columns or REQUIRED_COLUMNS
+        values = [self.values(col, index) for col in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def block(self, index=slice(None), columns=None):
+        return RowBlock(self, index, columns or REQUIRED_COLUMNS)
+
+    def order(self, column):
+        # (row positions by ascending value of a numeric column, non-missing
+        # count), from the stored index or sorted once for this instance
+        if column not in self.orders:
+            values = np.asarray(self.numeric[column])
+            self.orders[column] = (np.argsort(values, kind='stable'), int(len(values) - np.isnan(values).sum()))
+        return self.orders[column]
+
+    def type_rows(self, code):
+        # Row positions of type code `code`, in row order
+        if self.type_index is not None:
+            rows, bounds = self.type_index
+            return np.asarray(rows[bounds[code]:bounds[code + 1]])
+        return np.flatnonzero(np.asarray(self.type_codes) == code)
+
+
+class RowBlock:
+    # Rows of a dataset left in columnar form until the response is rendered.
+    # JSON gets row objects (DRF's encoder calls tolist()); binary renderers
+    # take the column arrays as they are (see api.renderers).
+    def __init__(self, table, index, columns):
+        self.table = table
+        self.index = index
+        self.columns = list(columns)
+
+    def __len__(self):
+        if isinstance(self.index, slice):
+            return len(range(*self.index.indices(len(self.table))))
+        return len(self.index)
+
+    def tolist(self):
+        return self.table.rows(self.index, self.columns)
+
+    def arrays(self):
+        # column -> float64 values (NaN for missing), (int32 codes, categories)
+        # for Type (-1 for missing), or a list of strings for Equipment Name
+        arrays = {}
+        for col in self.columns:
+            if col == 'Type':
+                codes = np.asarray(self.table.type_codes[self.index], dtype=CODE_DTYPE)
+                arrays[col] = (codes, self.table.type_categories)
+            elif col == 'Equipment Name':
+                arrays[col] = self.table.names.take(self.index)
+            else:
+                arrays[col] = np.asarray(self.table.numeric[col][self.index], dtype=FLOAT_DTYPE)
+        return arrays
+
+
+def open_dataset(dataset):
+    # Datasets uploaded before columnar storage still carry their rows in Dataset.data
+    if dataset.storage_path and dataset.schema:
+        return DatasetColumns.open(dataset.storage_path, dataset.schema)
+    return DatasetColumns.from_records(dataset.data)
+
+
+def index_dtype(row_count):
+    return '<i4' if row_count < 2 ** 31 else '<i8'
+
+
+def build_indexes(directory, schema):
+    # Write the sorted indexes of a complete dataset and return its schema with
+    # them added. Each numeric column is sorted once here so range and top-K
+    # lookups are a binary search plus the rows returned.
+    directory = Path(directory)
+    columns = DatasetColumns.open(directory, schema)
+    n = len(columns)
+    dtype = index_dtype(n)
+    indexes = {}
+    for col in NUMERIC_COLUMNS:
+        values = np.asarray(columns.numeric[col])
+        filename = f"{COLUMN_FILES[col]}.order"
+        np.argsort(values, kind='stable').astype(dtype).tofile(directory / filename)
+        indexes[col] = {'file': filename, 'dtype': dtype, 'valid': int(n - np.isnan(values).sum())}
+
+    codes = np.asarray(columns.type_codes)
+    counts = np.bincount(codes + 1, minlength=len(columns.type_categories) + 1)
+    filename = f"{COLUMN_FILES['Type']}.rows"
+    # Missing types (code -1) sort first and are left out
+    np.argsort(codes, kind='stable')[counts[0]:].astype(dtype).tofile(directory / filename)
+    bounds = np.concatenate([[0], np.cumsum(counts[1:])]).tolist()
+    indexes['Type'] = {'file': filename, 'dtype': dtype, 'bounds': bounds}
+    return {**schema, 'indexes': indexes}
+
+
+def storage_size(path):
+    path = Path(path)
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file()) if path.exists() else 0
+
+
+def sort_keys(columns, column):
+    # Numeric array whose ascending order is the row order for `column`; missing values sort last
+    if column == 'Type':
+        ranks = np.argsort(np.argsort(np.array(columns.type_categories, dtype=object)))
+        lookup = np.append(ranks, np.nan).astype(np.float64)
+        return lookup[np.asarray(columns.type_codes)]
+    if column == 'Equipment Name':
+        _, ranks = np.unique(np.array(columns.names.take(slice(None)), dtype=object), return_inverse=True)
+        return ranks.astype(np.int64)
+    return np.asarray(columns.numeric[column])
+
+
+def _search(order, keys, value, lo, hi, right=False):
+    # Binary search of `value` in keys[order[lo:hi]] (ascending) without gathering it
+    while lo < hi:
+        mid = (lo + hi) // 2
+        key = keys[order[mid]]
+        if key < value or (right and key == value):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def value_range(columns, column, low=None, high=None):
+    # Bounds [lo, hi) in columns.order(column) of the rows with low <= value <= high
+    order, valid = columns.order(column)
+    keys = columns.numeric[column]
+    lo = 0 if low is None else _search(order, keys, low, 0, valid)
+    hi = valid if high is None else _search(order, keys, high, lo, valid, right=True)
+    return lo, hi
+
+
+def ranked(columns, column, lo, hi, descending=False, stop=None):
+    # The first `stop` row positions of order[lo:hi] by ascending or descending
+    # value, ties in row order
+    order, _ = columns.order(column)
+    stop = hi - lo if stop is None else max(min(stop, hi - lo), 0)
+    if not descending:
+        return np.asarray(order[lo:lo + stop], dtype=np.int64)
+    if stop == 0:
+        return np.zeros(0, dtype=np.int64)
+    # The largest values are the tail of the run; only the tie group at the
+    # cut has to be trimmed, to its first rows
+    keys = columns.numeric[column]
+    cut = keys[order[hi - stop]]
+    above = _search(order, keys, cut, lo, hi, right=True)
+    tied = _search(order, keys, cut, lo, above)
+    part = np.concatenate([order[above:hi], order[tied:tied + stop - (hi - above)]]).astype(np.int64)
+    return part[np.argsort(-np.asarray(keys[part]), kind='stable')]
+
+
+def _walk(columns, column, lo, hi, type_code, descending, stop):
+    # The first `stop` rows of one type in order[lo:hi] by value, scanning the
+    # run from the wanted end in doubling blocks until enough have been seen
+    order, _ = columns.order(column)
+    keys = columns.numeric[column]
+    block, found = max(4 * stop, 1024), 0
+    start, end = (hi, hi) if descending else (lo, lo)
+    while found < stop and end - start < hi - lo:
+        if descending:
+            end, start = start, max(lo, start - block)
+            found += np.count_nonzero(np.asarray(columns.type_codes[order[start:end]]) == type_code)
+            end = hi
+        else:
+            start, end = end, min(hi, end + block)
+            found += np.count_nonzero(np.asarray(columns.type_codes[order[start:end]]) == type_code)
+            start = lo
+        block *= 2
+    if descending and start > lo:
+        # Rows tied with the lowest value scanned may sit just before it
+        start = _search(order, keys, keys[order[start]], lo, start)
+    candidates = np.asarray(order[start:end], dtype=np.int64)
+    matched = candidates[np.asarray(columns.type_codes[candidates]) == type_code]
+    if descending:
+        matched = matched[np.argsort(-np.asarray(keys[matched]), kind='stable')]
+    return matched[:stop]
+
+
+def range_index(columns, column, low=None, high=None, type_code=None, descending=False, stop=None):
+    # (match count, first `stop` row positions by value) of the rows with
+    # low <= column <= high, optionally only those of one type. Without a
+    # type this is two binary searches and the page. With one, a short value
+    # range is filtered by type; otherwise the type's rows give the count and
+    # the page comes from walking the value order from the wanted end.
+    lo, hi = value_range(columns, column, low, high)
+    if type_code is None:
+        return hi - lo, ranked(columns, column, lo, hi, descending, stop)
+
+    keys = columns.numeric[column]
+    rows = columns.type_rows(type_code)
+    if hi - lo <= len(rows):
+        order, _ = columns.order(column)
+        candidates = np.asarray(order[lo:hi], dtype=np.int64)
+        matched = candidates[np.asarray(columns.type_codes[candidates]) == type_code]
+        if descending:
+            matched = matched[np.argsort(-np.asarray(keys[matched]), kind='stable')]
+        return len(matched), matched[:stop]
+
+    values = np.asarray(keys[rows])
+    inside = ~np.isnan(values)
+    if low is not None:
+        inside &= values >= low
+    if high is not None:
+        inside &= values <= high
+    if stop is not None:
+        return int(np.count_nonzero(inside)), _walk(columns, column, lo, hi, type_code, descending, stop)
+    matched = rows[inside].astype(np.int64)
+    matched = matched[np.argsort(-values[inside] if descending else values[inside], kind='stable')]
+    return len(matched), matched
+
+
+def ordered_index(columns, column, descending=False, stop=None):
+    # Row positions [0:stop] of the dataset stably sorted by `column`. A stored
+    # index answers this directly; otherwise when only the first page is needed
+    # the leading `stop` rows are selected in O(N) before sorting just those.
+    if column in columns.orders:
+        order, valid = columns.order(column)
+        stop = len(columns) if stop is None else stop
+        head = ranked(columns, column, 0, valid, descending, stop)
+        if stop > valid:
+            head = np.concatenate([head, np.asarray(order[valid:stop], dtype=np.int64)])
+        return head
+
+    keys = sort_keys(columns, column)
+    if descending:
+        keys = -keys
+    if stop is None or stop >= len(keys):
+        return np.argsort(keys, kind='stable')[:stop]
+    if stop <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    kth = keys[np.argpartition(keys, stop - 1)[stop - 1]]
+    if kth != kth:
+        missing = np.isnan(keys)
+        below, tied = np.flatnonzero(~missing), np.flatnonzero(missing)
+    else:
+        below, tied = np.flatnonzero(keys < kth), np.flatnonzero(keys == kth)
+    part = np.concatenate([below, tied[:stop - len(below)]])
+    return part[np.argsort(keys[part], kind='stable')]
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .storage import NUMERIC_COLUMNS
+
+
+# Summary engine. Statistics are kept as mergeable partial aggregates
+# (count / sum / M2 / min / max per column, overall and per Type) so chunks of
+# one upload, partitions of a dataset or several datasets combine exactly.
+# Percentiles come from a bounded uniform sample that merges the same way;
+# they are exact while a column has no more values than the sample holds.
+PERCENTILES = (5, 50, 95)
+SUMMARY_KEYS = {
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
+
+
+def _finite(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class Moments:
+    # count/sum/M2/min/max for one or more columns held as arrays
+    def __init__(self, width):
+        self.count = np.zeros(width, dtype=np.int64)
+        self.nulls = np.zeros(width, dtype=np.int64)
+        self.sum = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    @classmethod
+    def from_groups(cls, block, codes, n_groups):
+        # Per-group statistics of block rows keyed by integer codes, via bincount
+        width = block.shape[1]
+        missing = np.isnan(block)
+        has_missing = missing.any()
+        filled = np.where(missing, 0.0, block) if has_missing else block
+        rows = np.bincount(codes, minlength=n_groups)
+        count = np.zeros((n_groups, width), dtype=np.int64)
+        total = np.zeros((n_groups, width))
+        m2 = np.zeros((n_groups, width))
+        for j in range(width):
+            if has_missing:
+                count[:, j] = rows - np.bincount(codes, weights=missing[:, j], minlength=n_groups).astype(np.int64)
+            else:
+                count[:, j] = rows
+            total[:, j] = np.bincount(codes, weights=filled[:, j], minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        for j in range(width):
+            deviation = filled[:, j] - mean[codes, j]
+            if has_missing:
+                deviation[missing[:, j]] = 0.0
+            m2[:, j] = np.bincount(codes, weights=deviation * deviation, minlength=n_groups)
+        # Min/max per group: order rows by group once, then reduce each run
+        order = np.argsort(codes, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(rows)[:-1]])
+        low = np.full((n_groups, width), np.inf)
+        high = np.full((n_groups, width), -np.inf)
+        nonempty = rows > 0
+        if nonempty.any():
+            ordered = block[order]
+            if has_missing:
+                ordered_missing = missing[order]
+                low[nonempty] = np.minimum.reduceat(np.where(ordered_missing, np.inf, ordered),
+                                                    starts[nonempty], axis=0)
+                high[nonempty] = np.maximum.reduceat(np.where(ordered_missing, -np.inf, ordered),
+                                                     starts[nonempty], axis=0)
+            else:
+                low[nonempty] = np.minimum.reduceat(ordered, starts[nonempty], axis=0)
+                high[nonempty] = np.maximum.reduceat(ordered, starts[nonempty], axis=0)
+
+        groups = []
+        for g in range(n_groups):
+            stats = cls(width)
+            stats.count, stats.sum, stats.m2 = count[g], total[g], m2[g]
+            stats.nulls = rows[g] - count[g]
+            stats.min, stats.max = low[g], high[g]
+            groups.append(stats)
+        return groups
+
+    def copy(self):
+        return Moments.from_state(self.to_state())
+
+    def merge(self, other):
+        # Chan et al. pairwise update of the second moment
+        n = self.count + other.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other.sum / np.maximum(other.count, 1) - self.sum / np.maximum(self.count, 1)
+            cross = np.where(n > 0, delta ** 2 * self.count * other.count / np.maximum(n, 1), 0.0)
+        self.m2 = self.m2 + other.m2 + cross
+        self.count = n
+        self.nulls = self.nulls + other.nulls
+        self.sum = self.sum + other.sum
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def column(self, i):
+        count = int(self.count[i])
+        mean = self.sum[i] / count if count else None
+        return {
+            'count': count,
+            'nulls': int(self.nulls[i]),
+            'mean': _finite(mean) if count else None,
+            'std': _finite(np.sqrt(self.m2[i] / count)) if count else None,
+            'min': _finite(self.min[i]),
+            'max': _finite(self.max[i]),
+        }
+
+    def to_state(self):
+        return {
+            'count': self.count.tolist(),
+            'nulls': self.nulls.tolist(),
+            'sum': self.sum.tolist(),
+            'm2': self.m2.tolist(),
+            'min': [_finite(v) for v in self.min],
+            'max': [_finite(v) for v in self.max],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(len(state['count']))
+        stats.count = np.asarray(state['count'], dtype=np.int64)
+        stats.nulls = np.asarray(state['nulls'], dtype=np.int64)
+        stats.sum = np.asarray(state['sum'], dtype=float)
+        stats.m2 = np.asarray(state['m2'], dtype=float)
+        stats.min = np.array([np.inf if v is None else v for v in state['min']], dtype=float)
+        stats.max = np.array([-np.inf if v is None else v for v in state['max']], dtype=float)
+        return stats
+
+
+class Sample:
+    # Bounded uniform sample of each column, weighted merge when full
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.values = np.empty((0, len(NUMERIC_COLUMNS)))
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, block):
+        other = Sample(self.size)
+        other.seen = len(block)
+        other.values = block
+        self.merge(other)
+
+    def merge(self, other):
+        # Both sides are uniform samples of what they have seen, so the number
+        # of values to keep from each side is hypergeometric in their counts.
+        total = self.seen + other.seen
+        if len(self.values) + len(other.values) <= self.size:
+            self.values = np.concatenate([self.values, other.values])
+        else:
+            from_self = self.rng.hypergeometric(self.seen, other.seen, self.size) if other.seen else self.size
+            from_self = min(max(from_self, self.size - len(other.values)), len(self.values))
+            keep_self = self.rng.choice(len(self.values), size=from_self, replace=False)
+            keep_other = self.rng.choice(len(other.values), size=self.size - from_self, replace=False)
+            self.values = np.concatenate([self.values[np.sort(keep_self)], other.values[np.sort(keep_other)]])
+        self.seen = total
+        return self
+
+    def percentiles(self, i):
+        column = self.values[:, i]
+        column = column[~np.isnan(column)]
+        if not len(column):
+            return {f'p{p}': None for p in PERCENTILES}
+        return {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(column, PERCENTILES))}
+
+
+class SummaryAccumulator:
+    def __init__(self, sample_size=None):
+        self.rows = 0
+        self.moments = Moments(len(NUMERIC_COLUMNS))
+        self.groups = {}
+        self.sample = Sample(sample_size or settings.SUMMARY_SAMPLE_SIZE)
+        self.has_sample = True
+
+    def update(self, df):
+        # Column-major so each column is one contiguous run of float64
+        block = np.empty((len(df), len(NUMERIC_COLUMNS)), order='F')
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            block[:, i] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        self.update_block(block, df['Type'].to_numpy(dtype=object))
+        return self
+
+    def update_block(self, block, types):
+        # Rows without a Type form one extra group, so the column totals are
+        # just the merge of the per-group statistics of this single pass.
+        codes, labels = pd.factorize(types)
+        n_labels = len(labels)
+        codes = np.where(codes < 0, n_labels, codes)
+        per_group = Moments.from_groups(block, codes, n_labels + 1)
+        rows = np.bincount(codes, minlength=n_labels + 1)
+
+        self.rows += len(block)
+        for stats in per_group:
+            self.moments.merge(stats)
+        self.sample.add(block)
+
+        for label, n, stats in zip(labels, rows.tolist(), per_group):
+            label = str(label)
+            group = self.groups.get(label)
+            if group is None:
+                self.groups[label] = {'rows': n, 'moments': stats}
+            else:
+                group['rows'] += n
+                group['moments'].merge(stats)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.moments.merge(other.moments)
+        for label, group in other.groups.items():
+            mine = self.groups.get(label)
+            if mine is None:
+                self.groups[label] = {'rows': group['rows'], 'moments': group['moments'].copy()}
+            else:
+                mine['rows'] += group['rows']
+                mine['moments'].merge(group['moments'])
+        if self.has_sample and other.has_sample:
+            self.sample.merge(other.sample)
+        else:
+            self.has_sample = False
+        return self
+
+    def to_state(self):
+        # JSON-safe partial aggregates (the sample is not persisted)
+        return {
+            'columns': NUMERIC_COLUMNS,
+            'rows': self.rows,
+            'moments': self.moments.to_state(),
+            'groups': {label: {'rows': g['rows'], 'moments': g['moments'].to_state()}
+                       for label, g in self.groups.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(sample_size=1)
+        acc.rows = state['rows']
+        acc.moments = Moments.from_state(state['moments'])
+        acc.groups = {label: {'rows': g['rows'], 'moments': Moments.from_state(g['moments'])}
+                      for label, g in state['groups'].items()}
+        acc.has_sample = False
+        return acc
+
+    def column_stats(self):
+        stats = {}
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            stats[col] = self.moments.column(i)
+            if self.has_sample:
+                stats[col].update(self.sample.percentiles(i))
+        return stats
+
+    def type_distribution(self):
+        ordered = sorted(self.groups.items(), key=lambda item: item[1]['rows'], reverse=True)
+        return {label: group['rows'] for label, group in ordered}
+
+    def as_summary(self):
+        stats = self.column_stats()
+        summary = {
+            'equipment_count': self.rows,
+            **{f'avg_{key}': stats[col]['mean'] for col, key in SUMMARY_KEYS.items()},
+            'type_distribution': self.type_distribution(),
+        }
+        for col, key in SUMMARY_KEYS.items():
+            summary[f'min_{key}'] = stats[col]['min']
+            summary[f'max_{key}'] = stats[col]['max']
+        summary['stats'] = stats
+        summary['groups'] = {
+            label: {'count': group['rows'],
+                    **{col: group['moments'].column(i) for i, col in enumerate(NUMERIC_COLUMNS)}}
+            for label, group in self.groups.items()
+        }
+        return summary
+
+
+def summarize_frame(df):
+    return SummaryAccumulator().update(df).as_summary()
+
+
+def summarize_rows(columns, index):
+    # Summary of the rows at `index` of stored dataset columns
+    block = np.empty((len(index), len(NUMERIC_COLUMNS)), order='F')
+    for i, col in enumerate(NUMERIC_COLUMNS):
+        block[:, i] = np.asarray(columns.numeric[col])[index]
+    acc = SummaryAccumulator()
+    acc.update_block(block, np.array(columns.types(index), dtype=object))
+    return acc.as_summary()
@@ -0,0 +1,1307 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import aggregate, chunked, jobs, reports
+from .authentication import issue_token, user_cache
+from .ingest import IngestError, ingest_file
+from .models import AppUser, Dataset, UploadChunk, UploadJob, UploadSession
+from .query import MAX_DEPTH, QueryError, filter_index, parse
+from .retention import enforce_quota, find_orphans, sweep
+from .storage import DatasetColumns
+from .reports import build_report, get_report
+from .summary import SummaryAccumulator, summarize_frame
+
+
+ALL_NULL_PRESSURE = (
+    b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    b"Pump-1,Pump,120.5,,110.2\n"
+    b"Valve-1,Valve,60.0,,95.0\n"
+    b"Pump-2,Pump,130.1,,108.7\n"
+)
+
+
+class AllNullColumnTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def ingest(self):
+        with override_settings(DATASET_STORAGE_ROOT=self.tmp / 'datasets'):
+            return ingest_file(io.BytesIO(ALL_NULL_PRESSURE), None, self.tmp / 'datasets' / 'd')
+
+    def test_summary_has_no_statistics_for_the_column(self):
+        summary = self.ingest().summary
+        self.assertEqual(summary['equipment_count'], 3)
+        self.assertIsNone(summary['avg_pressure'])
+        self.assertIsNone(summary['min_pressure'])
+        self.assertIsNone(summary['max_pressure'])
+        self.assertEqual(summary['stats']['Pressure']['nulls'], 3)
+        self.assertAlmostEqual(summary['avg_flowrate'], (120.5 + 60.0 + 130.1) / 3)
+
+    def test_summary_of_a_frame_matches_ingest(self):
+        frame = pd.read_csv(io.BytesIO(ALL_NULL_PRESSURE))
+        self.assertIsNone(summarize_frame(frame)['avg_pressure'])
+
+    def test_report_renders_the_missing_average(self):
+        dataset = SimpleNamespace(id='d', filename='null.csv', summary=self.ingest().summary)
+        pdf_path = self.tmp / 'report.pdf'
+        build_report(dataset, pdf_path)
+        self.assertTrue(pdf_path.read_bytes().startswith(b'%PDF'))
+
+
+class QueryTests(SimpleTestCase):
+    def setUp(self):
+        self.columns = DatasetColumns.from_records([
+            {'Equipment Name': 'Pump-1', 'Type': 'Pump', 'Flowrate': 120.0, 'Pressure': 5.0, 'Temperature': 110.0},
+            {'Equipment Name': 'Pump-2', 'Type': 'Pump', 'Flowrate': None, 'Pressure': 7.0, 'Temperature': 100.0},
+            {'Equipment Name': 'Valve-1', 'Type': None, 'Flowrate': 60.0, 'Pressure': None, 'Temperature': 95.0},
+        ])
+
+    def matches(self, text):
+        return filter_index(self.columns, text).tolist()
+
+    def test_negated_conditions_skip_missing_values(self):
+        self.assertEqual(self.matches('Flowrate != 120'), [2])
+        self.assertEqual(self.matches("Type NOT IN ('Valve')"), [0, 1])
+        self.assertEqual(self.matches('Pressure NOT BETWEEN 6 AND 8'), [0])
+        self.assertEqual(self.matches('Pressure BETWEEN 6 AND 8'), [1])
+        # NOT of a condition is true where the value is missing
+        self.assertEqual(self.matches('NOT (Pressure BETWEEN 6 AND 8)'), [0, 2])
+
+    def test_name_equality_matches_decoded_names(self):
+        names = ['Pump-1', '', None, 'Pump-10', 'Pump-1', 'Pümp-1', 'Pump-2', 'pump-1', '']
+        columns = DatasetColumns.from_records([
+            {'Equipment Name': name, 'Type': 'Pump', 'Flowrate': 1.0, 'Pressure': 1.0, 'Temperature': 1.0}
+            for name in names
+        ])
+        for value in ('Pump-1', 'Pümp-1', 'Pump-10', 'Valve-1', 'P'):
+            expected = [i for i, name in enumerate(names) if name == value]
+            self.assertEqual(filter_index(columns, f""""Equipment Name" = '{value}'""").tolist(), expected, value)
+        self.assertEqual(filter_index(columns, """"Equipment Name" IN ('Pump-2', 'Pump-10')""").tolist(), [3, 6])
+
+    def test_deep_nesting_is_a_query_error(self):
+        parse('(' * MAX_DEPTH + 'Flowrate > 1' + ')' * MAX_DEPTH)
+        for text in ('(' * 900 + 'Flowrate > 1' + ')' * 900, 'NOT ' * 400 + 'Flowrate > 1'):
+            with self.assertRaises(QueryError):
+                parse(text)
+
+
+def create_user(username='alice'):
+    user = AppUser(username=username, email=f'{username}@example.com')
+    user.set_password('secret')
+    user.save()
+    return user
+
+
+class AuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_user()
+
+    def get_history(self, token):
+        return self.client.get('/api/history/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_valid_token(self):
+        self.assertEqual(self.get_history(issue_token(self.user)).status_code, 200)
+
+    def test_login_issues_a_working_token(self):
+        response = self.client.post('/api/auth/login/', {'username': 'alice', 'password': 'secret'})
+        self.assertEqual(self.get_history(response.json()['token']).status_code, 200)
+
+    def test_tampered_signature(self):
+        token = issue_token(self.user)
+        tampered = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        self.assertEqual(self.get_history(tampered).status_code, 401)
+
+    def test_forged_user_id(self):
+        other = create_user('bob')
+        forged = str(other.id) + issue_token(self.user)[len(str(self.user.id)):]
+        self.assertEqual(self.get_history(forged).status_code, 401)
+
+    def test_expired_token(self):
+        issued = time.time() - settings.AUTH_TOKEN_MAX_AGE - 60
+        with mock.patch('django.core.signing.time.time', return_value=issued):
+            token = issue_token(self.user)
+        response = self.get_history(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token expired')
+
+    def test_user_cache_is_invalidated_on_save(self):
+        token = issue_token(self.user)
+        self.get_history(token)
+        self.assertIsNotNone(user_cache.get(str(self.user.id)))
+        self.user.email = 'alice@example.org'
+        self.user.save()
+        self.assertIsNone(user_cache.get(str(self.user.id)))
+
+    def test_user_cache_is_invalidated_on_delete(self):
+        token = issue_token(self.user)
+        self.get_history(token)
+        self.user.delete()
+        self.assertIsNone(user_cache.get(str(self.user.id)))
+        self.assertEqual(self.get_history(token).status_code, 401)
+
+
+class SecretKeyTests(SimpleTestCase):
+    def import_settings(self, **env):
+        env = {**os.environ, 'PYTHONPATH': str(settings.BASE_DIR), **env}
+        return subprocess.run([sys.executable, '-c', 'import chemequip.settings'],
+                              cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+
+    def test_refuses_to_start_without_a_key_when_not_debugging(self):
+        result = self.import_settings(SECRET_KEY='', DEBUG='false')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+
+    def test_key_from_the_environment(self):
+        self.assertEqual(self.import_settings(SECRET_KEY='x' * 50, DEBUG='false').returncode, 0)
+
+
+def equipment_frame(rows, seed=0):
+    # Random equipment rows with a few missing values in every column
+    rng = np.random.default_rng(seed)
+    types = rng.choice(['Pump', 'Valve', 'Compressor', 'Reactor'], size=rows)
+    frame = pd.DataFrame({
+        'Equipment Name': [f'{t}-{i}' for i, t in enumerate(types)],
+        'Type': types,
+        'Flowrate': rng.normal(120, 30, rows).round(2),
+        'Pressure': rng.normal(6, 1.5, rows).round(2),
+        'Temperature': rng.normal(115, 12, rows).round(2),
+    })
+    for column in frame.columns:
+        frame.loc[rng.random(rows) < 0.02, column] = None
+    return frame
+
+
+def csv_bytes(frame):
+    return frame.to_csv(index=False).encode('utf-8')
+
+
+def assert_summaries_close(test, actual, expected, path='summary'):
+    # Equal structure and values, floats to 1e-9 (merged sums differ in the last bits)
+    if isinstance(expected, dict):
+        test.assertEqual(set(actual), set(expected), path)
+        for key in expected:
+            assert_summaries_close(test, actual[key], expected[key], f'{path}.{key}')
+    elif isinstance(expected, float) and isinstance(actual, float):
+        test.assertTrue(np.isclose(actual, expected, rtol=1e-9, atol=1e-9), f'{path}: {actual} != {expected}')
+    else:
+        test.assertEqual(actual, expected, path)
+
+
+class StreamingIngestTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.content = csv_bytes(equipment_frame(500))
+
+    def ingest(self, name, **kwargs):
+        with override_settings(DATASET_STORAGE_ROOT=self.tmp / 'datasets'):
+            return ingest_file(io.BytesIO(self.content), self.tmp / f'{name}.csv', self.tmp / 'datasets' / name, **kwargs)
+
+    def test_chunks_summarize_like_one_read(self):
+        progress = []
+        result = self.ingest('small', chunk_rows=37, progress=progress.append)
+        self.assertEqual(result.row_count, 500)
+        self.assertEqual(result.bytes_read, len(self.content))
+        assert_summaries_close(self, result.summary, summarize_frame(pd.read_csv(io.BytesIO(self.content))))
+        assert_summaries_close(self, result.summary, self.ingest('whole', chunk_rows=10 ** 6).summary)
+        self.assertGreater(len(progress), 500 // 37)
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress[-1], len(self.content))
+
+    def test_upload_is_copied_as_it_is_read(self):
+        self.ingest('copy', chunk_rows=50)
+        self.assertEqual((self.tmp / 'copy.csv').read_bytes(), self.content)
+
+    @override_settings(INGEST_PREVIEW_ROWS=10)
+    def test_preview_keeps_the_first_rows(self):
+        preview = self.ingest('preview', chunk_rows=3).preview
+        expected = pd.read_csv(io.BytesIO(self.content), nrows=10)
+        self.assertEqual([row['Equipment Name'] for row in preview], expected['Equipment Name'].tolist())
+
+
+def frame_rows(frame):
+    # Rows as the API returns them: None for missing values, '' for a missing name
+    rows = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    for row in rows:
+        row['Equipment Name'] = row['Equipment Name'] or ''
+    return rows
+
+
+class MediaTestCase(APITestCase):
+    # A signed-in user and MEDIA_ROOT in a temporary directory. Uploads are
+    # left queued (UPLOAD_WORKERS=0) and processed by process_jobs().
+    def setUp(self):
+        super().setUp()
+        self.media = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media,
+            DATASET_STORAGE_ROOT=self.media / 'datasets',
+            REPORT_CACHE_ROOT=self.media / 'reports',
+            UPLOAD_PARTIAL_ROOT=self.media / 'partial',
+            UPLOAD_WORKERS=0,
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        user_cache.clear()
+        self.user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_token(self.user)}')
+
+    def upload(self, content, name='equipment.csv'):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['job_id']
+
+    def process_jobs(self):
+        while (job := jobs.claim_next()) is not None:
+            jobs.process_job(job)
+
+    def upload_dataset(self, content, name='equipment.csv'):
+        job_id = self.upload(content, name)
+        self.process_jobs()
+        job = UploadJob.objects.get(id=job_id)
+        self.assertEqual(job.status, UploadJob.SUCCEEDED, job.error)
+        return job.dataset
+
+
+class UploadJobTests(MediaTestCase):
+    def job_status(self, job_id):
+        response = self.client.get(f'/api/jobs/{job_id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def queued_job(self, content=None):
+        path = self.media / f'{len(os.listdir(self.media))}.csv'
+        path.write_bytes(content or csv_bytes(equipment_frame(50)))
+        return UploadJob.objects.create(user=self.user, filename='equipment.csv', file_path=str(path),
+                                        size=path.stat().st_size)
+
+    def test_status_endpoint_follows_the_job(self):
+        job_id = self.upload(csv_bytes(equipment_frame(200)))
+        self.assertEqual(self.job_status(job_id)['status'], 'queued')
+        self.process_jobs()
+        job = self.job_status(job_id)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['progress'], 1.0)
+        self.assertEqual(job['summary']['equipment_count'], 200)
+        self.assertTrue(Dataset.objects.filter(id=job['dataset_id'], user=self.user).exists())
+
+    def test_failed_job_reports_its_error(self):
+        job_id = self.upload(b'Equipment Name,Type,Flowrate,Pressure,Temperature\n"unterminated,Pump,1,2,3\n')
+        self.process_jobs()
+        job = self.job_status(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['error'])
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_status_of_another_users_job_is_not_found(self):
+        job = self.queued_job()
+        job.user = create_user('bob')
+        job.save()
+        self.assertEqual(self.client.get(f'/api/jobs/{job.id}/').status_code, 404)
+
+    def test_a_job_is_claimed_once(self):
+        job = self.queued_job()
+        claimed = jobs.claim(job.id)
+        self.assertEqual(claimed.status, UploadJob.RUNNING)
+        self.assertTrue(claimed.claim)
+        self.assertIsNone(jobs.claim(job.id))
+        self.assertIsNone(jobs.claim_next())
+
+    def test_requeue_stale_only_takes_jobs_without_a_heartbeat(self):
+        stale, live = jobs.claim(self.queued_job().id), jobs.claim(self.queued_job().id)
+        UploadJob.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(600), 1)
+        self.assertEqual(UploadJob.objects.get(id=stale.id).status, UploadJob.QUEUED)
+        self.assertEqual(UploadJob.objects.get(id=live.id).status, UploadJob.RUNNING)
+
+    def test_requeued_job_is_finished_by_its_new_worker_only(self):
+        queued = self.queued_job()
+        first = jobs.claim(queued.id)
+        UploadJob.objects.filter(id=queued.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale(600)
+        second = jobs.claim(queued.id)
+
+        jobs.process_job(first)
+        self.assertFalse(Dataset.objects.exists())
+        self.assertEqual(UploadJob.objects.get(id=queued.id).status, UploadJob.RUNNING)
+        self.assertTrue(Path(queued.file_path).exists())
+        self.assertEqual(os.listdir(self.media / 'datasets'), [])
+
+        jobs.process_job(second)
+        job = UploadJob.objects.get(id=queued.id)
+        self.assertEqual(job.status, UploadJob.SUCCEEDED)
+        self.assertEqual(Dataset.objects.count(), 1)
+
+    def test_failure_after_a_requeue_leaves_the_files_alone(self):
+        queued = self.queued_job(b'Equipment Name,Type,Flowrate,Pressure,Temperature\n"x,Pump,1,2,3\n')
+        first = jobs.claim(queued.id)
+        UploadJob.objects.filter(id=queued.id).update(status=UploadJob.QUEUED)
+        jobs.claim(queued.id)
+        jobs.process_job(first)
+        self.assertTrue(Path(queued.file_path).exists())
+        self.assertEqual(UploadJob.objects.get(id=queued.id).status, UploadJob.RUNNING)
+
+    @override_settings(UPLOAD_COMPRESSION='gzip', REPORT_EAGER=True)
+    def test_every_phase_refreshes_the_heartbeat(self):
+        job = jobs.claim(self.queued_job().id)
+        compress_file = jobs.compress_file
+
+        def slow_compress(path, compression):
+            # As if compressing took an hour
+            UploadJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+            return compress_file(path, compression)
+
+        def report(dataset):
+            self.assertEqual(jobs.requeue_stale(600), 0)
+
+        with mock.patch.object(jobs, 'compress_file', slow_compress), mock.patch.object(jobs, 'get_report', report):
+            jobs.process_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, UploadJob.SUCCEEDED)
+        self.assertTrue(job.file_path.endswith('.csv.gz'))
+
+    def test_requeue_during_a_phase_abandons_the_job(self):
+        job = jobs.claim(self.queued_job().id)
+        with override_settings(REPORT_EAGER=True), \
+                mock.patch.object(jobs, 'get_report', lambda dataset: jobs.requeue_stale(0)):
+            jobs.process_job(job)
+        self.assertEqual(UploadJob.objects.get(id=job.id).status, UploadJob.QUEUED)
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_recover_jobs_submits_queued_and_stale_jobs(self):
+        queued, stale, live = self.queued_job(), jobs.claim(self.queued_job().id), jobs.claim(self.queued_job().id)
+        UploadJob.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        pool = mock.Mock()
+        with mock.patch.object(jobs, 'executor', return_value=pool):
+            self.assertEqual(jobs.recover_jobs(), 2)
+        submitted = {c.args[1] for c in pool.submit.call_args_list}
+        self.assertEqual(submitted, {str(queued.id), stale.id})
+
+
+@override_settings(UPLOAD_CHUNK_MIN=1024)
+class ChunkedUploadTests(MediaTestCase):
+    CHUNK = 4096
+
+    def setUp(self):
+        super().setUp()
+        self.content = csv_bytes(equipment_frame(500))
+        self.chunks = [self.content[i:i + self.CHUNK] for i in range(0, len(self.content), self.CHUNK)]
+
+    def create_session(self, **fields):
+        data = {'filename': 'equipment.csv', 'size': len(self.content), 'chunk_size': self.CHUNK, **fields}
+        return self.client.post('/api/uploads/', data, format='json')
+
+    def put_chunk(self, session_id, index, body=None, checksum=None):
+        body = self.chunks[index] if body is None else body
+        return self.client.put(f'/api/uploads/{session_id}/chunks/{index}/', body,
+                               content_type='application/octet-stream',
+                               HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(body).hexdigest())
+
+    def test_resumed_upload(self):
+        session = self.create_session(sha256=hashlib.sha256(self.content).hexdigest()).json()
+        self.assertEqual(session['chunk_count'], len(self.chunks))
+        for index in range(0, len(self.chunks), 2):
+            self.assertEqual(self.put_chunk(session['id'], index).status_code, 200)
+
+        # The client comes back and asks what is missing
+        status = self.client.get(f"/api/uploads/{session['id']}/").json()
+        self.assertEqual(status['received'], list(range(0, len(self.chunks), 2)))
+        response = self.client.post(f"/api/uploads/{session['id']}/finalize/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['received'], status['received'])
+
+        for index in range(1, len(self.chunks), 2):
+            self.assertEqual(self.put_chunk(session['id'], index).status_code, 200)
+        response = self.client.post(f"/api/uploads/{session['id']}/finalize/")
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(UploadSession.objects.exists())
+        self.process_jobs()
+        job = UploadJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual(job.dataset.summary['equipment_count'], 500)
+        self.assertEqual(Path(job.dataset.file_path).read_bytes(), self.content)
+
+    def test_chunk_checksum_mismatch(self):
+        session = self.create_session().json()
+        response = self.put_chunk(session['id'], 0, checksum='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checksum mismatch', response.json()['detail'])
+        self.assertEqual(self.client.get(f"/api/uploads/{session['id']}/").json()['received'], [])
+
+    def test_chunk_of_the_wrong_size(self):
+        session = self.create_session().json()
+        self.assertEqual(self.put_chunk(session['id'], 0, self.chunks[0][:-1]).status_code, 400)
+        self.assertEqual(self.put_chunk(session['id'], 0, self.chunks[0] + b'x').status_code, 400)
+        self.assertEqual(self.put_chunk(session['id'], len(self.chunks), self.chunks[0]).status_code, 400)
+
+    def test_file_checksum_mismatch_on_finalize(self):
+        session = self.create_session(sha256=hashlib.sha256(b'something else').hexdigest()).json()
+        for index in range(len(self.chunks)):
+            self.put_chunk(session['id'], index)
+        response = self.client.post(f"/api/uploads/{session['id']}/finalize/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('File checksum mismatch', response.json()['detail'])
+        self.assertFalse(UploadJob.objects.exists())
+
+    @override_settings(UPLOAD_MAX_BYTES=1000)
+    def test_size_limit(self):
+        response = self.create_session(size=1001, chunk_size=1024)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.create_session(size=1000, chunk_size=1024).status_code, 201)
+
+    @override_settings(UPLOAD_SESSIONS_PER_USER=2)
+    def test_sessions_per_user_limit(self):
+        first = self.create_session().json()
+        self.assertEqual(self.create_session().status_code, 201)
+        self.assertEqual(self.create_session().status_code, 400)
+        # Expired sessions do not count, deleted ones are gone
+        UploadSession.objects.filter(id=first['id']).update(updated_at=timezone.now() - timedelta(days=7))
+        self.assertEqual(self.create_session().status_code, 201)
+        self.assertEqual(self.create_session().status_code, 400)
+
+    def test_racing_writes_of_the_same_chunk(self):
+        session = UploadSession.objects.get(id=self.create_session().json()['id'])
+        body = self.chunks[0]
+        checksum = hashlib.sha256(body).hexdigest()
+
+        class Racing(io.BytesIO):
+            # A second request for the same chunk records it while this one is writing
+            def read(self, size=-1):
+                if not UploadChunk.objects.filter(session=session, index=0).exists():
+                    UploadChunk.objects.create(session=session, index=0, size=len(body), sha256=checksum)
+                return super().read(size)
+
+        chunked.write_chunk(session, 0, Racing(body), checksum)
+        self.assertEqual(list(session.chunks.values_list('index', 'sha256')), [(0, checksum)])
+
+        # A racing write that fails does not leave the other one's record behind
+        with self.assertRaises(chunked.ChunkError):
+            chunked.write_chunk(session, 0, Racing(body), '0' * 64)
+        self.assertFalse(session.chunks.exists())
+
+
+class DeduplicationTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = csv_bytes(equipment_frame(100))
+        self.source = self.upload_dataset(self.content, 'first.csv')
+
+    def files_exist(self, dataset):
+        return Path(dataset.file_path).exists() and Path(dataset.storage_path).exists()
+
+    def test_duplicate_upload_shares_the_stored_files(self):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('again.csv', self.content)},
+                                    format='multipart')
+        self.assertEqual(response.json()['status'], 'succeeded')
+        copy = UploadJob.objects.get(id=response.json()['job_id']).dataset
+        self.assertNotEqual(copy.id, self.source.id)
+        self.assertEqual(copy.filename, 'again.csv')
+        self.assertEqual((copy.file_path, copy.storage_path), (self.source.file_path, self.source.storage_path))
+        self.assertEqual(copy.summary, self.source.summary)
+
+    def test_files_outlive_all_but_the_last_row(self):
+        copy = self.upload_dataset(self.content, 'again.csv')
+        with self.captureOnCommitCallbacks(execute=True):
+            enforce_quota(self.user, quota=1)
+        self.assertFalse(Dataset.objects.filter(id=self.source.id).exists())
+        self.assertTrue(self.files_exist(copy))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enforce_quota(self.user, quota=0)
+        self.assertFalse(Path(copy.file_path).exists())
+        self.assertFalse(Path(copy.storage_path).exists())
+
+    def test_other_users_do_not_share_files(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_token(create_user('bob'))}")
+        other = self.upload_dataset(self.content)
+        self.assertNotEqual(other.storage_path, self.source.storage_path)
+
+    def test_source_deleted_before_the_recheck(self):
+        create = Dataset.objects.create
+
+        def create_then_lose_source(**fields):
+            # Retention deletes the source row right after the copy is inserted
+            dataset = create(**fields)
+            Dataset.objects.filter(id=self.source.id).delete()
+            return dataset
+
+        upload = SimpleUploadedFile('again.csv', self.content)
+        with mock.patch.object(Dataset.objects, 'create', side_effect=create_then_lose_source):
+            self.assertIsNone(jobs.reuse_duplicate(self.user, upload, self.source.content_hash))
+        self.assertFalse(Dataset.objects.exists())
+        self.assertFalse(UploadJob.objects.filter(filename='again.csv').exists())
+
+        # The upload is then processed like a new file
+        copy = self.upload_dataset(self.content, 'again.csv')
+        self.assertNotEqual(copy.storage_path, self.source.storage_path)
+
+
+class RetentionTests(MediaTestCase):
+    def age(self, path, seconds):
+        then = time.time() - seconds
+        for p in [path, *(path.iterdir() if path.is_dir() else [])]:
+            os.utime(p, (then, then))
+        return path
+
+    def test_quota_keeps_the_newest_datasets(self):
+        content = csv_bytes(equipment_frame(20))
+        datasets = [self.upload_dataset(content + str(i).encode()) for i in range(4)]
+        now = timezone.now()
+        for age, dataset in zip([3, 1, 2, 0], datasets):
+            Dataset.objects.filter(id=dataset.id).update(uploaded_at=now - timedelta(hours=age))
+        other = create_user('bob')
+        Dataset.objects.create(user=other, filename='b.csv', summary={}, file_path='')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(enforce_quota(self.user, quota=2), 2)
+        kept = set(Dataset.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(kept, {datasets[1].id, datasets[3].id})
+        self.assertEqual(Dataset.objects.filter(user=other).count(), 1)
+        for gone in (datasets[0], datasets[2]):
+            self.assertFalse(Path(gone.storage_path).exists())
+            self.assertFalse(Path(gone.file_path).exists())
+        for dataset in (datasets[1], datasets[3]):
+            self.assertTrue(Path(dataset.storage_path).exists())
+
+    @override_settings(DATASET_QUOTA=1)
+    def test_upload_applies_the_quota(self):
+        first = self.upload_dataset(csv_bytes(equipment_frame(20, seed=1)))
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.upload_dataset(csv_bytes(equipment_frame(20, seed=2)))
+        self.assertEqual(list(Dataset.objects.values_list('id', flat=True)), [second.id])
+        self.assertFalse(Path(first.storage_path).exists())
+
+    def test_grace_period(self):
+        orphan = self.media / 'orphan.csv'
+        orphan.write_bytes(b'x')
+        self.assertEqual(find_orphans(grace=3600), [])
+        self.age(orphan, 7200)
+        self.assertEqual(find_orphans(grace=3600), [orphan])
+        result = sweep(grace=3600, dry_run=True)
+        self.assertEqual(result.paths, [orphan])
+        self.assertTrue(orphan.exists())
+
+    def test_sweep_spares_referenced_and_managed_paths(self):
+        dataset = self.upload_dataset(csv_bytes(equipment_frame(20)))
+        report, _ = get_report(Dataset.objects.get(id=dataset.id))
+        session = self.client.post('/api/uploads/', {'filename': 'big.csv', 'size': 10}, format='json').json()
+        partial = self.media / 'partial' / f"{session['id']}.part"
+        stale_report = self.media / 'reports' / f'report_{dataset.id}_{"0" * 32}.pdf'
+        stale_report.write_bytes(b'%PDF')
+        orphan_storage = self.media / 'datasets' / 'gone'
+        orphan_storage.mkdir()
+        (orphan_storage / 'Flowrate.f8').write_bytes(b'')
+        orphan_partial = self.media / 'partial' / 'gone.part'
+        orphan_partial.write_bytes(b'')
+        for path in [*self.media.iterdir(), *(self.media / 'datasets').iterdir(), *(self.media / 'partial').iterdir(),
+                     *(self.media / 'reports').iterdir()]:
+            self.age(path, 7200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep(grace=3600)
+        self.assertEqual(sorted(result.paths), sorted([stale_report, orphan_storage, orphan_partial]))
+        for path in (self.media / 'datasets', self.media / 'partial', self.media / 'reports', report, partial,
+                     Path(dataset.file_path), Path(dataset.storage_path)):
+            self.assertTrue(path.exists(), path)
+        for path in result.paths:
+            self.assertFalse(path.exists(), path)
+
+    def test_sweep_drops_expired_sessions_and_old_jobs(self):
+        session = self.client.post('/api/uploads/', {'filename': 'big.csv', 'size': 10}, format='json').json()
+        partial = self.media / 'partial' / f"{session['id']}.part"
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS + 1))
+        self.upload_dataset(csv_bytes(equipment_frame(20)))
+        UploadJob.objects.update(updated_at=timezone.now() - timedelta(days=settings.UPLOAD_JOB_RETENTION_DAYS + 1))
+        self.age(partial, 7200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep(grace=3600)
+        self.assertEqual((result.sessions, result.jobs), (1, 1))
+        self.assertFalse(partial.exists())
+        self.assertEqual(Dataset.objects.count(), 1)
+
+    def test_sweep_storage_command(self):
+        orphan = self.media / 'orphan.csv'
+        orphan.write_bytes(b'x' * 10)
+        self.age(orphan, 7200)
+        out = io.StringIO()
+        call_command('sweep_storage', '--dry-run', stdout=out)
+        self.assertIn(f'would remove {orphan}', out.getvalue())
+        self.assertTrue(orphan.exists())
+        call_command('sweep_storage', '--grace', '10000', stdout=io.StringIO())
+        self.assertTrue(orphan.exists())
+        call_command('sweep_storage', stdout=io.StringIO())
+        self.assertFalse(orphan.exists())
+
+
+class ColumnarStorageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(300)
+        self.frame.loc[3, 'Equipment Name'] = 'Pump, "north" – Pümp'
+
+    def get_rows(self, dataset, **params):
+        response = self.client.get(f'/api/datasets/{dataset.id}/rows/', {'limit': 5000, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['rows']
+
+    def test_rows_round_trip(self):
+        dataset = self.upload_dataset(csv_bytes(self.frame))
+        self.assertIsNone(dataset.data)
+        self.assertTrue(Path(dataset.storage_path).is_dir())
+        self.assertEqual(self.get_rows(dataset), frame_rows(self.frame))
+        detail = self.client.get(f'/api/datasets/{dataset.id}/').json()
+        self.assertEqual(detail['data'], frame_rows(self.frame))
+
+        table = DatasetColumns.open(dataset.storage_path, dataset.schema)
+        self.assertEqual(len(table), 300)
+        np.testing.assert_array_equal(np.asarray(table.numeric['Pressure']), self.frame['Pressure'].to_numpy(float))
+
+    def test_legacy_rows_are_still_served(self):
+        records = frame_rows(self.frame)
+        dataset = Dataset.objects.create(user=self.user, filename='old.csv', summary=summarize_frame(self.frame),
+                                         file_path='', data=records)
+        self.assertEqual(self.get_rows(dataset), records)
+        self.assertEqual(self.get_rows(dataset, columns='Type,Flowrate', offset=290),
+                         [{'Type': r['Type'], 'Flowrate': r['Flowrate']} for r in records[290:]])
+        by_pressure = self.get_rows(dataset, sort='-Pressure', limit=5)
+        expected = self.frame.sort_values('Pressure', ascending=False, kind='stable').head(5)
+        self.assertEqual([r['Equipment Name'] for r in by_pressure], expected['Equipment Name'].tolist())
+        query = self.client.get(f'/api/datasets/{dataset.id}/query/', {'where': "Type = 'Pump'"}).json()
+        self.assertEqual(query['count'], int((self.frame['Type'] == 'Pump').sum()))
+
+    def test_storage_matches_legacy_rows(self):
+        stored = self.upload_dataset(csv_bytes(self.frame))
+        legacy = Dataset.objects.create(user=self.user, filename='old.csv', summary={}, file_path='',
+                                        data=frame_rows(self.frame))
+        for params in ({}, {'sort': 'Temperature'}, {'sort': '-Flowrate', 'offset': 17, 'limit': 40}):
+            self.assertEqual(self.get_rows(stored, **params), self.get_rows(legacy, **params), params)
+
+
+@override_settings(ROWS_PAGE_SIZE=10, ROWS_PAGE_MAX=50)
+class RowPagingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(25)
+        self.dataset = self.upload_dataset(csv_bytes(self.frame))
+        self.url = f'/api/datasets/{self.dataset.id}/rows/'
+
+    def page(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_follow_their_links(self):
+        body = self.page()
+        self.assertEqual((body['count'], body['offset'], body['limit']), (25, 0, 10))
+        self.assertIsNone(body['previous'])
+        rows = body['rows']
+        while body['next']:
+            body = self.page(body['next'])
+            rows += body['rows']
+        self.assertEqual(rows, frame_rows(self.frame))
+        self.assertEqual((body['offset'], len(body['rows'])), (20, 5))
+        self.assertEqual(self.page(body['previous'])['offset'], 10)
+
+    def test_links_keep_the_other_parameters(self):
+        body = self.page(offset=4, limit=3, columns='Type', sort='-Flowrate')
+        self.assertEqual(body['columns'], ['Type'])
+        for link, offset in ((body['next'], '7'), (body['previous'], '1')):
+            query = QueryDict(urlsplit(link).query)
+            self.assertEqual(query.dict(), {'offset': offset, 'limit': '3', 'columns': 'Type', 'sort': '-Flowrate'})
+        self.assertEqual(self.page(offset=1, limit=3)['previous'].count('offset=0'), 1)
+
+    def test_offset_past_the_end_is_an_empty_page(self):
+        body = self.page(offset=100)
+        self.assertEqual((body['count'], body['rows'], body['next']), (25, [], None))
+        self.assertEqual(len(self.page(offset=24, sort='Pressure')['rows']), 1)
+
+    def test_bad_paging_is_rejected(self):
+        for params, message in (({'limit': 'ten'}, 'offset and limit must be integers'),
+                                ({'offset': -1}, 'offset must be >= 0 and limit between 1 and 50'),
+                                ({'limit': 0}, 'offset must be >= 0 and limit between 1 and 50'),
+                                ({'limit': 51}, 'offset must be >= 0 and limit between 1 and 50'),
+                                ({'columns': 'Type,Colour'}, 'Unknown column(s): Colour.'),
+                                ({'sort': '-Colour'}, 'Unknown column(s): Colour.')):
+            for url, extra in ((self.url, {}),
+                               (f'/api/datasets/{self.dataset.id}/query/', {'where': 'Flowrate > 0'}),
+                               (f'/api/datasets/{self.dataset.id}/range/', {'column': 'Flowrate'})):
+                response = self.client.get(url, {**params, **extra})
+                self.assertEqual(response.status_code, 400, (url, params))
+                self.assertTrue(response.json()['detail'].startswith(message), response.json())
+
+    def test_other_users_datasets_are_not_found(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_token(create_user("bob"))}')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ReportCacheTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset(csv_bytes(equipment_frame(50)))
+        self.url = f'/api/report/pdf/{self.dataset.id}/'
+
+    def get(self, **headers):
+        with mock.patch.object(reports, 'build_report', wraps=reports.build_report) as build:
+            response = self.client.get(self.url, **headers)
+        return response, build.call_count
+
+    def test_report_is_rendered_once_and_revalidated(self):
+        response, builds = self.get()
+        self.assertEqual((response.status_code, builds), (200, 1))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        etag = response['ETag']
+
+        response, builds = self.get()
+        self.assertEqual((response.status_code, builds, response['ETag']), (200, 0, etag))
+        response, builds = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, builds), (304, 0))
+        response, _ = self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_a_new_summary_invalidates_the_report(self):
+        first, _ = self.get()
+        old_files = list(reports.report_root().glob(f'report_{self.dataset.id}_*.pdf'))
+        self.assertEqual(len(old_files), 1)
+
+        summary = {**self.dataset.summary, 'equipment_count': 49}
+        Dataset.objects.filter(id=self.dataset.id).update(summary=summary)
+        response, builds = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, builds), (200, 1))
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertFalse(old_files[0].exists())
+        self.assertEqual(len(list(reports.report_root().glob(f'report_{self.dataset.id}_*.pdf'))), 1)
+
+    def test_reports_are_private(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_token(create_user("bob"))}')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(AGGREGATE_BINS=20, AGGREGATE_MAX_BINS=100, AGGREGATE_POINTS=100, AGGREGATE_MAX_POINTS=200)
+class AggregateTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(1000)
+        self.dataset = self.upload_dataset(csv_bytes(self.frame))
+        self.url = f'/api/datasets/{self.dataset.id}/aggregate/'
+
+    def aggregate(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_histograms_and_density_match_numpy(self):
+        body = self.aggregate(histogram='Flowrate,Pressure', bins=17, density='Pressure,Temperature', density_bins=9)
+        for column in ('Flowrate', 'Pressure'):
+            values = self.frame[column].dropna().to_numpy()
+            counts, edges = np.histogram(values, bins=17)
+            self.assertEqual(body['histograms'][column]['counts'], counts.tolist())
+            np.testing.assert_allclose(body['histograms'][column]['edges'], edges)
+            self.assertEqual(body['histograms'][column]['nulls'], 1000 - len(values))
+
+        pairs = self.frame[['Pressure', 'Temperature']].dropna().to_numpy()
+        counts, _, _ = np.histogram2d(pairs[:, 0], pairs[:, 1], bins=9)
+        self.assertEqual(body['density']['counts'], counts.astype(int).tolist())
+        self.assertEqual(body['density']['nulls'], 1000 - len(pairs))
+
+    def test_boxplots_match_pandas(self):
+        boxes = self.aggregate(boxplot='Temperature')['boxplots']['Temperature']
+        groups = self.frame.dropna(subset=['Type', 'Temperature']).groupby('Type')['Temperature']
+        self.assertEqual(set(boxes), set(groups.groups))
+        for label, values in groups:
+            self.assertEqual(boxes[label]['count'], len(values))
+            for key, q in (('q1', 0.25), ('median', 0.5), ('q3', 0.75)):
+                self.assertAlmostEqual(boxes[label][key], values.quantile(q))
+
+    def test_series_is_downsampled_to_the_point_limit(self):
+        series = self.aggregate(series='Flowrate', points=50)['series']['Flowrate']
+        present = np.flatnonzero(self.frame['Flowrate'].notna().to_numpy())
+        self.assertEqual(len(series['x']), 50)
+        self.assertEqual(series['count'], len(present))
+        self.assertEqual((series['x'][0], series['x'][-1]), (present[0], present[-1]))
+        self.assertEqual(series['x'], sorted(set(series['x'])))
+        np.testing.assert_array_equal(series['y'], self.frame['Flowrate'].to_numpy()[series['x']])
+
+        full = self.aggregate(series='Flowrate', points=200)['series']['Flowrate']
+        self.assertEqual(len(full['x']), 200)
+
+    def test_lttb_keeps_a_spike(self):
+        y = np.zeros(1000)
+        y[617] = 50.0
+        keep = aggregate.lttb(np.arange(1000.0), y, 20)
+        self.assertEqual(len(keep), 20)
+        self.assertIn(617, keep.tolist())
+        self.assertEqual(aggregate.lttb(np.arange(5.0), np.ones(5), 20).tolist(), list(range(5)))
+
+    def test_limits(self):
+        for params, message in (({}, 'Request at least one of'),
+                                ({'histogram': 'Colour'}, 'Unknown column(s): Colour.'),
+                                ({'density': 'Pressure'}, 'density takes two columns'),
+                                ({'histogram': 'Flowrate', 'bins': 'many'}, 'bins, density_bins and points'),
+                                ({'histogram': 'Flowrate', 'bins': 0}, 'bins must be between 1 and 100'),
+                                ({'histogram': 'Flowrate', 'bins': 101}, 'bins must be between 1 and 100'),
+                                ({'density': 'Pressure,Flowrate', 'density_bins': 101}, 'bins must be between'),
+                                ({'series': 'Flowrate', 'points': 2}, 'points must be between 3 and 200'),
+                                ({'series': 'Flowrate', 'points': 201}, 'points must be between 3 and 200')):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertTrue(response.json()['detail'].startswith(message), response.json())
+        self.assertEqual(len(self.aggregate(histogram='Flowrate', bins=100)['histograms']['Flowrate']['counts']), 100)
+
+
+class CompareTests(MediaTestCase):
+    STAT_KEYS = ('count', 'nulls', 'mean', 'std', 'min', 'max')
+
+    def setUp(self):
+        super().setUp()
+        self.frames = [equipment_frame(rows, seed=seed) for seed, rows in enumerate((400, 250, 30))]
+
+    def column_stats(self, summary):
+        return {col: {k: summary['stats'][col][k] for k in self.STAT_KEYS} for col in summary['stats']}
+
+    def test_merged_moments_match_a_single_pass(self):
+        whole = pd.concat(self.frames, ignore_index=True)
+        merged = SummaryAccumulator()
+        for frame in self.frames:
+            part = SummaryAccumulator().update(frame)
+            merged.merge(SummaryAccumulator.from_state(part.to_state()))
+        single = summarize_frame(whole)
+        summary = merged.as_summary()
+        assert_summaries_close(self, self.column_stats(summary), self.column_stats(single))
+        assert_summaries_close(self, summary['groups'], single['groups'])
+        self.assertEqual(summary['type_distribution'], single['type_distribution'])
+        self.assertAlmostEqual(summary['stats']['Pressure']['std'], whole['Pressure'].std(ddof=0), places=9)
+
+    def test_compare_endpoint(self):
+        datasets = [self.upload_dataset(csv_bytes(frame), f'{i}.csv') for i, frame in enumerate(self.frames)]
+        # One dataset from before aggregates were stored
+        Dataset.objects.filter(id=datasets[2].id).update(aggregates=None)
+        ids = ','.join(str(d.id) for d in datasets)
+        response = self.client.get('/api/datasets/compare/', {'ids': ids, 'baseline': datasets[1].id})
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+
+        single = summarize_frame(pd.concat(self.frames, ignore_index=True))
+        self.assertEqual(body['merged']['count'], 680)
+        assert_summaries_close(self, body['merged']['stats'], self.column_stats(single))
+        self.assertIsNotNone(Dataset.objects.get(id=datasets[2].id).aggregates)
+
+        entries = {entry['id']: entry for entry in body['datasets']}
+        first, baseline = entries[str(datasets[0].id)], entries[str(datasets[1].id)]
+        self.assertAlmostEqual(first['delta']['Flowrate']['mean'],
+                               first['stats']['Flowrate']['mean'] - baseline['stats']['Flowrate']['mean'])
+        self.assertEqual(baseline['delta']['Flowrate']['mean'], 0)
+
+    @override_settings(COMPARE_MAX_DATASETS=2)
+    def test_bad_requests(self):
+        dataset = self.upload_dataset(csv_bytes(self.frames[2]))
+        other = Dataset.objects.create(user=create_user('bob'), filename='b.csv', summary={}, file_path='')
+        for params, code in (({}, 400),
+                             ({'ids': 'a,b,c'}, 400),
+                             ({'ids': dataset.id, 'baseline': 'x'}, 400),
+                             ({'ids': f'{dataset.id},{other.id}'}, 404)):
+            self.assertEqual(self.client.get('/api/datasets/compare/', params).status_code, code, params)
+
+
+@override_settings(HISTORY_PAGE_MAX=20)
+class HistoryTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_token(self.user)}')
+        start = timezone.now() - timedelta(days=1)
+        # Two pairs of datasets share an upload time: ordered by id within it
+        times = [start, start + timedelta(hours=1), start + timedelta(hours=1), start + timedelta(hours=2),
+                 start + timedelta(hours=3), start + timedelta(hours=3), start + timedelta(hours=4)]
+        self.datasets = [self.create(f'{i}.csv', at) for i, at in enumerate(times)]
+        self.create('bob.csv', start, user=create_user('bob'))
+
+    def create(self, filename, uploaded_at, user=None):
+        return Dataset.objects.create(user=user or self.user, filename=filename, uploaded_at=uploaded_at,
+                                      summary={'equipment_count': 1}, file_path='')
+
+    def expected_order(self):
+        return [str(d.id) for d in sorted(self.datasets, key=lambda d: (d.uploaded_at, str(d.id)), reverse=True)]
+
+    def test_cursor_pages_cover_every_dataset_once(self):
+        url, seen, pages = '/api/history/?limit=2&summary=false', [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertTrue(all(set(entry) == {'id', 'filename', 'uploaded_at'} for entry in body))
+            seen += [entry['id'] for entry in body]
+            pages += 1
+            link = response.get('Link')
+            url = link[1:link.index('>')] if link else None
+        self.assertEqual(seen, self.expected_order())
+        self.assertEqual(pages, 4)
+
+    def test_unchanged_history_is_not_modified(self):
+        response = self.client.get('/api/history/')
+        self.assertEqual([entry['id'] for entry in response.json()], self.expected_order()[:settings.DATASET_QUOTA])
+        self.assertIn('summary', response.json()[0])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Each query string is its own representation
+        self.assertNotEqual(self.client.get('/api/history/?limit=3')['ETag'], etag)
+
+        self.datasets.append(self.create('new.csv', timezone.now()))
+        response = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['filename'], 'new.csv')
+
+        etag = response['ETag']
+        self.datasets.pop(2).delete()
+        self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_parameters(self):
+        for query in ('limit=0', 'limit=21', 'limit=x', 'cursor=%25%25'):
+            self.assertEqual(self.client.get(f'/api/history/?{query}').status_code, 400, query)
+
+
+class RangeTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(5000)
+        # Whole numbers: plenty of ties at every cut
+        self.frame['Flowrate'] = self.frame['Flowrate'].round(0)
+        self.frame['Pressure'] = self.frame['Pressure'].round(0)
+        self.rows = frame_rows(self.frame)
+
+    def expected(self, column, low=None, high=None, type=None, order='asc', offset=0, limit=100):
+        values = self.frame[column].to_numpy(float)
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        if type is not None:
+            mask &= (self.frame['Type'] == type).to_numpy()
+        positions = np.flatnonzero(mask)
+        keys = -values[positions] if order == 'desc' else values[positions]
+        positions = positions[np.argsort(keys, kind='stable')]
+        return int(mask.sum()), [self.rows[i] for i in positions[offset:offset + limit]]
+
+    def check(self, dataset):
+        url = f'/api/datasets/{dataset.id}/range/'
+        for column, low, high in (('Flowrate', None, None), ('Flowrate', 100, 140), ('Pressure', 6, 6),
+                                  ('Pressure', None, 4), ('Pressure', 9, None), ('Pressure', 20, 30)):
+            for type in (None, 'Pump', 'Boiler'):
+                for order, offset, limit in (('asc', 0, 20), ('desc', 0, 20), ('desc', 37, 500), ('asc', 4990, 50)):
+                    params = {'column': column, 'order': order, 'offset': offset, 'limit': limit}
+                    params.update({k: v for k, v in (('min', low), ('max', high), ('type', type)) if v is not None})
+                    body = self.client.get(url, params).json()
+                    count, rows = self.expected(column, low, high, type, order, offset, limit)
+                    self.assertEqual(body['count'], count, params)
+                    self.assertEqual(body['rows'], rows, params)
+
+    def test_stored_indexes_match_a_numpy_filter(self):
+        dataset = self.upload_dataset(csv_bytes(self.frame))
+        self.assertIn('indexes', dataset.schema)
+        self.check(dataset)
+
+    def test_legacy_rows_match_a_numpy_filter(self):
+        self.check(Dataset.objects.create(user=self.user, filename='old.csv', summary={}, file_path='', data=self.rows))
+
+    def test_bad_parameters(self):
+        dataset = Dataset.objects.create(user=self.user, filename='old.csv', summary={}, file_path='',
+                                         data=self.rows[:10])
+        url = f'/api/datasets/{dataset.id}/range/'
+        for params in ({}, {'column': 'Type'}, {'column': 'Flowrate', 'order': 'up'},
+                       {'column': 'Flowrate', 'min': 'low'}, {'column': 'Flowrate', 'max': 'nan'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class CsvParsingTests(SimpleTestCase):
+    ENGINES = ('c', 'pyarrow')
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def ingest(self, content, engine, chunk_rows=4):
+        storage = self.tmp / 'datasets' / f'{engine}-{len(list(self.tmp.glob("datasets/*")))}'
+        with override_settings(DATASET_STORAGE_ROOT=self.tmp / 'datasets', INGEST_CSV_ENGINE=engine):
+            result = ingest_file(io.BytesIO(content), None, storage, chunk_rows=chunk_rows)
+        return result, DatasetColumns.open(storage, result.schema)
+
+    def test_extra_columns_are_pruned(self):
+        content = (b"Notes,Equipment Name, Type ,Flowrate,Pressure,Temperature,Site\n"
+                   b"first,Pump-1,Pump,120.5,5.2,110.2,North\n"
+                   b"\"a, b\",Valve-1,Valve,60,,95,South\n")
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine):
+                result, table = self.ingest(content, engine)
+                self.assertEqual(result.row_count, 2)
+                self.assertEqual(table.rows(), [
+                    {'Equipment Name': 'Pump-1', 'Type': 'Pump', 'Flowrate': 120.5, 'Pressure': 5.2, 'Temperature': 110.2},
+                    {'Equipment Name': 'Valve-1', 'Type': 'Valve', 'Flowrate': 60.0, 'Pressure': None, 'Temperature': 95.0},
+                ])
+
+    def test_engines_agree(self):
+        content = csv_bytes(equipment_frame(200))
+        (c_result, c_table), (arrow_result, arrow_table) = (self.ingest(content, e, 64) for e in self.ENGINES)
+        self.assertEqual(c_table.rows(), arrow_table.rows())
+        assert_summaries_close(self, arrow_result.summary, c_result.summary)
+
+    def test_non_numeric_values_are_parsed_again_leniently(self):
+        content = csv_bytes(equipment_frame(30)).replace(b'\n', b'\nOdd-1,Pump,n/a?,5,100\n', 1)
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine):
+                result, table = self.ingest(content, engine)
+                self.assertEqual(result.row_count, 31)
+                self.assertEqual(table.rows(slice(0, 1)), [
+                    {'Equipment Name': 'Odd-1', 'Type': 'Pump', 'Flowrate': None, 'Pressure': 5.0, 'Temperature': 100.0},
+                ])
+                self.assertEqual(result.summary['stats']['Flowrate']['nulls'],
+                                 1 + int(equipment_frame(30)['Flowrate'].isna().sum()))
+
+    def test_parse_errors(self):
+        header = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+        cases = (
+            (header + b"Pump-1,Pump,1,2,3\nPump-2,Pump,\"4,5,6\n", 'Malformed CSV'),
+            (header + b"Pump-\xff,Pump,1,2,3\n", 'File is not UTF-8 encoded text'),
+            (b"Equipment Name,Type,Flowrate\nPump-1,Pump,1\n", 'File must contain columns'),
+        )
+        for engine in self.ENGINES:
+            for content, message in cases:
+                with self.subTest(engine=engine, message=message):
+                    with self.assertRaises(IngestError) as caught:
+                        self.ingest(content, engine)
+                    self.assertTrue(str(caught.exception).startswith(message), caught.exception)
+
+        # Surplus fields: pyarrow rejects the row, the C parser drops the extra values
+        surplus = header + b"Pump-1,Pump,1,2,3\nPump-2,Pump,1,2,3,4,5\n"
+        with self.assertRaisesRegex(IngestError, '^Malformed CSV at line 3'):
+            self.ingest(surplus, 'pyarrow')
+        self.assertEqual(self.ingest(surplus, 'c')[0].row_count, 2)
+
+
+class UploadFormatTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(120)
+        self.frame.insert(0, 'Notes', 'spare')
+
+    def rows(self, dataset):
+        return self.client.get(f'/api/datasets/{dataset.id}/rows/', {'limit': 1000}).json()['rows']
+
+    def excel_bytes(self, frame):
+        buffer = io.BytesIO()
+        frame.to_excel(buffer, index=False)
+        return buffer.getvalue()
+
+    def parquet_bytes(self, frame):
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    def test_excel_and_parquet_match_csv(self):
+        expected = frame_rows(self.frame.drop(columns='Notes'))
+        csv = self.upload_dataset(csv_bytes(self.frame))
+        for content, name in ((self.excel_bytes(self.frame), 'equipment.xlsx'),
+                              (self.parquet_bytes(self.frame), 'equipment.parquet')):
+            with self.subTest(name=name):
+                dataset = self.upload_dataset(content, name)
+                self.assertEqual(self.rows(dataset), expected)
+                assert_summaries_close(self, dataset.summary, csv.summary)
+
+    def test_unreadable_or_incomplete_files_are_rejected(self):
+        for content, name, message in (
+                (b'not a zip', 'equipment.xlsx', 'File is not a readable .xlsx workbook'),
+                (b'PAR1 not parquet', 'equipment.parquet', 'File is not a readable Parquet file'),
+                (self.excel_bytes(self.frame.drop(columns='Pressure')), 'equipment.xlsx', 'File must contain columns'),
+                (self.parquet_bytes(self.frame.drop(columns='Type')), 'equipment.parquet', 'File must contain columns'),
+                (b'a,b', 'equipment.txt', 'Only CSV (.csv, .csv.gz, .csv.zst), Excel (.xlsx) and Parquet')):
+            with self.subTest(name=name, message=message):
+                response = self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, content)},
+                                            format='multipart')
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['detail'].startswith(message), response.json())
+        self.assertFalse(UploadJob.objects.exists())
+
+
+class CompressedUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = csv_bytes(equipment_frame(300))
+
+    def rows(self, dataset):
+        return self.client.get(f'/api/datasets/{dataset.id}/rows/', {'limit': 1000}).json()['rows']
+
+    def compressed(self):
+        import zstandard
+        # Several zstd frames, as a streaming compressor may write
+        half = len(self.content) // 2
+        zstd = b''.join(zstandard.ZstdCompressor().compress(part)
+                        for part in (self.content[:half], self.content[half:]))
+        return ((gzip.compress(self.content), 'equipment.csv.gz'), (zstd, 'equipment.CSV.ZST'))
+
+    def test_compressed_csv_matches_plain(self):
+        plain = self.upload_dataset(self.content)
+        for content, name in self.compressed():
+            with self.subTest(name=name):
+                dataset = self.upload_dataset(content, name)
+                self.assertEqual(self.rows(dataset), self.rows(plain))
+                self.assertEqual(dataset.summary, plain.summary)
+                # Kept as uploaded
+                self.assertEqual(Path(dataset.file_path).read_bytes(), content)
+
+    def test_corrupt_archives(self):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('bad.csv.gz', b'plain text')},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('File is not valid gzip data'), response.json())
+
+        truncated = gzip.compress(self.content)[:-200]
+        job_id = self.upload(truncated, 'cut.csv.gz')
+        self.process_jobs()
+        job = UploadJob.objects.get(id=job_id)
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertTrue(job.error.startswith('File is not valid gzip data'), job.error)
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_originals_can_be_stored_compressed(self):
+        import zstandard
+        for compression, decompress in (('gzip', gzip.decompress),
+                                        ('zstd', lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data))):
+            with self.subTest(compression=compression), override_settings(UPLOAD_COMPRESSION=compression):
+                dataset = self.upload_dataset(self.content + compression.encode() + b'-1,Pump,1,2,3\n')
+                path = Path(dataset.file_path)
+                self.assertEqual(path.suffix, {'gzip': '.gz', 'zstd': '.zst'}[compression])
+                self.assertTrue(decompress(path.read_bytes()).startswith(self.content))
+                self.assertFalse(path.with_suffix('').exists())
+                self.assertEqual(len(self.rows(dataset)), 301)
+
+
+class ResponseEncodingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(400)
+        self.dataset = self.upload_dataset(csv_bytes(self.frame))
+        self.url = f'/api/datasets/{self.dataset.id}/rows/?limit=400'
+        self.plain = self.client.get(self.url).json()
+
+    def test_brotli_and_gzip(self):
+        import brotli
+        for accept, encoding, decompress in (('gzip, deflate, br', 'br', brotli.decompress),
+                                             ('gzip', 'gzip', gzip.decompress)):
+            with self.subTest(encoding=encoding):
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(int(response['Content-Length']), len(response.content))
+                self.assertEqual(json.loads(decompress(response.content)), self.plain)
+                # The compressed body is a weak variant of the same representation
+                etag = response['ETag']
+                self.assertTrue(etag.startswith('W/"'))
+                revalidated = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(revalidated.status_code, 304)
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        small = self.client.get('/api/datasets/missing/rows/', HTTP_ACCEPT_ENCODING='br')
+        self.assertLess(len(small.content), 200)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_msgpack_is_negotiated_by_quality(self):
+        import msgpack
+        for accept, expected in (('application/msgpack, application/json;q=0.9', 'application/msgpack'),
+                                 ('application/json, application/msgpack;q=0.9', 'application/json'),
+                                 ('application/json;q=0.5, application/msgpack;q=0.8', 'application/msgpack'),
+                                 ('text/csv, application/msgpack;q=0.1', 'application/msgpack'),
+                                 ('*/*', 'application/json')):
+            with self.subTest(accept=accept):
+                response = self.client.get(self.url, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(expected), response['Content-Type'])
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT='application/msgpack;q=0, text/csv').status_code, 406)
+
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertNotEqual(response['ETag'], self.client.get(self.url)['ETag'])
+        body = msgpack.unpackb(response.content)
+        self.assertEqual({k: body[k] for k in ('count', 'offset', 'limit')}, {'count': 400, 'offset': 0, 'limit': 400})
+        columns = body['rows']['columns']
+        self.assertEqual(body['rows']['length'], 400)
+        np.testing.assert_array_equal(np.frombuffer(columns['Pressure'], '<f8'), self.frame['Pressure'].to_numpy(float))
+        codes = np.frombuffer(columns['Type']['codes'], '<i4')
+        types = [columns['Type']['categories'][c] if c >= 0 else None for c in codes]
+        self.assertEqual(types, [row['Type'] for row in self.plain['rows']])
+        self.assertEqual(columns['Equipment Name'], [row['Equipment Name'] for row in self.plain['rows']])
+
+
+class MetricsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = issue_token(self.user)
+        self.client.credentials()
+
+    def metrics(self, authorization=None):
+        headers = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        return self.client.get('/api/metrics/', **headers)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_need_a_login_without_a_token(self):
+        self.assertEqual(self.metrics().status_code, 401)
+        self.assertEqual(self.metrics('Bearer nonsense').status_code, 401)
+        response = self.metrics(f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram', response.content)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.metrics().status_code, 401)
+        self.assertEqual(self.metrics(f'Bearer {self.token}').status_code, 401)
+        self.assertEqual(self.metrics('Bearer scrape-secre').status_code, 401)
+        response = self.metrics('Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_server_timing(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        dataset = self.upload_dataset(csv_bytes(equipment_frame(50)))
+        response = self.client.get(f'/api/datasets/{dataset.id}/query/', {'where': 'Flowrate > 100'})
+        timing = response['Server-Timing']
+        for part in ('query.filter;dur=', 'query.summary;dur=', 'db;desc="', 'total;dur='):
+            self.assertIn(part, timing)
+        self.assertIn('total;dur=', self.client.get('/api/datasets/missing/').get('Server-Timing', ''))
+        scraped = self.metrics(f'Bearer {self.token}').content.decode()
+        self.assertIn('view="dataset_query"', scraped)
+        self.assertIn('span="query.filter"', scraped)
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_profiling_is_opt_in(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.get('/api/history/', HTTP_X_PROFILE='1')
+        self.assertEqual(response['X-Profiled-Status'], '200')
+        self.assertIn(b'function calls', response.content)
+        with override_settings(REQUEST_PROFILING=False):
+            response = self.client.get('/api/history/', HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('X-Profiled-Status'))
@@ -3,10 +3,22 @@ from . import views
 
 urlpatterns = [
     path('', views.RootAPIView.as_view(), name='root'),
+    path('metrics/', views.MetricsAPIView.as_view(), name='metrics'),
     path('auth/register/', views.RegisterAPIView.as_view(), name='register'),
     path('auth/login/', views.LoginAPIView.as_view(), name='login'),
     path('upload/', views.UploadAPIView.as_view(), name='upload'),
+    path('uploads/', views.UploadSessionCreateAPIView.as_view(), name='upload_session_create'),
+    path('uploads/<str:session_id>/', views.UploadSessionAPIView.as_view(), name='upload_session'),
+    path('uploads/<str:session_id>/chunks/<int:index>/', views.UploadChunkAPIView.as_view(), name='upload_chunk'),
+    path('uploads/<str:session_id>/finalize/', views.UploadSessionFinalizeAPIView.as_view(),
+         name='upload_session_finalize'),
+    path('jobs/<str:job_id>/', views.UploadJobAPIView.as_view(), name='upload_job'),
+    path('datasets/compare/', views.DatasetCompareAPIView.as_view(), name='dataset_compare'),
     path('datasets/<str:dataset_id>/', views.DatasetDetailAPIView.as_view(), name='dataset_detail'),
+    path('datasets/<str:dataset_id>/rows/', views.DatasetRowsAPIView.as_view(), name='dataset_rows'),
+    path('datasets/<str:dataset_id>/query/', views.DatasetQueryAPIView.as_view(), name='dataset_query'),
+    path('datasets/<str:dataset_id>/range/', views.DatasetRangeAPIView.as_view(), name='dataset_range'),
+    path('datasets/<str:dataset_id>/aggregate/', views.DatasetAggregateAPIView.as_view(), name='dataset_aggregate'),
     path('history/', views.HistoryAPIView.as_view(), name='history'),
     path('report/pdf/<str:dataset_id>/', views.PDFReportAPIView.as_view(), name='pdf_report'),
 ]
\ No newline at end of file
@@ -2,21 +2,35 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ParseError
 from django.http import Http404, HttpResponse
 from django.http import FileResponse
 from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.urls import reverse
+import base64
+import binascii
+import hashlib
+import hmac
 import os
-import uuid
-import pandas as pd
-import io
+from datetime import datetime
+import numpy as np
 from pathlib import Path
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from .models import Dataset
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from . import aggregate, chunked, jobs, metrics
+from .authentication import issue_token
+from .compare import compare
+from .ingest import IngestError, upload_format, validate_header
+from .reports import get_report
+from .models import Dataset, UploadJob, UploadSession
+from .metrics import span
+from .query import QueryError, filter_index
+from .storage import NUMERIC_COLUMNS, REQUIRED_COLUMNS, open_dataset, ordered_index, range_index, sort_keys
+from .summary import summarize_rows
 from .models import AppUser
-from .serializers import UserSerializer, UserCreateSerializer, UserLoginSerializer, DatasetSerializer, DatasetDetailSerializer
+from .serializers import UserSerializer, UserCreateSerializer, UserLoginSerializer, DatasetSerializer, DatasetListSerializer, DatasetDetailSerializer, UploadJobSerializer
 
 
 class RootAPIView(APIView):
@@ -24,7 +38,28 @@ class RootAPIView(APIView):
         return Response({"message": "Chemical Equipment Parameter Visualizer API"})
 
 
+class MetricsAPIView(APIView):
+    # Prometheus scrape target (text exposition format), see api.metrics.
+    # Scrapers present METRICS_TOKEN; without one configured, a user token.
+    permission_classes = (IsAuthenticated,)
+
+    def get_authenticators(self):
+        return [] if settings.METRICS_TOKEN else super().get_authenticators()
+
+    def get_permissions(self):
+        return [] if settings.METRICS_TOKEN else super().get_permissions()
+
+    def get(self, request):
+        if settings.METRICS_TOKEN:
+            expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+            if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+                return HttpResponse("Invalid metrics token\n", status=401, content_type='text/plain')
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class RegisterAPIView(APIView):
+    authentication_classes = ()
+
     def post(self, request):
         serializer = UserCreateSerializer(data=request.data)
         if serializer.is_valid():
@@ -46,6 +81,8 @@ class RegisterAPIView(APIView):
 
 
 class LoginAPIView(APIView):
+    authentication_classes = ()
+
     def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
@@ -59,215 +96,561 @@ class LoginAPIView(APIView):
             return Response({
                 "message": "Login successful",
                 "user_id": user.id,
-                "token": f"user_{user.id}"
+                "token": issue_token(user)
             }, status=200)
         else:
             return Response({"error": "Invalid password"}, status=400)
 
 
+UNSUPPORTED_FORMAT = "Only CSV (.csv, .csv.gz, .csv.zst), Excel (.xlsx) and Parquet files are allowed"
+
+
 class UploadAPIView(APIView):
     parser_classes = (MultiPartParser, FormParser)
+    permission_classes = (IsAuthenticated,)
 
     def post(self, request):
-        # Extract token from form data or header
-        token = request.data.get('token')
-        if not token:
-            auth_header = request.headers.get('Authorization', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-
-        if not token or not token.startswith('user_'):
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-
-        user_id = token.split('_')[1]
-        try:
-            user = AppUser.objects.get(id=user_id)
-        except AppUser.DoesNotExist:
-            return Response({"error": "Invalid user"}, status=status.HTTP_401_UNAUTHORIZED)
+        user = request.user
 
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({"detail": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not file_obj.name.endswith('.csv'):
-            return Response({"detail": "Only CSV files are allowed"}, status=status.HTTP_400_BAD_REQUEST)
+        if upload_format(file_obj.name) is None:
+            return Response({"detail": UNSUPPORTED_FORMAT}, status=status.HTTP_400_BAD_REQUEST)
+        return accept_upload(request, user, file_obj)
+
+
+def accept_upload(request, user, file_obj):
+    try:
+        validate_header([col.strip() for col in upload_format(file_obj.name).header(file_obj)])
+    except IngestError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Parsing, summary and storage run in the background; clients poll the job.
+    # Re-uploads of identical content reuse the stored dataset instead.
+    try:
+        with span('upload.hash'):
+            digest = jobs.content_hash(file_obj)
+        job = jobs.reuse_duplicate(user, file_obj, digest)
+        if job is None:
+            with span('upload.stage'):
+                job = jobs.create_job(user, file_obj, digest)
+            jobs.submit(job)
+    except Exception as e:
+        return Response({"detail": f"Error processing file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        "message": "File accepted for processing",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": request.build_absolute_uri(reverse('upload_job', args=[job.id])),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def upload_session_status(request, session):
+    return {
+        "id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": chunked.chunk_count(session),
+        "received": chunked.received(session),
+        "finalize_url": request.build_absolute_uri(reverse('upload_session_finalize', args=[session.id])),
+    }
+
+
+class UploadSessionCreateAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        user = request.user
 
+        # {"filename", "size", "chunk_size" (optional), "sha256" (optional, checked on finalize)}
+        filename = str(request.data.get('filename', ''))
+        if upload_format(filename) is None:
+            return Response({"detail": UNSUPPORTED_FORMAT}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            contents = file_obj.read()
-            df = pd.read_csv(io.BytesIO(contents))
-
-            # Validate CSV
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            if not all(col in df.columns for col in required_columns):
-                return Response({
-                    "detail": "CSV must contain columns: Equipment Name, Type, Flowrate, Pressure, Temperature"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Compute summary
-            summary = self.compute_summary(df)
-
-            # Save file
-            upload_dir = Path(settings.MEDIA_ROOT)
-            upload_dir.mkdir(exist_ok=True)
-            file_path = upload_dir / f"{uuid.uuid4()}_{file_obj.name}"
-            with open(file_path, 'wb') as f:
-                f.write(contents)
-
-            # Create dataset record
-            dataset = Dataset(
-                filename=file_obj.name,
-                summary=summary,
-                file_path=str(file_path),
-                data=df.to_dict('records'),
-                user=user
-            )
-            dataset.save()
-
-            # Keep only last 5 datasets per user
-            user_datasets = Dataset.objects.filter(user=user).order_by('-uploaded_at')
-            if user_datasets.count() > 5:
-                for old_dataset in user_datasets[5:]:
-                    # Delete file
-                    old_file_path = Path(old_dataset.file_path)
-                    if old_file_path.exists():
-                        old_file_path.unlink()
-                    old_dataset.delete()
-            
-            return Response({
-                "message": "File uploaded successfully",
-                "dataset_id": dataset.id,
-                "summary": summary,
-                "data": df.to_dict('records')[:100]  # Return first 100 rows
-            }, status=status.HTTP_201_CREATED)
-        
-        except Exception as e:
-            return Response({"detail": f"Error processing file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def compute_summary(self, df):
-        summary = {
-            'equipment_count': len(df),
-            'avg_flowrate': float(df['Flowrate'].mean()),
-            'avg_pressure': float(df['Pressure'].mean()),
-            'avg_temperature': float(df['Temperature'].mean()),
-            'type_distribution': df['Type'].value_counts().to_dict(),
-            'min_flowrate': float(df['Flowrate'].min()),
-            'max_flowrate': float(df['Flowrate'].max()),
-            'min_pressure': float(df['Pressure'].min()),
-            'max_pressure': float(df['Pressure'].max()),
-            'min_temperature': float(df['Temperature'].min()),
-            'max_temperature': float(df['Temperature'].max()),
-        }
-        return summary
+            size = int(request.data.get('size'))
+            chunk_size = int(request.data.get('chunk_size') or settings.UPLOAD_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response({"detail": "size and chunk_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = chunked.create_session(user, filename, size, chunk_size, str(request.data.get('sha256') or ''))
+        except chunked.ChunkError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload_session_status(request, session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, session_id):
+        # Which chunks arrived, for resuming an interrupted upload
+        user = request.user
+
+        try:
+            session = UploadSession.objects.get(id=session_id, user=user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+        return Response(upload_session_status(request, session))
+
+    def delete(self, request, session_id):
+        user = request.user
+
+        try:
+            session = UploadSession.objects.get(id=session_id, user=user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+        chunked.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def put(self, request, session_id, index):
+        user = request.user
+
+        try:
+            session = UploadSession.objects.get(id=session_id, user=user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+        # The raw body is the chunk; it is streamed to disk, never parsed
+        try:
+            chunked.write_chunk(session, index, request.stream, request.headers.get('X-Chunk-SHA256', ''))
+        except chunked.ChunkError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"index": index}, status=status.HTTP_200_OK)
+
+
+class UploadSessionFinalizeAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, session_id):
+        user = request.user
+
+        try:
+            session = UploadSession.objects.get(id=session_id, user=user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+        try:
+            file_obj = chunked.assemble(session)
+        except chunked.ChunkError as e:
+            return Response({"detail": str(e), "received": chunked.received(session)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Same as a single-request upload from here on; the session is done
+        # either way (the part file was moved into place or is not needed)
+        with file_obj:
+            response = accept_upload(request, user, file_obj)
+        chunked.discard(session)
+        return response
+
+
+class UploadJobAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job_id):
+        user = request.user
+
+        try:
+            job = UploadJob.objects.select_related('dataset').defer('dataset__data').get(id=job_id, user=user)
+        except UploadJob.DoesNotExist:
+            raise Http404
+        return Response(UploadJobSerializer(job).data)
+
+
+def dataset_etag(request, dataset):
+    # Datasets never change once uploaded, so the ETag of a response about one
+    # only depends on which dataset, the query and the negotiated format
+    return quote_etag(hashlib.sha256(
+        f"{dataset.id}|{dataset.content_hash}|{dataset.uploaded_at}|"
+        f"{request.accepted_media_type}|{request.get_full_path()}".encode('utf-8')
+    ).hexdigest()[:32])
+
+
+def conditional(request, etag, build):
+    # 304 when the client's copy (If-None-Match) is current, else build()
+    response = get_conditional_response(request, etag=etag) or build()
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 class DatasetDetailAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
     def get(self, request, dataset_id):
-        # Extract token and get user
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        token = auth_header.split(' ')[1]
-        if not token.startswith('user_'):
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-        user_id = token.split('_')[1]
+        user = request.user
+
+        # ?data=false returns metadata and summary only; rows are paged via /rows/
+        include_data = request.query_params.get('data', 'true').lower() not in ('0', 'false', 'no')
         try:
-            user = AppUser.objects.get(id=user_id)
-        except AppUser.DoesNotExist:
-            return Response({"error": "Invalid user"}, status=status.HTTP_401_UNAUTHORIZED)
+            if include_data:
+                dataset = Dataset.objects.get(id=dataset_id, user=user)
+                serializer_class = DatasetDetailSerializer
+            else:
+                dataset = Dataset.objects.defer('data').get(id=dataset_id, user=user)
+                serializer_class = DatasetSerializer
+        except Dataset.DoesNotExist:
+            raise Http404
+        return conditional(request, dataset_etag(request, dataset),
+                           lambda: Response(serializer_class(dataset).data))
+
+
+def parse_page(params):
+    """Read ?offset=&limit= and keep limit within ROWS_PAGE_MAX; raises ParseError (400)."""
+    try:
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', settings.ROWS_PAGE_SIZE))
+    except ValueError:
+        raise ParseError("offset and limit must be integers")
+    if offset < 0 or not 0 < limit <= settings.ROWS_PAGE_MAX:
+        raise ParseError(f"offset must be >= 0 and limit between 1 and {settings.ROWS_PAGE_MAX}")
+    return offset, limit
+
+
+def parse_columns(params, schema):
+    """Read ?columns=a,b and ?sort=[-]col, both checked against schema; raises ParseError (400)."""
+    columns = [c.strip() for c in params.get('columns', '').split(',') if c.strip()] or list(schema)
+    sort = params.get('sort', '').strip()
+    unknown = [c for c in columns + ([sort.lstrip('-')] if sort else []) if c not in schema]
+    if unknown:
+        raise ParseError(f"Unknown column(s): {', '.join(unknown)}. Available: {', '.join(schema)}")
+    return columns, sort
+
+
+def page_links(request, offset, limit, total):
+    """next/previous URLs for a page, keeping the rest of the query string."""
+    def page_url(page_offset):
+        query = request.query_params.copy()
+        query['offset'] = page_offset
+        query['limit'] = limit
+        return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return {
+        "next": page_url(offset + limit) if offset + limit < total else None,
+        "previous": page_url(max(offset - limit, 0)) if offset > 0 else None,
+    }
+
+
+class DatasetRowsAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, dataset_id):
+        user = request.user
 
         try:
-            dataset = Dataset.objects.get(id=dataset_id, user=user)
-            serializer = DatasetDetailSerializer(dataset)
-            return Response(serializer.data)
+            dataset = Dataset.objects.defer('summary').get(id=dataset_id, user=user)
         except Dataset.DoesNotExist:
             raise Http404
 
+        params = request.query_params
+        offset, limit = parse_page(params)
+        columns, sort = parse_columns(params, REQUIRED_COLUMNS)
+        sort_column = sort.lstrip('-')
+
+        def page():
+            # Only the requested page is read from the memory-mapped columns
+            table = open_dataset(dataset)
+            count = len(table)
+            stop = min(offset + limit, count)
+            if offset >= count:
+                rows = table.block(slice(0, 0), columns)
+            elif sort:
+                with span('rows.sort'):
+                    index = ordered_index(table, sort_column, descending=sort.startswith('-'), stop=stop)[offset:stop]
+                rows = table.block(index, columns)
+            else:
+                rows = table.block(slice(offset, stop), columns)
+
+            return Response({
+                "count": count,
+                "offset": offset,
+                "limit": limit,
+                "columns": columns,
+                **page_links(request, offset, limit, count),
+                "rows": rows,
+            })
+
+        return conditional(request, dataset_etag(request, dataset), page)
+
+
+class DatasetQueryAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, dataset_id):
+        user = request.user
+
+        try:
+            dataset = Dataset.objects.defer('data', 'summary').get(id=dataset_id, user=user)
+        except Dataset.DoesNotExist:
+            raise Http404
+
+        # ?where=<expression> (see api.query), paged and sorted like /rows/
+        params = request.query_params
+        where = params.get('where', '').strip()
+        if not where:
+            return Response({"detail": "where is required, e.g. where=Type = 'Pump' AND Pressure > 6"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        offset, limit = parse_page(params)
+        columns, sort = parse_columns(params, REQUIRED_COLUMNS)
+        sort_column = sort.lstrip('-')
+
+        table = open_dataset(dataset)
+        try:
+            with span('query.filter'):
+                index = filter_index(table, where)
+        except QueryError as e:
+            return Response({"detail": f"Invalid expression: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if sort:
+            with span('query.sort'):
+                keys = sort_keys(table, sort_column)[index]
+                index = index[np.argsort(-keys if sort.startswith('-') else keys, kind='stable')]
+
+        count = len(index)
+        stop = min(offset + limit, count)
+        rows = table.block(index[offset:stop], columns)
+        with span('query.summary'):
+            summary = summarize_rows(table, index)
+
+        return Response({
+            "where": where,
+            "count": count,
+            "total": len(table),
+            "offset": offset,
+            "limit": limit,
+            "columns": columns,
+            **page_links(request, offset, limit, count),
+            "rows": rows,
+            "summary": summary,
+        })
+
+
+class DatasetRangeAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, dataset_id):
+        user = request.user
+
+        try:
+            dataset = Dataset.objects.defer('data', 'summary').get(id=dataset_id, user=user)
+        except Dataset.DoesNotExist:
+            raise Http404
+
+        # ?column=Pressure&min=5&max=8 lists rows by value from the sorted
+        # indexes; min/max are inclusive and optional, ?type= keeps one type
+        # and ?order=desc&limit=20 is a top-K ("hottest 20 exchangers").
+        params = request.query_params
+        column = params.get('column', '')
+        if column not in NUMERIC_COLUMNS:
+            return Response({"detail": f"column must be one of: {', '.join(NUMERIC_COLUMNS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        order = params.get('order', 'asc').lower()
+        if order not in ('asc', 'desc'):
+            return Response({"detail": "order must be asc or desc"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            low = float(params['min']) if params.get('min') else None
+            high = float(params['max']) if params.get('max') else None
+        except ValueError:
+            low = high = float('nan')
+        if low != low or high != high:
+            return Response({"detail": "min and max must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        offset, limit = parse_page(params)
+        columns, _ = parse_columns(params, REQUIRED_COLUMNS)
+
+        table = open_dataset(dataset)
+        type_label = params.get('type')
+        stop = offset + limit
+        if type_label and type_label not in table.type_categories:
+            count, index = 0, []
+        else:
+            type_code = table.type_categories.index(type_label) if type_label else None
+            with span('range.lookup'):
+                count, index = range_index(table, column, low, high, type_code, order == 'desc', stop)
+        rows = table.block(index[offset:stop], columns)
+
+        return Response({
+            "column": column,
+            "min": low,
+            "max": high,
+            "type": type_label or None,
+            "order": order,
+            "count": count,
+            "offset": offset,
+            "limit": limit,
+            "columns": columns,
+            **page_links(request, offset, limit, count),
+            "rows": rows,
+        })
+
+
+class DatasetAggregateAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, dataset_id):
+        user = request.user
+
+        try:
+            dataset = Dataset.objects.defer('data', 'summary').get(id=dataset_id, user=user)
+        except Dataset.DoesNotExist:
+            raise Http404
+
+        # ?histogram=Flowrate,Pressure&bins=30  ?density=Pressure,Temperature&density_bins=30
+        # ?boxplot=Flowrate (per Type)           ?series=Temperature&points=500 (LTTB)
+        params = request.query_params
+        requested = {
+            kind: [c.strip() for c in params.get(kind, '').split(',') if c.strip()]
+            for kind in ('histogram', 'density', 'boxplot', 'series')
+        }
+        if not any(requested.values()):
+            return Response({
+                "detail": "Request at least one of histogram, density, boxplot or series"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        unknown = [c for cols in requested.values() for c in cols if c not in NUMERIC_COLUMNS]
+        if unknown:
+            return Response({
+                "detail": f"Unknown column(s): {', '.join(unknown)}. Available: {', '.join(NUMERIC_COLUMNS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if requested['density'] and len(requested['density']) != 2:
+            return Response({"detail": "density takes two columns, e.g. density=Pressure,Temperature"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            bins = int(params.get('bins', settings.AGGREGATE_BINS))
+            density_bins = int(params.get('density_bins', settings.AGGREGATE_BINS))
+            points = int(params.get('points', settings.AGGREGATE_POINTS))
+        except ValueError:
+            return Response({"detail": "bins, density_bins and points must be integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (0 < bins <= settings.AGGREGATE_MAX_BINS and 0 < density_bins <= settings.AGGREGATE_MAX_BINS):
+            return Response({"detail": f"bins must be between 1 and {settings.AGGREGATE_MAX_BINS}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 3 <= points <= settings.AGGREGATE_MAX_POINTS:
+            return Response({"detail": f"points must be between 3 and {settings.AGGREGATE_MAX_POINTS}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        table = open_dataset(dataset)
+        result = {"count": len(table)}
+        with span('aggregate'):
+            if requested['histogram']:
+                result['histograms'] = {col: aggregate.histogram(table, col, bins) for col in requested['histogram']}
+            if requested['density']:
+                result['density'] = aggregate.density(table, *requested['density'], density_bins)
+            if requested['boxplot']:
+                result['boxplots'] = {col: aggregate.boxplot(table, col) for col in requested['boxplot']}
+            if requested['series']:
+                result['series'] = {col: aggregate.series(table, col, points) for col in requested['series']}
+        return Response(result)
+
+
+class DatasetCompareAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        user = request.user
+
+        # ?ids=<id>,<id>,...[&baseline=<id>]
+        ids = list(dict.fromkeys(i.strip() for i in request.query_params.get('ids', '').split(',') if i.strip()))
+        baseline = request.query_params.get('baseline') or None
+        if not ids:
+            return Response({"detail": "ids is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.COMPARE_MAX_DATASETS:
+            return Response({"detail": f"At most {settings.COMPARE_MAX_DATASETS} datasets can be compared"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if baseline is not None and baseline not in ids:
+            return Response({"detail": "baseline must be one of ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the stored aggregates are needed, not rows or summaries
+        found = {str(d.id): d for d in Dataset.objects.defer('data', 'summary').filter(user=user, id__in=ids)}
+        missing = [i for i in ids if i not in found]
+        if missing:
+            return Response({"detail": f"Dataset(s) not found: {', '.join(missing)}"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(compare([found[i] for i in ids], baseline=baseline))
+
+
+def encode_cursor(dataset):
+    # Position after `dataset` in (-uploaded_at, -id) order
+    raw = f"{dataset.uploaded_at.isoformat()}|{dataset.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        uploaded_at, _, last_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').partition('|')
+        return datetime.fromisoformat(uploaded_at), last_id
+    except (UnicodeError, binascii.Error) as e:
+        raise ValueError(str(e))
+
 
 class HistoryAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
     def get(self, request):
-        # Extract token and get user
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        token = auth_header.split(' ')[1]
-        if not token.startswith('user_'):
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-        user_id = token.split('_')[1]
-        try:
-            user = AppUser.objects.get(id=user_id)
-        except AppUser.DoesNotExist:
-            return Response({"error": "Invalid user"}, status=status.HTTP_401_UNAUTHORIZED)
+        user = request.user
 
-        datasets = Dataset.objects.filter(user=user).order_by('-uploaded_at')[:5]
-        serializer = DatasetSerializer(datasets, many=True)
-        return Response(serializer.data)
+        # ?limit=N pages through the user's datasets newest first; the next
+        # page is linked from the Link header. ?summary=false lists only
+        # id, filename and upload time.
+        params = request.query_params
+        include_summary = params.get('summary', 'true').lower() not in ('0', 'false', 'no')
+        try:
+            limit = int(params.get('limit', settings.DATASET_QUOTA))
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < limit <= settings.HISTORY_PAGE_MAX:
+            return Response({"detail": f"limit must be between 1 and {settings.HISTORY_PAGE_MAX}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        datasets = Dataset.objects.filter(user=user)
+        # One indexed aggregate decides whether the client's copy is still current
+        state = datasets.aggregate(latest=Max('uploaded_at'), count=Count('id'))
+        etag = quote_etag(hashlib.sha256(
+            f"{state['latest']}|{state['count']}|{request.get_full_path()}".encode('utf-8')
+        ).hexdigest()[:32])
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            cursor = params.get('cursor')
+            if cursor:
+                try:
+                    uploaded_at, last_id = decode_cursor(cursor)
+                except ValueError:
+                    return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+                datasets = datasets.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=last_id))
+            fields = ['id', 'filename', 'uploaded_at'] + (['summary'] if include_summary else [])
+            page = list(datasets.only(*fields).order_by('-uploaded_at', '-id')[:limit + 1])
+            serializer_class = DatasetSerializer if include_summary else DatasetListSerializer
+            response = Response(serializer_class(page[:limit], many=True).data)
+            if len(page) > limit:
+                query = params.copy()
+                query['cursor'] = encode_cursor(page[limit - 1])
+                response['Link'] = f'<{request.build_absolute_uri(f"{request.path}?{query.urlencode()}")}>; rel="next"'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class PDFReportAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
     def get(self, request, dataset_id):
-        # Extract token and get user
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        token = auth_header.split(' ')[1]
-        if not token.startswith('user_'):
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-        user_id = token.split('_')[1]
-        try:
-            user = AppUser.objects.get(id=user_id)
-        except AppUser.DoesNotExist:
-            return Response({"error": "Invalid user"}, status=status.HTTP_401_UNAUTHORIZED)
+        user = request.user
 
         try:
-            dataset = Dataset.objects.get(id=dataset_id, user=user)
+            dataset = Dataset.objects.defer('data').get(id=dataset_id, user=user)
         except Dataset.DoesNotExist:
             raise Http404
 
-        # Generate PDF
-        upload_dir = Path(settings.MEDIA_ROOT)
-        pdf_path = upload_dir / f"report_{dataset_id}.pdf"
-        doc = SimpleDocTemplate(str(pdf_path), pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Title
-        title = Paragraph(f"<b>Equipment Report: {dataset.filename}</b>", styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-
-        # Summary
-        summary_text = f"""<b>Summary Statistics</b><br/>
-        Equipment Count: {dataset.summary['equipment_count']}<br/>
-        Average Flowrate: {dataset.summary['avg_flowrate']:.2f}<br/>
-        Average Pressure: {dataset.summary['avg_pressure']:.2f}<br/>
-        Average Temperature: {dataset.summary['avg_temperature']:.2f}<br/>
-        """
-        elements.append(Paragraph(summary_text, styles['Normal']))
-        elements.append(Spacer(1, 12))
-
-        # Type Distribution Table
-        type_dist = dataset.summary['type_distribution']
-        table_data = [['Equipment Type', 'Count']]
-        for eq_type, count in type_dist.items():
-            table_data.append([str(eq_type), str(count)])
-
-        table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table)
-
-        doc.build(elements)
-
-        # Return PDF as HTTP response with download headers
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="report_{dataset.filename}.pdf"'
-        response.write(open(pdf_path, 'rb').read())
+        # Cached report for this summary; rendered only on the first request
+        pdf_path, key = get_report(dataset)
+        etag = quote_etag(key)
+        last_modified = int(pdf_path.stat().st_mtime)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            # Stream the file instead of reading it into memory
+            response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf',
+                                    as_attachment=True, filename=f"report_{dataset.filename}.pdf")
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
         return response
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Requests/sec of GET /api/history/ with and without the user cache.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_auth --requests 2000
+
+Runs against a throwaway test database through Django's test client, so the
+numbers are framework + view cost without network. "uncached" resolves the
+user from the token with one query per request, as every view did before
+TokenAuthentication; "cached" serves it from the in-process LRU. With SQLite
+in memory the saved query is cheap; against a networked database each one
+also costs a round trip.
+"""
+import argparse
+import time
+
+from .common import print_table, setup_django
+
+
+def run(client, headers, requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    client.get('/api/history/', **headers)
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get('/api/history/', **headers)
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.content
+    return requests / elapsed, len(queries.captured_queries) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+    connection.creation.create_test_db(verbosity=0)
+
+    from api.authentication import issue_token, user_cache
+    from api.models import AppUser, Dataset
+
+    user = AppUser(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    user.save()
+    for i in range(5):
+        Dataset.objects.create(filename=f'bench_{i}.csv', summary={'equipment_count': 0}, user=user, file_path='')
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(user)}'}
+    client = Client()
+
+    maxsize = user_cache.maxsize
+    user_cache.maxsize = 0
+    user_cache.clear()
+    uncached = run(client, headers, args.requests)
+    user_cache.maxsize = maxsize
+    cached = run(client, headers, args.requests)
+
+    print_table(['mode', 'req/s', 'queries/request'], [
+        ('uncached', f'{uncached[0]:.0f}', f'{uncached[1]:.1f}'),
+        ('cached', f'{cached[0]:.0f}', f'{cached[1]:.1f}'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Sorted indexes: build cost, size and range / top-K lookups against a scan.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_index --rows 100000 1000000
+
+"build" is build_indexes() on a stored dataset (three argsorts and the Type
+grouping); sizes are of the index files against the column files. "scan" is
+what a lookup costs without them: a mask over the column and a sort of the
+matches (range), or a partial sort of the whole column (top-K).
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .common import Timer, print_table, setup_django, synthetic_columns
+
+
+def best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        with Timer() as t:
+            fn()
+        times.append(t.elapsed)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--k', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from api.storage import (DatasetColumns, ColumnarWriter, build_indexes, ordered_index,
+                             range_index, storage_size)
+
+    results = []
+    for rows in args.rows:
+        df = pd.DataFrame(synthetic_columns(rows))
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ColumnarWriter(tmp)
+            writer.append(df)
+            schema = writer.close()
+            column_bytes = storage_size(tmp)
+            with Timer() as t_build:
+                indexed_schema = build_indexes(tmp, schema)
+            index_bytes = sum(Path(tmp, spec['file']).stat().st_size
+                              for spec in indexed_schema['indexes'].values())
+
+            plain = DatasetColumns.open(tmp, schema)
+            indexed = DatasetColumns.open(tmp, indexed_schema)
+            pressure = np.asarray(plain.numeric['Pressure'])
+            code = plain.type_categories.index('HeatExchanger')
+
+            def range_scan():
+                # 6.0 <= Pressure <= 6.1, first page by value
+                matched = np.flatnonzero((pressure >= 6.0) & (pressure <= 6.1))
+                return matched[np.argsort(pressure[matched], kind='stable')][:100]
+
+            def type_top_scan():
+                matched = np.flatnonzero(np.asarray(plain.type_codes) == code)
+                temps = np.asarray(plain.numeric['Temperature'])[matched]
+                return matched[np.argsort(-temps, kind='stable')][:args.k]
+
+            results.append((
+                rows,
+                f'{t_build.elapsed * 1000:.0f}', f'{column_bytes / 1e6:.1f}', f'{index_bytes / 1e6:.1f}',
+                f'{best(range_scan):.2f}',
+                f'{best(lambda: range_index(indexed, "Pressure", 6.0, 6.1, stop=100)):.3f}',
+                f'{best(lambda: ordered_index(plain, "Temperature", True, args.k)):.2f}',
+                f'{best(lambda: ordered_index(indexed, "Temperature", True, args.k)):.3f}',
+                f'{best(type_top_scan):.2f}',
+                f'{best(lambda: range_index(indexed, "Temperature", type_code=code, descending=True, stop=args.k)):.2f}',
+            ))
+
+    print_table([
+        'rows', 'build ms', 'columns MB', 'indexes MB',
+        'range scan ms', 'range indexed ms',
+        f'top-{args.k} scan ms', f'top-{args.k} indexed ms',
+        f'type top-{args.k} scan ms', f'type top-{args.k} indexed ms',
+    ], results)
+
+
+if __name__ == '__main__':
+    main()
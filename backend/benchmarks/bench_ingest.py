@@ -0,0 +1,98 @@
+"""Peak memory of the legacy upload path vs streaming ingestion.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_ingest --rows 10000 100000 1000000
+
+Each case runs in a fresh interpreter so the peak RSS reflects that case only.
+"""
+import argparse
+import io
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import BASE_DIR, print_table, setup_django, write_synthetic_csv
+
+
+def peak_rss_mb():
+    # VmHWM belongs to the current address space; ru_maxrss survives exec() on
+    # Linux and would report the parent's peak from generating the input file.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_legacy(path, dest):
+    import pandas as pd
+    with open(path, 'rb') as f:
+        contents = f.read()
+    df = pd.read_csv(io.BytesIO(contents))
+    with open(dest, 'wb') as f:
+        f.write(contents)
+    data = df.to_dict('records')
+    preview = df.to_dict('records')[:100]  # noqa: F841  (mirrors the old response body)
+    return len(data)
+
+
+def run_streaming(path, dest):
+    from django.core.files import File
+    from api.ingest import ingest_file
+    storage_dir = tempfile.mkdtemp(dir=os.path.dirname(dest))
+    try:
+        with open(path, 'rb') as f:
+            result = ingest_file(File(f), dest, storage_dir)
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+    return result.row_count
+
+
+def worker(mode, path):
+    setup_django()
+    import pandas  # noqa: F401  (exclude import cost from the measurement)
+    baseline = peak_rss_mb()
+    dest = path + '.out'
+    start = time.perf_counter()
+    rows = (run_legacy if mode == 'legacy' else run_streaming)(path, dest)
+    elapsed = time.perf_counter() - start
+    os.unlink(dest)
+    print(f"{rows} {elapsed:.3f} {baseline:.1f} {peak_rss_mb():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = write_synthetic_csv(os.path.join(tmp, f'bench_{rows}.csv'), rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for mode in ('legacy', 'streaming'):
+                out = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_ingest', '--worker', mode, path],
+                    cwd=BASE_DIR, capture_output=True, text=True, check=True,
+                ).stdout.split()
+                rows_out, seconds, baseline, peak = out
+                results.append((rows, f'{size_mb:.1f}', mode, seconds, baseline, peak))
+
+    print_table(['rows', 'file MB', 'mode', 'seconds', 'baseline RSS MB', 'peak RSS MB'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""CSV parse throughput: inferred parsing of every column vs the typed parser.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_parse --rows 10000 1000000 10000000
+
+The synthetic files carry three columns besides the required five, as
+customer exports do. "inferred" is pd.read_csv in chunks with type inference
+on every column (the previous ingest path); "typed c" / "typed pyarrow" are
+api.ingest.read_chunks with column pruning and declared dtypes on each
+engine (pyarrow only when installed). Only parsing is timed, not storage.
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from .common import Timer, print_table, setup_django, write_synthetic_csv
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import override_settings
+    from api.ingest import csv_engine, raw_header, read_chunks, required_fields
+
+    engines = ['c']
+    with override_settings(INGEST_CSV_ENGINE='pyarrow'):
+        if csv_engine() == 'pyarrow':
+            engines.append('pyarrow')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = write_synthetic_csv(os.path.join(tmp, f'bench_{rows}.csv'), rows, extra_columns=True)
+            size_mb = os.path.getsize(path) / 1e6
+
+            with Timer() as t:
+                for _ in pd.read_csv(path, chunksize=settings.INGEST_CHUNK_ROWS):
+                    pass
+            cases = [('inferred', t.elapsed)]
+            for engine in engines:
+                with override_settings(INGEST_CSV_ENGINE=engine), open(path, 'rb') as f:
+                    fields = required_fields(raw_header(f))
+                    with Timer() as t:
+                        for _ in read_chunks(f, fields, settings.INGEST_CHUNK_ROWS):
+                            pass
+                cases.append((f'typed {engine}', t.elapsed))
+
+            for mode, seconds in cases:
+                results.append((
+                    rows, f'{size_mb:.1f}', mode, f'{seconds:.3f}',
+                    f'{rows / seconds / 1e6:.2f}', f'{size_mb / seconds:.0f}',
+                ))
+
+    print_table(['rows', 'file MB', 'parser', 'seconds', 'M rows/s', 'MB/s'], results)
+
+
+if __name__ == '__main__':
+    main()
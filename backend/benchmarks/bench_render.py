@@ -0,0 +1,80 @@
+"""Row payloads: JSON against MessagePack with typed column arrays.
+
+Run from the backend directory (needs msgpack; brotli optional):
+
+    python -m benchmarks.bench_render --rows 5000 100000
+
+"encode" is the renderer turning a page of stored rows into the response
+body, "decode" what a client spends getting columns back out of it
+(json.loads and a pass over the row objects, or msgpack.unpackb and
+numpy.frombuffer views). Sizes are of the body as sent uncompressed, with
+gzip (level 6, as the middleware) and with brotli (quality 5).
+"""
+import argparse
+import gzip
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .common import Timer, print_table, setup_django, synthetic_columns
+
+
+def best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        with Timer() as t:
+            fn()
+        times.append(t.elapsed)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[5000, 100000])
+    args = parser.parse_args()
+
+    setup_django()
+    import msgpack
+    from rest_framework.renderers import JSONRenderer
+    from api.renderers import MessagePackRenderer
+    from api.storage import ColumnarWriter, DatasetColumns
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    def decode_json(body):
+        rows = json.loads(body)['rows']
+        return {col: [r[col] for r in rows] for col in rows[0]}
+
+    def decode_msgpack(body):
+        columns = msgpack.unpackb(body)['rows']['columns']
+        return {col: np.frombuffer(v, '<f8') if isinstance(v, bytes) else v for col, v in columns.items()}
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ColumnarWriter(tmp)
+            writer.append(pd.DataFrame(synthetic_columns(rows)))
+            table = DatasetColumns.open(tmp, writer.close())
+            data = {'count': rows, 'rows': table.block()}
+
+            for name, renderer, decode in [('json', JSONRenderer(), decode_json),
+                                           ('msgpack', MessagePackRenderer(), decode_msgpack)]:
+                body = renderer.render(data)
+                results.append((
+                    rows, name,
+                    f'{best(lambda: renderer.render(data)):.1f}',
+                    f'{best(lambda: decode(body)):.1f}',
+                    f'{len(body) / 1e3:.0f}',
+                    f'{len(gzip.compress(body, 6)) / 1e3:.0f}',
+                    f'{len(brotli.compress(body, quality=5)) / 1e3:.0f}' if brotli else '-',
+                ))
+
+    print_table(['rows', 'format', 'encode ms', 'decode ms', 'KB', 'gzip KB', 'brotli KB'], results)
+
+
+if __name__ == '__main__':
+    main()
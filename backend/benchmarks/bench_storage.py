@@ -0,0 +1,62 @@
+"""On-disk size and load time: Dataset.data JSON vs columnar storage.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_storage --rows 10000 100000 1000000
+
+"JSON" is what a JSONField round-trip costs (json.dumps on save, json.loads on
+every fetch, whatever part of the rows is needed). "columnar" opens the memory-mapped column files and reads
+either the first 100 rows or every value of every column.
+"""
+import argparse
+import json
+import tempfile
+
+import pandas as pd
+
+from .common import Timer, print_table, setup_django, synthetic_columns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    setup_django()
+    from api.storage import ColumnarWriter, DatasetColumns, NUMERIC_COLUMNS, storage_size
+
+    results = []
+    for rows in args.rows:
+        df = pd.DataFrame(synthetic_columns(rows))
+        blob = json.dumps(df.to_dict('records'))
+        with Timer() as t_json:
+            json.loads(blob)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ColumnarWriter(tmp)
+            writer.append(df)
+            schema = writer.close()
+            with Timer() as t_page:
+                DatasetColumns.open(tmp, schema).rows(slice(0, 100))
+            with Timer() as t_full:
+                cols = DatasetColumns.open(tmp, schema)
+                for col in NUMERIC_COLUMNS:
+                    cols.numeric[col].sum()
+                cols.types()
+                cols.names.take(slice(None))
+            size = storage_size(tmp)
+
+        results.append((
+            rows,
+            f'{len(blob) / 1e6:.2f}', f'{size / 1e6:.2f}', len(json.dumps(schema)),
+            f'{t_json.elapsed * 1000:.1f}', f'{t_page.elapsed * 1000:.2f}', f'{t_full.elapsed * 1000:.1f}',
+        ))
+
+    print_table([
+        'rows', 'JSON MB', 'columnar MB', 'schema bytes',
+        'JSON load ms', 'columnar first-100 ms', 'columnar full ms',
+    ], results)
+
+
+if __name__ == '__main__':
+    main()
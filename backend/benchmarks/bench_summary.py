@@ -0,0 +1,92 @@
+"""Summary engine vs the previous UploadAPIView.compute_summary.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_summary --rows 10000 100000 1000000
+
+"legacy" is the old per-column pandas implementation (11 keys only).
+"pandas full" computes the same statistics the engine now returns (std,
+p5/p50/p95, nulls, per-Type aggregates) with separate pandas calls.
+"engine" is api.summary over the whole frame; "engine chunked" feeds it
+50k-row chunks the way ingestion does.
+"""
+import argparse
+
+import pandas as pd
+
+from .common import Timer, print_table, setup_django, synthetic_columns
+
+NUMERIC = ['Flowrate', 'Pressure', 'Temperature']
+
+
+def legacy_summary(df):
+    return {
+        'equipment_count': len(df),
+        'avg_flowrate': float(df['Flowrate'].mean()),
+        'avg_pressure': float(df['Pressure'].mean()),
+        'avg_temperature': float(df['Temperature'].mean()),
+        'type_distribution': df['Type'].value_counts().to_dict(),
+        'min_flowrate': float(df['Flowrate'].min()),
+        'max_flowrate': float(df['Flowrate'].max()),
+        'min_pressure': float(df['Pressure'].min()),
+        'max_pressure': float(df['Pressure'].max()),
+        'min_temperature': float(df['Temperature'].min()),
+        'max_temperature': float(df['Temperature'].max()),
+    }
+
+
+def pandas_full_summary(df):
+    summary = legacy_summary(df)
+    summary['stats'] = {
+        col: {
+            'count': int(df[col].count()),
+            'nulls': int(df[col].isna().sum()),
+            'std': float(df[col].std(ddof=0)),
+            **{f'p{p}': float(df[col].quantile(p / 100)) for p in (5, 50, 95)},
+        }
+        for col in NUMERIC
+    }
+    summary['groups'] = df.groupby('Type')[NUMERIC].agg(['count', 'mean', 'std', 'min', 'max']).to_dict()
+    return summary
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        with Timer() as t:
+            fn()
+        times.append(t.elapsed)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from api.summary import SummaryAccumulator, summarize_frame
+
+    def chunked(df, size=50000):
+        acc = SummaryAccumulator()
+        for start in range(0, len(df), size):
+            acc.update(df.iloc[start:start + size])
+        return acc.as_summary()
+
+    results = []
+    for rows in args.rows:
+        df = pd.DataFrame(synthetic_columns(rows))
+        timings = [
+            best_of(lambda: legacy_summary(df), args.repeat),
+            best_of(lambda: pandas_full_summary(df), args.repeat),
+            best_of(lambda: summarize_frame(df), args.repeat),
+            best_of(lambda: chunked(df), args.repeat),
+        ]
+        results.append((rows, *(f'{t * 1000:.1f}' for t in timings)))
+
+    print_table(['rows', 'legacy ms', 'pandas full ms', 'engine ms', 'engine chunked ms'], results)
+
+
+if __name__ == '__main__':
+    main()
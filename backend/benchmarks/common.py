@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TYPES = ['Pump', 'Compressor', 'Valve', 'HeatExchanger', 'Reactor', 'Condenser']
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemequip.settings')
+    import django
+    django.setup()
+
+
+def synthetic_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    types = rng.choice(TYPES, size=rows)
+    return {
+        'Equipment Name': np.char.add(np.char.add(types, '-'), np.arange(rows).astype(str)),
+        'Type': types,
+        'Flowrate': rng.normal(120, 30, rows).round(2),
+        'Pressure': rng.normal(6, 1.5, rows).round(2),
+        'Temperature': rng.normal(115, 12, rows).round(2),
+    }
+
+
+def write_synthetic_csv(path, rows, block_rows=500000, seed=0, extra_columns=False):
+    # Written in blocks so generating a 10M-row file does not need 10M rows in memory.
+    # extra_columns adds the kind of unused columns a customer export carries.
+    import pandas as pd
+    with open(path, 'w', newline='') as f:
+        written = 0
+        while written < rows:
+            n = min(block_rows, rows - written)
+            df = pd.DataFrame(synthetic_columns(n, seed + written))
+            if extra_columns:
+                df.insert(0, 'Site', np.char.add('Plant-', (np.arange(written, written + n) % 17).astype(str)))
+                df['Serial'] = np.arange(written, written + n)
+                df['Notes'] = 'inspected'
+            df.to_csv(f, index=False, header=(written == 0))
+            written += n
+    return path
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(r, widths)))
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,11 +26,18 @@ load_dotenv(BASE_DIR / '.env')
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-your-secret-key-here'
-
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'true').lower() in ('1', 'true', 'yes')
+
+# SECURITY WARNING: keep the secret key used in production secret!
+# It signs the API tokens (see api.authentication), so anyone who knows it can
+# sign in as any user. Without one, debug servers make up a key per process
+# (tokens then end with the process) and other servers refuse to start.
+SECRET_KEY = os.getenv('SECRET_KEY', '')
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured("Set the SECRET_KEY environment variable (or put it in backend/.env)")
+    SECRET_KEY = get_random_secret_key()
 
 ALLOWED_HOSTS = []
 
@@ -47,7 +57,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -152,9 +164,92 @@ CORS_ALLOW_ALL_ORIGINS = True
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        # Rows as typed column arrays for clients sending Accept: application/msgpack
+        *(['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'api.renderers.QualityContentNegotiation',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.TokenAuthentication',
+    ],
+    'UNAUTHENTICATED_USER': None,
 }
 
+# API tokens (see api.authentication)
+AUTH_TOKEN_MAX_AGE = int(os.getenv('AUTH_TOKEN_MAX_AGE', 7 * 24 * 3600))
+# In-process cache of users resolved from tokens
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 300
+
+# Request metrics (see api.metrics): /api/metrics/ answers only with
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set, otherwise
+# to any signed-in user
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Profile requests that send an X-Profile header (development only: the
+# profile replaces the response and requests are profiled one at a time)
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'false').lower() in ('1', 'true', 'yes')
+REQUEST_PROFILING_LINES = 60
+
 # Media settings
 MEDIA_ROOT = BASE_DIR / 'uploads'
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_URL = '/media/'
+
+# Upload ingestion
+# Uploads larger than this are spooled to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+# Same as Django's defaults, plus a SHA-256 of each file for deduplication
+FILE_UPLOAD_HANDLERS = [
+    'api.uploadhandlers.HashingMemoryFileUploadHandler',
+    'api.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 50000))
+INGEST_COPY_BLOCK_SIZE = 1024 * 1024
+# CSV parser for uploads: 'c' (pandas) or 'pyarrow' (multithreaded, needs pyarrow installed)
+INGEST_CSV_ENGINE = os.getenv('INGEST_CSV_ENGINE', 'c')
+# Keep stored CSV originals compressed: '' (as uploaded), 'gzip' or 'zstd' (needs zstandard)
+UPLOAD_COMPRESSION = os.getenv('UPLOAD_COMPRESSION', '')
+# Rows echoed back in the upload response
+INGEST_PREVIEW_ROWS = 100
+# Background upload processing threads per server process (0: only
+# `manage.py process_upload_jobs` workers process the queue)
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+# On its first request a server process with workers takes over queued jobs and
+# jobs left running with no progress for this long (e.g. by a restart)
+UPLOAD_STALE_SECONDS = int(os.getenv('UPLOAD_STALE_SECONDS', 600))
+# Chunked uploads (/api/uploads/): where partial files are assembled, the
+# default and allowed chunk sizes, and how long an idle session can be resumed
+UPLOAD_PARTIAL_ROOT = MEDIA_ROOT / 'partial'
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_CHUNK_MIN = 256 * 1024
+UPLOAD_CHUNK_MAX = 64 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 24))
+# Largest file a session accepts, and unexpired sessions open per user
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 2 * 1024 ** 3))
+UPLOAD_SESSIONS_PER_USER = 10
+# Values per column kept for percentile estimates (exact below this row count)
+SUMMARY_SAMPLE_SIZE = 100000
+
+# Columnar dataset storage (one directory of column files per dataset)
+DATASET_STORAGE_ROOT = MEDIA_ROOT / 'datasets'
+# Paging of /api/datasets/<id>/rows/
+ROWS_PAGE_SIZE = 100
+ROWS_PAGE_MAX = 5000
+# Chart aggregates of /api/datasets/<id>/aggregate/
+AGGREGATE_BINS = 30
+AGGREGATE_MAX_BINS = 500
+AGGREGATE_POINTS = 500
+AGGREGATE_MAX_POINTS = 10000
+# Datasets per /api/datasets/compare/ request
+COMPARE_MAX_DATASETS = 100
+# Page size limit of /api/history/ (default page: DATASET_QUOTA)
+HISTORY_PAGE_MAX = 100
+
+# Rendered PDF reports, cached per dataset summary
+REPORT_CACHE_ROOT = MEDIA_ROOT / 'reports'
+# Render the report as part of upload processing instead of on first download
+REPORT_EAGER = os.getenv('REPORT_EAGER', 'false').lower() in ('1', 'true', 'yes')
+
+# Retention: datasets kept per user (older ones are deleted after each upload)
+DATASET_QUOTA = int(os.getenv('DATASET_QUOTA', 5))
+# `manage.py sweep_storage`: files younger than this are never treated as orphans
+SWEEP_GRACE_SECONDS = 3600
+UPLOAD_JOB_RETENTION_DAYS = 7
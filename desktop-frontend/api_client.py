@@ -0,0 +1,143 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from PyQt5.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class Cancelled(Exception):
+    pass
+
+
+class RequestSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    ended = pyqtSignal()  # Always, also after a cancel
+
+
+class Request:
+    # Handle of one background request. Cancelling drops its result and stops
+    # a download between chunks; a request still queued never starts.
+    CHUNK_SIZE = 256 * 1024
+    TIMEOUT = 30  # Seconds to connect, and between bytes received
+
+    def __init__(self, session, fn):
+        self.session = session
+        self.fn = fn
+        self.signals = RequestSignals()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def get(self, url, **kwargs):
+        # session.get() that gives up as soon as the request is cancelled
+        if self.cancelled:
+            raise Cancelled()
+        kwargs.setdefault('timeout', self.TIMEOUT)
+        with self.session.get(url, stream=True, **kwargs) as response:
+            chunks = []
+            for chunk in response.iter_content(self.CHUNK_SIZE):
+                if self.cancelled:
+                    raise Cancelled()
+                chunks.append(chunk)
+            response._content = b''.join(chunks)
+        return response
+
+
+class _Task(QRunnable):
+    def __init__(self, request):
+        super().__init__()
+        # Owned by the client until it ends, not deleted by the pool
+        self.setAutoDelete(False)
+        self.request = request
+
+    def run(self):
+        request = self.request
+        try:
+            result = request.fn(request)
+            if not request.cancelled:
+                request.signals.finished.emit(result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            if not request.cancelled:
+                request.signals.failed.emit(str(e))
+        finally:
+            request.signals.ended.emit()
+
+
+class ApiClient(QObject):
+    # Background HTTP for the dashboard: requests run on a small thread pool
+    # over one requests.Session (keep-alive connections are reused), and
+    # results come back on the GUI thread through Qt signals. Requests on the
+    # same channel supersede each other: starting one cancels the previous,
+    # so clicking quickly through the history only loads the last dataset.
+    MAX_THREADS = 4
+
+    def __init__(self, backend_url, token, parent=None):
+        super().__init__(parent)
+        self.backend_url = backend_url
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        # Room for the pool's threads plus an upload's parallel chunks
+        adapter = HTTPAdapter(pool_maxsize=self.MAX_THREADS * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.MAX_THREADS)
+        self._channels = {}
+        self._running = set()
+        # Python requests must be done before the pool is destroyed at exit
+        # (its destructor would wait for them while holding the GIL)
+        QCoreApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def url(self, path):
+        return f"{self.backend_url}{path}"
+
+    def submit(self, fn, on_finished, on_failed=None, channel=None):
+        # fn(request) runs on a pool thread (fetching through request.get()
+        # or request.session) and its result is passed to on_finished(result)
+        # on the GUI thread; an exception goes to on_failed(message)
+        if channel is not None:
+            self.cancel(channel)
+        request = Request(self.session, fn)
+        request.signals.finished.connect(on_finished)
+        if on_failed is not None:
+            request.signals.failed.connect(on_failed)
+        request.signals.ended.connect(lambda: self._done(request, channel))
+        request.task = _Task(request)
+        if channel is not None:
+            self._channels[channel] = request
+        self._running.add(request)
+        self.pool.start(request.task)
+        return request
+
+    def cancel(self, channel):
+        request = self._channels.pop(channel, None)
+        if request is not None:
+            self._cancel(request)
+
+    def cancel_all(self):
+        self._channels.clear()
+        for request in list(self._running):
+            self._cancel(request)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.waitForDone()
+
+    def _cancel(self, request):
+        request.cancel()
+        # Still queued: it never runs, so it never ends either
+        if self.pool.tryTake(request.task):
+            self._running.discard(request)
+
+    def _done(self, request, channel):
+        self._running.discard(request)
+        if channel is not None and self._channels.get(channel) is request:
+            del self._channels[channel]
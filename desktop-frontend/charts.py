@@ -0,0 +1,133 @@
+import math
+
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+
+# The dashboard's charts are created once and updated in place when another
+# dataset is shown. Figures are plain matplotlib Figures (not pyplot, whose
+# figure manager would keep every one alive). The changing artists are
+# "animated": a full draw saves the background without them, and an update
+# that leaves the axes as they were only redraws those artists over it and
+# blits the result.
+
+
+class BlitChart:
+    def __init__(self, figsize):
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.artists = []
+        self._background = None
+        self._draw_cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # Full (re)draws, e.g. on resize: new background, animated artists on top
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+
+    def animate(self, *artists):
+        for artist in artists:
+            artist.set_animated(True)
+            self.artists.append(artist)
+
+    def refresh(self, full=False):
+        if full or self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.figure.bbox)
+
+    def close(self):
+        self.canvas.mpl_disconnect(self._draw_cid)
+        self._background = None
+        self.artists = []
+        self.figure.clear()
+
+
+class TypeDistributionChart(BlitChart):
+    COLORS = ['#3b82f6', '#06b6d4', '#10b981', '#f59e0b', '#ef4444']
+    START_ANGLE = 90
+
+    def __init__(self):
+        super().__init__((6, 4))
+        self.wedges = self.texts = self.autotexts = []
+
+    def show(self, distribution):
+        total = sum(distribution.values())
+        if len(distribution) != len(self.wedges) or not total:
+            self._build(distribution)
+            return
+
+        # As many types as before: move and relabel the wedges
+        theta = self.START_ANGLE
+        for wedge, text, autotext, (label, size) in zip(
+                self.wedges, self.texts, self.autotexts, distribution.items()):
+            fraction = size / total
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + 360 * fraction)
+            middle = math.radians(theta + 180 * fraction)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_text(label)
+            text.set_position((1.1 * x, 1.1 * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((0.6 * x, 0.6 * y))
+            autotext.set_text(f'{100 * fraction:.1f}%')
+            theta += 360 * fraction
+        self.refresh()
+
+    def _build(self, distribution):
+        self.ax.clear()
+        self.artists = []
+        labels = list(distribution)
+        if sum(distribution.values()):
+            self.wedges, self.texts, self.autotexts = self.ax.pie(
+                list(distribution.values()), labels=labels, colors=self.COLORS[:len(labels)],
+                autopct='%1.1f%%', startangle=self.START_ANGLE)
+            for text in self.autotexts:
+                text.set(size=10, weight='bold', color='white')
+            for text in self.texts:
+                text.set_size(12)
+            self.animate(*self.wedges, *self.texts, *self.autotexts)
+        else:
+            self.wedges = self.texts = self.autotexts = []
+        self.ax.axis('equal')
+        self.ax.set_title('Equipment Type Distribution', fontsize=14, fontweight='bold', pad=20)
+        self.refresh(full=True)
+
+
+class AveragesChart(BlitChart):
+    LABELS = ['Flowrate', 'Pressure', 'Temperature']
+
+    def __init__(self):
+        super().__init__((6, 4))
+        self.bars = self.ax.bar(self.LABELS, [0] * len(self.LABELS), color='#3b82f6')
+        self.values = [self.ax.text(bar.get_x() + bar.get_width() / 2., 0, '', ha='center', va='bottom')
+                       for bar in self.bars]
+        self.animate(*self.bars, *self.values)
+        self.ax.set_ylabel('Average Values')
+        self.ax.set_title('Average Parameter Values')
+        # Rounded to ticks so similar datasets keep the same axis (and blit)
+        self.locator = MaxNLocator(nbins=5)
+        self.limits = None
+
+    def show(self, averages):
+        # An average is None when its column has no numeric value: no bar
+        for bar, text, value in zip(self.bars, self.values, averages):
+            bar.set_height(value or 0)
+            text.set_y(value or 0)
+            text.set_text('N/A' if value is None else f'{value:.2f}')
+        known = [value for value in averages if value is not None] or [0]
+        ticks = self.locator.tick_values(min(0, min(known) * 1.1), max(0, max(known) * 1.1) or 1)
+        limits = (ticks[0], ticks[-1])
+        if limits == self.limits:
+            self.refresh()
+            return
+        self.limits = limits
+        self.ax.set_ylim(*limits)
+        self.refresh(full=True)
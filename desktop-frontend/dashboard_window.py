@@ -1,56 +1,207 @@
+import gzip
+import hashlib
+import shutil
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QListWidget, QListWidgetItem, QFileDialog,
-    QProgressBar, QTableWidget, QTableWidgetItem, QFrame, QGridLayout,
+    QProgressBar, QTableView, QHeaderView, QFrame, QGridLayout,
     QMessageBox, QSplitter, QScrollArea
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QSettings, QStandardPaths, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
 import os
+from api_client import ApiClient
+from data_table import ROWS_ACCEPT, DatasetTableModel, concat_pages, decode_page
+from dataset_cache import DatasetCache
 
-# Utility function to clear layouts
-def clear_layout(layout):
-    while layout.count():
-        child = layout.takeAt(0)
-        if child.widget():
-            child.widget().setParent(None)
 class UploadThread(QThread):
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
-
-    def __init__(self, backend_url, token, file_path):
+    progress = pyqtSignal(int)
+    stage = pyqtSignal(str)
+
+    POLL_INTERVAL = 0.5
+    POLL_TIMEOUT = 10 * 60
+    COMPRESS_MIN_BYTES = 1024 * 1024
+    # Larger files go up in chunks (/uploads/): several in parallel, each
+    # retried on its own, and an interrupted upload resumes where it stopped
+    CHUNKED_MIN_BYTES = 16 * 1024 * 1024
+    CHUNK_SIZE = 8 * 1024 * 1024
+    CHUNK_WORKERS = 4
+    CHUNK_RETRIES = 4
+
+    def __init__(self, session, backend_url, file_path):
         super().__init__()
+        # The dashboard's shared (authenticated) session
+        self.http = session
         self.backend_url = backend_url
-        self.token = token
         self.file_path = file_path
 
+    def upload_file(self):
+        # Plain CSV compresses 8-10x: gzip it on the way out (the server
+        # decompresses while parsing). mtime=0 keeps the output identical
+        # between attempts, so an interrupted chunked upload can resume.
+        name = os.path.basename(self.file_path)
+        if not name.lower().endswith('.csv') or os.path.getsize(self.file_path) < self.COMPRESS_MIN_BYTES:
+            return open(self.file_path, 'rb'), name
+        self.stage.emit("Compressing")
+        spool = tempfile.SpooledTemporaryFile(max_size=self.COMPRESS_MIN_BYTES)
+        with open(self.file_path, 'rb') as src, \
+                gzip.GzipFile(filename='', fileobj=spool, mode='wb', compresslevel=6, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        spool.seek(0)
+        return spool, name + '.gz'
+
+    def upload_single(self, f, name):
+        response = self.http.post(f"{self.backend_url}/upload/", files={'file': (name, f)})
+        if response.status_code != 202:
+            raise RuntimeError(f"Upload failed: {response.text}")
+        self.progress.emit(100)
+        return response.json()['status_url']
+
+    def upload_chunked(self, f, name, size):
+        sha256 = hashlib.sha256()
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+        digest = sha256.hexdigest()
+
+        # Sessions of unfinished uploads are remembered by content
+        settings = QSettings("ChemEquip", "Desktop")
+        key = f"uploads/{digest}"
+        status = None
+        if settings.value(key):
+            response = self.http.get(f"{self.backend_url}/uploads/{settings.value(key)}/")
+            if response.status_code == 200:
+                status = response.json()
+        if status is None:
+            response = self.http.post(f"{self.backend_url}/uploads/", json={
+                'filename': name, 'size': size, 'chunk_size': self.CHUNK_SIZE, 'sha256': digest,
+            })
+            if response.status_code != 201:
+                raise RuntimeError(f"Upload failed: {response.text}")
+            status = response.json()
+            settings.setValue(key, status['id'])
+
+        chunk_url = f"{self.backend_url}/uploads/{status['id']}/chunks"
+        chunk_size = status['chunk_size']
+        received = set(status['received'])
+        sent = sum(min(chunk_size, size - i * chunk_size) for i in received)
+        self.progress.emit(int(sent * 100 / size))
+        lock = threading.Lock()
+
+        def send(index):
+            with lock:
+                f.seek(index * chunk_size)
+                payload = f.read(chunk_size)
+            headers = {'Content-Type': 'application/octet-stream',
+                       'X-Chunk-SHA256': hashlib.sha256(payload).hexdigest()}
+            for attempt in range(self.CHUNK_RETRIES):
+                try:
+                    response = self.http.put(f"{chunk_url}/{index}/", data=payload, headers=headers, timeout=120)
+                    if response.status_code == 200:
+                        return len(payload)
+                    if response.status_code < 500:
+                        raise RuntimeError(f"Upload failed: {response.text}")
+                except requests.RequestException:
+                    if attempt == self.CHUNK_RETRIES - 1:
+                        raise
+                time.sleep(2 ** attempt)
+            raise RuntimeError(f"Upload failed: chunk {index} was not accepted")
+
+        pending = [i for i in range(status['chunk_count']) if i not in received]
+        with ThreadPoolExecutor(max_workers=self.CHUNK_WORKERS) as pool:
+            futures = [pool.submit(send, i) for i in pending]
+            try:
+                for future in as_completed(futures):
+                    sent += future.result()
+                    self.progress.emit(int(sent * 100 / size))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        response = self.http.post(status['finalize_url'])
+        settings.remove(key)
+        if response.status_code != 202:
+            raise RuntimeError(f"Upload failed: {response.text}")
+        return response.json()['status_url']
+
     def run(self):
         try:
-            with open(self.file_path, 'rb') as f:
-                files = {'file': f}
-                data = {'token': self.token}
-                response = requests.post(f"{self.backend_url}/upload/", files=files, data=data)
-                if response.status_code == 201:
-                    self.finished.emit(response.json())
+            f, name = self.upload_file()
+            with f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(0)
+                self.stage.emit("Uploading")
+                if size >= self.CHUNKED_MIN_BYTES:
+                    job_url = self.upload_chunked(f, name, size)
                 else:
-                    self.error.emit(f"Upload failed: {response.text}")
+                    job_url = self.upload_single(f, name)
+
+            # The server processes the file in the background; poll the job
+            self.stage.emit("Processing")
+            deadline = time.monotonic() + self.POLL_TIMEOUT
+            while True:
+                job = self.http.get(job_url).json()
+                if job['status'] == 'succeeded':
+                    break
+                if job['status'] == 'failed':
+                    self.error.emit(f"Upload failed: {job['error']}")
+                    return
+                if time.monotonic() >= deadline:
+                    # It shows up in the history if it finishes later
+                    self.error.emit("The file is taking too long to process; check the history later")
+                    return
+                self.progress.emit(int(job['progress'] * 100))
+                time.sleep(self.POLL_INTERVAL)
+
+            dataset_id = job['dataset_id']
+            rows = self.http.get(f"{self.backend_url}/datasets/{dataset_id}/rows/",
+                                 params={"limit": DatasetTableModel.PAGE_SIZE}, headers={"Accept": ROWS_ACCEPT})
+            self.finished.emit({
+                'id': dataset_id,
+                'filename': job['filename'],
+                'summary': job['summary'],
+                'page': decode_page(rows) if rows.status_code == 200 else None,
+            })
         except Exception as e:
             self.error.emit(str(e))
 
 class DashboardWindow(QMainWindow):
+    CACHE_MAX_BYTES = 512 * 1024 * 1024
+    CACHE_PAGE_SIZE = 5000  # The server's largest /rows/ page
+    # Larger datasets are not saved whole: their rows stay paged from the server
+    CACHE_MAX_ROWS = 250_000
+
     def __init__(self, token):
         super().__init__()
         self.backend_url = "http://localhost:8000/api"
         self.token = token
+        self.api = ApiClient(self.backend_url, token, self)
+        # One cache per user; tokens start with the user id
+        self.cache = DatasetCache(os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation),
+            "ChemEquip", "datasets", token.split(':', 1)[0]), self.CACHE_MAX_BYTES)
+        self.cache_max_rows = QSettings("ChemEquip", "Desktop").value(
+            "cache/max_rows", self.CACHE_MAX_ROWS, type=int)
         self.current_data = None
+        self.history_etag = None
+        self.dataset_view = None
+        self.painted = False
         self.init_ui()
-        self.load_history()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            # The window is on screen: now load the history
+            self.painted = True
+            QTimer.singleShot(0, self.load_history)
 
     def init_ui(self):
         self.setWindowTitle("Chemical Equipment Visualizer - Dashboard")
@@ -256,12 +407,15 @@ class DashboardWindow(QMainWindow):
             }
         """)
 
-    def show_empty_state(self):
+    def clear_content(self):
         for i in reversed(range(self.content_layout.count())):
             widget = self.content_layout.itemAt(i).widget()
             if widget:
                 widget.setParent(None)
 
+    def show_empty_state(self):
+        self.clear_content()
+
         empty_frame = QFrame()
         empty_frame.setStyleSheet("""
             QFrame {
@@ -294,7 +448,10 @@ class DashboardWindow(QMainWindow):
 
     def select_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select CSV File", "", "CSV Files (*.csv);;All Files (*)"
+            self, "Select Data File", "",
+            "Data Files (*.csv *.csv.gz *.csv.zst *.xlsx *.parquet);;CSV Files (*.csv *.csv.gz *.csv.zst);;"
+            "Excel Files (*.xlsx);;"
+            "Parquet Files (*.parquet);;All Files (*)"
         )
         if file_path:
             self.selected_file = file_path
@@ -306,11 +463,13 @@ class DashboardWindow(QMainWindow):
             return
 
         self.upload_progress.setVisible(True)
-        self.upload_progress.setRange(0, 0)  # Indeterminate progress
+        self.on_upload_stage("Uploading")
 
-        self.upload_thread = UploadThread(self.backend_url, self.token, self.selected_file)
+        self.upload_thread = UploadThread(self.api.session, self.backend_url, self.selected_file)
         self.upload_thread.finished.connect(self.on_upload_finished)
         self.upload_thread.error.connect(self.on_upload_error)
+        self.upload_thread.progress.connect(self.on_upload_progress)
+        self.upload_thread.stage.connect(self.on_upload_stage)
         self.upload_thread.start()
 
     def on_upload_finished(self, data):
@@ -320,52 +479,178 @@ class DashboardWindow(QMainWindow):
         self.load_history()
         self.display_data()
 
+    def on_upload_stage(self, stage):
+        # Bytes sent while uploading, then the server's parsing progress
+        self.upload_progress.setRange(0, 100)
+        self.upload_progress.setValue(0)
+        self.upload_progress.setFormat(f"{stage}... %p%")
+
+    def on_upload_progress(self, percent):
+        self.upload_progress.setValue(percent)
+
     def on_upload_error(self, error_msg):
         self.upload_progress.setVisible(False)
         QMessageBox.warning(self, "Error", error_msg)
 
+    # Network requests run in the background (see api_client); the handlers
+    # below get their results on the GUI thread
+
     def load_history(self):
-        try:
-            headers = {"Authorization": f"Bearer {self.token}"}
-            response = requests.get(f"{self.backend_url}/history/", headers=headers)
-            if response.status_code == 200:
-                datasets = response.json()
-                self.history_list.clear()
-                for dataset in datasets:
-                    item = QListWidgetItem(f"{dataset['filename']} - {dataset['uploaded_at'][:10]}")
-                    item.setData(Qt.UserRole, dataset['id'])
-                    self.history_list.addItem(item)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load history: {str(e)}")
+        headers = {"If-None-Match": self.history_etag} if self.history_etag else {}
+        url = self.api.url("/history/")
+
+        def fetch(request):
+            response = request.get(url, headers=headers, params={"summary": "false"})
+            return response, response.json() if response.status_code == 200 else None
+
+        self.api.submit(fetch, self.on_history_loaded, self.on_history_failed, channel="history")
+
+    def on_history_loaded(self, result):
+        response, datasets = result
+        if response.status_code == 304:
+            # Nothing uploaded or deleted since the last refresh
+            return
+        if response.status_code == 401:
+            # Saved token expired or invalid: back to the login window
+            QMessageBox.warning(self, "Session expired", "Please log in again.")
+            QTimer.singleShot(0, self.logout)
+            return
+        if response.status_code == 200:
+            self.history_etag = response.headers.get("ETag")
+            self.show_history(datasets)
+
+    def on_history_failed(self, error):
+        # Offline: the datasets viewed before can still be opened
+        cached = self.cache.entries()
+        if not cached:
+            QMessageBox.warning(self, "Error", f"Failed to load history: {error}")
+            return
+        self.statusBar().showMessage("Server unreachable: showing datasets saved on this computer")
+        self.show_history(cached)
+
+    def show_history(self, datasets):
+        self.history_list.clear()
+        for dataset in datasets:
+            item = QListWidgetItem(f"{dataset['filename']} - {dataset['uploaded_at'][:10]}")
+            item.setData(Qt.UserRole, dataset['id'])
+            self.history_list.addItem(item)
 
     def load_dataset(self, item):
         dataset_id = item.data(Qt.UserRole)
-        try:
-            headers = {"Authorization": f"Bearer {self.token}"}
-            response = requests.get(f"{self.backend_url}/datasets/{dataset_id}/", headers=headers)
-            if response.status_code == 200:
-                self.current_data = response.json()
-                self.display_data()
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load dataset: {str(e)}")
+        detail_url = self.api.url(f"/datasets/{dataset_id}/")
+        rows_url = self.api.url(f"/datasets/{dataset_id}/rows/")
+
+        def fetch(request):
+            # A copy saved earlier is used as is when the server confirms it
+            # is current (304) or cannot be reached
+            cached = self.cache.get(dataset_id)
+            headers = {"If-None-Match": cached[1]} if cached else {}
+            try:
+                response = request.get(detail_url, headers=headers, params={"data": "false"})
+            except requests.ConnectionError:
+                if cached is None:
+                    raise
+                return {**cached[0], 'page': cached[2], 'cached': True, 'offline': True}
+            if response.status_code == 304:
+                return {**cached[0], 'page': cached[2], 'cached': True}
+            if response.status_code == 404:
+                self.cache.remove(dataset_id)
+            response.raise_for_status()
+
+            # Summary without rows, plus the first page of rows; the table
+            # fetches the rest as it is scrolled
+            data = response.json()
+            data['etag'] = response.headers.get('ETag')
+            rows = request.get(rows_url, headers={"Accept": ROWS_ACCEPT},
+                               params={"limit": DatasetTableModel.PAGE_SIZE})
+            if rows.status_code == 200:
+                data['page'] = decode_page(rows)
+            return data
+
+        # Clicking another dataset before this one arrives cancels it
+        self.statusBar().showMessage(f"Loading {item.text()}...")
+        self.api.submit(fetch, self.on_dataset_loaded, self.on_dataset_failed, channel="dataset")
+
+    def on_dataset_loaded(self, data):
+        if data.get('offline'):
+            self.statusBar().showMessage("Server unreachable: showing the copy saved on this computer")
+        else:
+            self.statusBar().clearMessage()
+        self.current_data = data
+        self.display_data()
+        if not data.get('cached') and data.get('page') and data.get('etag'):
+            if data['page'][0] <= self.cache_max_rows:
+                self.cache_dataset(data)
+            else:
+                # Drop any copy saved under a higher cache/max_rows setting
+                self.cache.remove(data['id'])
+
+    def cache_dataset(self, data):
+        # Download the remaining rows in the background and save the dataset,
+        # so opening it again needs nothing but a 304 (up to cache_max_rows rows)
+        detail = {key: value for key, value in data.items() if key not in ('page', 'etag')}
+        etag, first_page = data['etag'], data['page']
+        rows_url = self.api.url(f"/datasets/{data['id']}/rows/")
+
+        def download(request):
+            pages = [first_page]
+            count, loaded = first_page[0], len(first_page[1]['Equipment Name'])
+            while loaded < count:
+                response = request.get(rows_url, headers={"Accept": ROWS_ACCEPT},
+                                       params={"offset": loaded, "limit": self.CACHE_PAGE_SIZE})
+                response.raise_for_status()
+                page = decode_page(response)
+                rows = len(page[1]['Equipment Name'])
+                if rows == 0:
+                    break
+                pages.append(page)
+                loaded += rows
+            self.cache.put(detail['id'], detail, etag, concat_pages(pages))
+
+        # Not kept up when another dataset is opened; it is saved on its next view
+        self.api.submit(download, lambda result: None, channel="cache")
+
+    def on_dataset_failed(self, error):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error", f"Failed to load dataset: {error}")
 
     def display_data(self):
         if not self.current_data:
             return
 
-        # Clear existing content
-        for i in reversed(range(self.content_layout.count())):
-            widget = self.content_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+        # The sections are built for the first dataset shown and updated in
+        # place for the next ones: switching datasets rebuilds no widgets
+        if self.dataset_view is None:
+            self.clear_content()
+            self.create_dataset_view()
+            self.content_layout.addWidget(self.dataset_view)
+
+        self.title_label.setText(self.current_data.get('filename', 'Uploaded Data'))
+
+        summary = self.current_data.get('summary')
+        self.stats_widget.setVisible(summary is not None)
+        self.charts_widget.setVisible(summary is not None)
+        if summary is not None:
+            self.stat_values['equipment_count'].setText(str(summary['equipment_count']))
+            for key in ('avg_flowrate', 'avg_pressure', 'avg_temperature'):
+                # None for a column without any numeric value
+                self.stat_values[key].setText("N/A" if summary[key] is None else f"{summary[key]:.2f}")
+            self.show_charts(summary)
+
+        self.show_data_table()
+
+    def create_dataset_view(self):
+        self.dataset_view = QWidget()
+        view_layout = QVBoxLayout(self.dataset_view)
+        view_layout.setContentsMargins(0, 0, 0, 0)
 
         # Header
         header_frame = QFrame()
         header_layout = QHBoxLayout(header_frame)
 
-        title = QLabel(self.current_data.get('filename', 'Uploaded Data'))
-        title.setFont(QFont("Arial", 18, QFont.Bold))
-        header_layout.addWidget(title)
+        self.title_label = QLabel()
+        self.title_label.setFont(QFont("Arial", 18, QFont.Bold))
+        header_layout.addWidget(self.title_label)
 
         header_layout.addStretch()
 
@@ -373,84 +658,43 @@ class DashboardWindow(QMainWindow):
         download_btn.clicked.connect(self.download_pdf)
         header_layout.addWidget(download_btn)
 
-        self.content_layout.addWidget(header_frame)
+        view_layout.addWidget(header_frame)
 
         # Stats grid
-        if 'summary' in self.current_data:
-            summary = self.current_data['summary']
-            stats_grid = QGridLayout()
-
-            # Equipment Count
-            count_card = self.create_stat_card("Equipment Count", str(summary['equipment_count']), "📊")
-            stats_grid.addWidget(count_card, 0, 0)
-
-            # Avg Flowrate
-            flow_card = self.create_stat_card("Avg Flowrate", f"{summary['avg_flowrate']:.2f}", "🌊")
-            stats_grid.addWidget(flow_card, 0, 1)
-
-            # Avg Pressure
-            pressure_card = self.create_stat_card("Avg Pressure", f"{summary['avg_pressure']:.2f}", "⚡")
-            stats_grid.addWidget(pressure_card, 1, 0)
-
-            # Avg Temperature
-            temp_card = self.create_stat_card("Avg Temperature", f"{summary['avg_temperature']:.2f}", "🔥")
-            stats_grid.addWidget(temp_card, 1, 1)
-
-            stats_widget = QWidget()
-            stats_widget.setLayout(stats_grid)
-            self.content_layout.addWidget(stats_widget)
+        stats_grid = QGridLayout()
+        self.stat_values = {}
+        cards = [
+            ('equipment_count', "Equipment Count", "📊", 0, 0),
+            ('avg_flowrate', "Avg Flowrate", "🌊", 0, 1),
+            ('avg_pressure', "Avg Pressure", "⚡", 1, 0),
+            ('avg_temperature', "Avg Temperature", "🔥", 1, 1),
+        ]
+        for key, title, icon, row, column in cards:
+            card = self.create_stat_card(title, "", icon)
+            self.stat_values[key] = card.findChild(QLabel, "statValue")
+            stats_grid.addWidget(card, row, column)
+
+        self.stats_widget = QWidget()
+        self.stats_widget.setLayout(stats_grid)
+        view_layout.addWidget(self.stats_widget)
 
         # Charts
-        if hasattr(self, 'charts_widget'):
-            clear_layout(self.charts_layout)
-        else:
-            self.charts_widget = QWidget()
-            self.charts_layout = QHBoxLayout(self.charts_widget)
-            self.content_layout.addWidget(self.charts_widget)
-
-        # Type distribution pie chart
-        if 'summary' in self.current_data and 'type_distribution' in self.current_data['summary']:
-            pie_frame = QFrame()
-            pie_frame.setStyleSheet("QFrame { background: white; border-radius: 8px; padding: 15px; }")
-            pie_frame.setMinimumSize(450, 450)
-            pie_layout = QVBoxLayout(pie_frame)
-
-            pie_title = QLabel("Equipment Type Distribution")
-            pie_title.setFont(QFont("Arial", 16, QFont.Bold))
-            pie_title.setStyleSheet("margin-bottom: 10px;")
-            pie_layout.addWidget(pie_title)
-
-            self.create_pie_chart(pie_layout)
-
-            self.charts_layout.addWidget(pie_frame)
-
-        # Average parameters bar chart
-        if 'summary' in self.current_data:
-            bar_frame = QFrame()
-            bar_frame.setStyleSheet("QFrame { background: white; border-radius: 8px; padding: 15px; }")
-            bar_frame.setMinimumSize(300, 300)
-            bar_layout = QVBoxLayout(bar_frame)
-
-            bar_title = QLabel("Average Parameter Values")
-            bar_title.setFont(QFont("Arial", 14, QFont.Bold))
-            bar_layout.addWidget(bar_title)
-
-            self.create_bar_chart(bar_layout)
-
-            self.charts_layout.addWidget(bar_frame)
+        self.create_charts()
+        view_layout.addWidget(self.charts_widget)
 
         # Data table
-        table_frame = QFrame()
-        table_frame.setStyleSheet("QFrame { background: white; border-radius: 8px; padding: 15px; margin-top: 20px; }")
-        table_layout = QVBoxLayout(table_frame)
+        self.table_frame = QFrame()
+        self.table_frame.setStyleSheet(
+            "QFrame { background: white; border-radius: 8px; padding: 15px; margin-top: 20px; }")
+        table_layout = QVBoxLayout(self.table_frame)
 
-        table_title = QLabel("Equipment Data (First 100 records)")
+        table_title = QLabel("Equipment Data")
         table_title.setFont(QFont("Arial", 14, QFont.Bold))
         table_layout.addWidget(table_title)
 
         self.create_data_table(table_layout)
 
-        self.content_layout.addWidget(table_frame)
+        view_layout.addWidget(self.table_frame)
 
     def create_stat_card(self, title, value, icon):
         card = QFrame()
@@ -471,113 +715,122 @@ class DashboardWindow(QMainWindow):
 
         return card
 
-    def create_pie_chart(self, layout):
-        if 'type_distribution' not in self.current_data['summary']:
-            return
+    def create_charts(self):
+        # Built once; later datasets only update the charts (see charts.py).
+        # Imported here, as matplotlib takes longer to load than the rest of
+        # the app: startup does not wait for it
+        from charts import AveragesChart, TypeDistributionChart
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        type_dist = self.current_data['summary']['type_distribution']
-        labels = list(type_dist.keys())
-        sizes = list(type_dist.values())
+        self.charts_widget = QWidget()
+        self.charts_layout = QHBoxLayout(self.charts_widget)
 
-        colors = ['#3b82f6', '#06b6d4', '#10b981', '#f59e0b', '#ef4444']
-        wedges, texts, autotexts = ax.pie(sizes, labels=labels, colors=colors[:len(labels)], autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')
+        # Type distribution pie chart
+        self.pie_frame = QFrame()
+        self.pie_frame.setStyleSheet("QFrame { background: white; border-radius: 8px; padding: 15px; }")
+        self.pie_frame.setMinimumSize(450, 450)
+        pie_layout = QVBoxLayout(self.pie_frame)
 
-        # Enhance appearance
-        ax.set_title('Equipment Type Distribution', fontsize=14, fontweight='bold', pad=20)
-        plt.setp(autotexts, size=10, weight="bold", color="white")
-        plt.setp(texts, size=12)
+        pie_title = QLabel("Equipment Type Distribution")
+        pie_title.setFont(QFont("Arial", 16, QFont.Bold))
+        pie_title.setStyleSheet("margin-bottom: 10px;")
+        pie_layout.addWidget(pie_title)
 
-        canvas = FigureCanvas(fig)
-        layout.addWidget(canvas)
-        canvas.draw()  # Explicitly draw canvas
+        self.pie_chart = TypeDistributionChart()
+        pie_layout.addWidget(self.pie_chart.canvas)
 
-    def create_bar_chart(self, layout):
-        if 'summary' not in self.current_data:
-            return
+        self.charts_layout.addWidget(self.pie_frame)
 
-        summary = self.current_data['summary']
-        fig, ax = plt.subplots(figsize=(6, 4))
+        # Average parameters bar chart
+        bar_frame = QFrame()
+        bar_frame.setStyleSheet("QFrame { background: white; border-radius: 8px; padding: 15px; }")
+        bar_frame.setMinimumSize(300, 300)
+        bar_layout = QVBoxLayout(bar_frame)
 
-        labels = ['Flowrate', 'Pressure', 'Temperature']
-        values = [summary['avg_flowrate'], summary['avg_pressure'], summary['avg_temperature']]
+        bar_title = QLabel("Average Parameter Values")
+        bar_title.setFont(QFont("Arial", 14, QFont.Bold))
+        bar_layout.addWidget(bar_title)
 
-        bars = ax.bar(labels, values, color='#3b82f6')
-        ax.set_ylabel('Average Values')
-        ax.set_title('Average Parameter Values')
+        self.bar_chart = AveragesChart()
+        bar_layout.addWidget(self.bar_chart.canvas)
 
-        # Add value labels on bars
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.2f}', ha='center', va='bottom')
+        self.charts_layout.addWidget(bar_frame)
 
-        canvas = FigureCanvas(fig)
-        layout.addWidget(canvas)
+    def show_charts(self, summary):
+        distribution = summary.get('type_distribution')
+        self.pie_frame.setVisible(bool(distribution))
+        if distribution:
+            self.pie_chart.show(distribution)
+        self.bar_chart.show([summary['avg_flowrate'], summary['avg_pressure'], summary['avg_temperature']])
 
     def create_data_table(self, layout):
-        if 'data' not in self.current_data:
-            return
-
-        table = QTableWidget()
-        data = self.current_data['data'][:100]  # First 100 records
-
-        if data:
-            table.setRowCount(len(data))
-            table.setColumnCount(5)
-            table.setHorizontalHeaderLabels(['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
-
-            # Increase table size and font
-            table.setMinimumHeight(400)
-            table.setMinimumWidth(800)
-            table.setFont(QFont("Arial", 11))
-
-            # Style the header
-            header = table.horizontalHeader()
-            header.setFont(QFont("Arial", 12, QFont.Bold))
-            header.setDefaultAlignment(Qt.AlignLeft)
-            header.setStretchLastSection(True)
-
-            # Set column widths
-            table.setColumnWidth(0, 200)  # Equipment Name
-            table.setColumnWidth(1, 150)  # Type
-            table.setColumnWidth(2, 120)  # Flowrate
-            table.setColumnWidth(3, 120)  # Pressure
-            table.setColumnWidth(4, 120)  # Temperature
-
-            for row_idx, row in enumerate(data):
-                table.setItem(row_idx, 0, QTableWidgetItem(str(row.get('Equipment Name', ''))))
-                table.setItem(row_idx, 1, QTableWidgetItem(str(row.get('Type', ''))))
-                table.setItem(row_idx, 2, QTableWidgetItem(str(row.get('Flowrate', ''))))
-                table.setItem(row_idx, 3, QTableWidgetItem(str(row.get('Pressure', ''))))
-                table.setItem(row_idx, 4, QTableWidgetItem(str(row.get('Temperature', ''))))
-
-            # Style the table
-            table.setStyleSheet("""
-                QTableWidget {
-                    gridline-color: #e5e7eb;
-                    selection-background-color: #dbeafe;
-                    font-size: 11px;
-                }
-                QHeaderView::section {
-                    background-color: #f8fafc;
-                    padding: 8px;
-                    border: 1px solid #e5e7eb;
-                    font-weight: bold;
-                    color: #374151;
-                }
-                QTableWidget::item {
-                    padding: 6px;
-                    border-bottom: 1px solid #f3f4f6;
-                }
-                QTableWidget::item:selected {
-                    background-color: #dbeafe;
-                }
-            """)
+        self.table = table = QTableView()
+
+        # Increase table size and font
+        table.setMinimumHeight(400)
+        table.setMinimumWidth(800)
+        table.setFont(QFont("Arial", 11))
+
+        # Style the header
+        header = table.horizontalHeader()
+        header.setFont(QFont("Arial", 12, QFont.Bold))
+        header.setDefaultAlignment(Qt.AlignLeft)
+        header.setStretchLastSection(True)
+
+        # Set column widths
+        table.setColumnWidth(0, 200)  # Equipment Name
+        table.setColumnWidth(1, 150)  # Type
+        table.setColumnWidth(2, 120)  # Flowrate
+        table.setColumnWidth(3, 120)  # Pressure
+        table.setColumnWidth(4, 120)  # Temperature
+
+        # Fixed row heights: the view never measures rows it does not show
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table.verticalHeader().setDefaultSectionSize(28)
+
+        # Sorted by the model (see show_data_table)
+        table.setSortingEnabled(True)
+
+        # Style the table
+        table.setStyleSheet("""
+            QTableView {
+                gridline-color: #e5e7eb;
+                selection-background-color: #dbeafe;
+                font-size: 11px;
+            }
+            QHeaderView::section {
+                background-color: #f8fafc;
+                padding: 8px;
+                border: 1px solid #e5e7eb;
+                font-weight: bold;
+                color: #374151;
+            }
+            QTableView::item {
+                padding: 6px;
+                border-bottom: 1px solid #f3f4f6;
+            }
+            QTableView::item:selected {
+                background-color: #dbeafe;
+            }
+        """)
 
         layout.addWidget(table)
 
+    def show_data_table(self):
+        page = self.current_data.get('page')
+        self.table_frame.setVisible(bool(page))
+        if not page:
+            return
+
+        # Rows are fetched page by page as the table is scrolled (see data_table)
+        model = DatasetTableModel(self.api, self.current_data['id'], page, self.table)
+        model.failed.connect(lambda error: self.statusBar().showMessage(f"Failed to load rows: {error}"))
+        # No sort indicator until a header is clicked
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        previous = self.table.model()
+        self.table.setModel(model)
+        if previous is not None:
+            previous.deleteLater()
+
     def download_pdf(self):
         if not self.current_data:
             return
@@ -590,6 +843,13 @@ class DashboardWindow(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to download PDF: {str(e)}")
 
+    def closeEvent(self, event):
+        self.api.cancel_all()
+        if self.dataset_view is not None:
+            self.pie_chart.close()
+            self.bar_chart.close()
+        super().closeEvent(event)
+
     def logout(self):
         if os.path.exists('token.txt'):
             os.remove('token.txt')
@@ -0,0 +1,218 @@
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+try:
+    import msgpack
+except ImportError:  # Optional: row pages then come as JSON
+    msgpack = None
+
+# Row pages are asked for as MessagePack when it is installed: the columns
+# arrive as typed arrays (see the backend's api.renderers) and decode far
+# faster than JSON row objects
+ROWS_ACCEPT = "application/msgpack, application/json;q=0.9" if msgpack else "application/json"
+
+COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+
+
+def decode_page(response):
+    # A /rows/ page as (count, columns) from either encoding: float64 arrays
+    # (NaN for missing) for the numeric columns, (int32 codes, categories)
+    # for Type (-1 for missing) and an object array for Equipment Name
+    if response.headers.get('Content-Type', '').startswith('application/msgpack'):
+        body = msgpack.unpackb(response.content)
+        columns = {}
+        for name, values in body['rows']['columns'].items():
+            if name == 'Type':
+                columns[name] = (np.frombuffer(values['codes'], '<i4'), values['categories'])
+            elif isinstance(values, bytes):
+                columns[name] = np.frombuffer(values, '<f8')
+            else:
+                columns[name] = np.array(values, dtype=object)
+        return body['count'], columns
+
+    body = response.json()
+    rows = body['rows']
+    columns = {}
+    for name in body['columns']:
+        values = [row[name] for row in rows]
+        if name == 'Type':
+            categories = sorted({v for v in values if v is not None})
+            position = {c: i for i, c in enumerate(categories)}
+            columns[name] = (np.array([position.get(v, -1) for v in values], dtype=np.int32), categories)
+        elif name == 'Equipment Name':
+            columns[name] = np.array(['' if v is None else v for v in values], dtype=object)
+        else:
+            columns[name] = np.array(values, dtype=np.float64)  # None -> NaN
+    return body['count'], columns
+
+
+def concat_pages(pages):
+    # Consecutive pages as one, Type codes remapped to a common category list
+    columns = {}
+    for name in pages[0][1]:
+        if name == 'Type':
+            position = {}
+            parts = []
+            for _, page in pages:
+                codes, categories = page[name]
+                lookup = np.array([position.setdefault(c, len(position)) for c in categories] + [-1], dtype=np.int32)
+                parts.append(lookup[codes])
+            columns[name] = (np.concatenate(parts), list(position))
+        else:
+            columns[name] = np.concatenate([page[name] for _, page in pages])
+    return pages[-1][0], columns
+
+
+class DatasetTableModel(QAbstractTableModel):
+    # The rows of a dataset for a QTableView. Pages are fetched from /rows/ in
+    # the background as the view scrolls to the end (canFetchMore/fetchMore)
+    # and appended to one NumPy array per column, so cells are only turned
+    # into text when painted. Sorting happens here once every row is loaded;
+    # before that the server sorts and the rows are fetched again in order.
+    PAGE_SIZE = 1000
+
+    failed = pyqtSignal(str)
+
+    def __init__(self, api, dataset_id, first_page=None, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.rows_url = api.url(f"/datasets/{dataset_id}/rows/")
+        self.count = 0  # Rows on the server
+        self._loaded = 0
+        self._columns = {}
+        self._categories = []
+        self._category_codes = {}
+        self._sort = None  # Server-side order, as the ?sort= parameter
+        self._order = None  # Local order: row positions in display order
+        self._fetching = False
+        self._error = None
+        self._generation = 0
+        if first_page is not None:
+            self._append(*first_page)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row() if self._order is None else self._order[index.row()]
+        name = COLUMNS[index.column()]
+        value = self._columns[name][row]
+        if name == 'Type':
+            return self._categories[value] if value >= 0 else ''
+        if name == 'Equipment Name':
+            return value
+        return '' if value != value else str(value)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return (not parent.isValid() and self._loaded < self.count
+                and not self._fetching and self._error is None)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._fetching = True
+        params = {"offset": self._loaded, "limit": self.PAGE_SIZE}
+        if self._sort:
+            params["sort"] = self._sort
+        url, generation = self.rows_url, self._generation
+
+        def fetch(request):
+            response = request.get(url, headers={"Accept": ROWS_ACCEPT}, params=params)
+            response.raise_for_status()
+            return decode_page(response)
+
+        # One table is shown at a time: a new one cancels the old one's fetch
+        self.api.submit(fetch, lambda page: self._on_page(page, generation), self._on_failed, channel="rows")
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Column -1: back to the order of the file
+        name = COLUMNS[column] if column >= 0 else None
+        descending = order == Qt.DescendingOrder
+        if name is None and self._sort is None and self._order is None:
+            return
+        self.beginResetModel()
+        if self._loaded == self.count and (name is not None or self._sort is None):
+            self._order = None if name is None else np.argsort(self._sort_keys(name, descending), kind='stable')
+        else:
+            self._generation += 1
+            self._sort = name and (f"-{name}" if descending else name)
+            self._order = None
+            self._loaded = 0
+            self._columns = {}
+            self._fetching = False
+            self._error = None
+        self.endResetModel()
+        self.fetchMore()
+
+    def _sort_keys(self, name, descending):
+        # As the server's api.storage.sort_keys: missing values last either way
+        n = self._loaded
+        values = self._columns[name][:n]
+        if name == 'Type':
+            ranks = np.argsort(np.argsort(np.array(self._categories, dtype=object)))
+            keys = np.append(ranks, np.nan).astype(np.float64)[values]
+        elif name == 'Equipment Name':
+            keys = np.unique(values, return_inverse=True)[1].astype(np.float64)
+        else:
+            keys = values
+        return -keys if descending else keys
+
+    def _on_page(self, page, generation):
+        if generation != self._generation:
+            return
+        self._fetching = False
+        count, columns = page
+        rows = len(columns['Equipment Name'])
+        if rows == 0:
+            # Rows were deleted since the count was taken
+            self.count = self._loaded
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + rows - 1)
+        self._append(count, columns)
+        self.endInsertRows()
+
+    def _on_failed(self, error):
+        # Not retried on the next scroll; a new model (reload) starts over
+        self._fetching = False
+        self._error = error
+        self.failed.emit(error)
+
+    def _append(self, count, columns):
+        self.count = count
+        start = self._loaded
+        stop = start + len(columns['Equipment Name'])
+        for name in COLUMNS:
+            values = columns[name]
+            if name == 'Type':
+                codes, categories = values
+                # Page codes -> this model's codes (-1 stays -1)
+                lookup = np.array([self._category(c) for c in categories] + [-1], dtype=np.int32)
+                values = lookup[codes]
+            array = self._columns.get(name)
+            if array is None or len(array) < stop:
+                # Grow geometrically, but never past the dataset's size
+                grown = np.empty(max(stop, min(2 * start, count)), dtype=values.dtype)
+                if array is not None:
+                    grown[:start] = array[:start]
+                self._columns[name] = array = grown
+            array[start:stop] = values
+        self._loaded = stop
+
+    def _category(self, category):
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._categories)
+            self._categories.append(category)
+        return code
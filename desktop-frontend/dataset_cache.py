@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+class DatasetCache:
+    # Datasets viewed before, kept on disk so reopening one costs no download
+    # (and works offline). One compressed .npz file per dataset holds its
+    # columns as NumPy arrays plus the detail JSON and the ETag it was served
+    # with, which is sent back as If-None-Match to check it is still current.
+    # Least recently used files are evicted past `max_bytes`.
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, dataset_id):
+        return os.path.join(self.root, f"{dataset_id}.npz")
+
+    def get(self, dataset_id):
+        # (detail, etag, (count, columns)) as stored, or None
+        path = self.path(dataset_id)
+        try:
+            with np.load(path) as stored:
+                meta = json.loads(str(stored['meta']))
+                columns = {}
+                for name in meta['columns']:
+                    if name == 'Type':
+                        columns[name] = (stored['Type'], stored['Type categories'].tolist())
+                    elif name == 'Equipment Name':
+                        columns[name] = stored[name].astype(object)
+                    else:
+                        columns[name] = stored[name]
+            os.utime(path)  # Most recently used
+        except (OSError, ValueError, KeyError):
+            # Missing, or left unreadable by a crash: fetched again
+            return None
+        return meta['detail'], meta['etag'], (meta['count'], columns)
+
+    def put(self, dataset_id, detail, etag, page):
+        count, columns = page
+        arrays = {'meta': np.array(json.dumps({
+            'detail': detail, 'etag': etag, 'count': count, 'columns': list(columns),
+        }))}
+        for name, values in columns.items():
+            if name == 'Type':
+                codes, categories = values
+                arrays['Type'] = codes
+                arrays['Type categories'] = np.array(categories, dtype=str)
+            elif name == 'Equipment Name':
+                # Fixed-width text: no pickled objects in the file
+                arrays[name] = np.array(values, dtype=str)
+            else:
+                arrays[name] = values
+        # Written aside and moved into place, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, self.path(dataset_id))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def remove(self, dataset_id):
+        try:
+            os.unlink(self.path(dataset_id))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        # Details of the cached datasets, most recently used first
+        found = []
+        for name in os.listdir(self.root):
+            if name.endswith('.npz'):
+                path = os.path.join(self.root, name)
+                try:
+                    with np.load(path) as stored:
+                        detail = json.loads(str(stored['meta']))['detail']
+                    found.append((os.stat(path).st_mtime, detail))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return [detail for _, detail in sorted(found, key=lambda entry: entry[0], reverse=True)]
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
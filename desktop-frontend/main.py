@@ -1,27 +1,41 @@
+import time
+START = time.perf_counter()
+
 import sys
 import os
 from PyQt5.QtWidgets import QApplication
-from auth_window import AuthWindow
 
 def main():
     app = QApplication(sys.argv)
 
+    # CHEMEQUIP_STARTUP_TIMING=1: report the time to the first paint and quit
+    # (see startup_timing.py)
+    timer = None
+    if os.environ.get('CHEMEQUIP_STARTUP_TIMING'):
+        from startup_timing import StartupTimer
+        timer = StartupTimer(app, START)
+
     # Check for token (similar to localStorage)
     token = None
     if os.path.exists('token.txt'):
         with open('token.txt', 'r') as f:
             token = f.read().strip()
 
+    # Only the window shown is imported; the dashboard loads matplotlib
+    # when it first draws a chart
     if token:
         # If token exists, go directly to dashboard
         from dashboard_window import DashboardWindow
         window = DashboardWindow(token)
     else:
         # Show auth window
+        from auth_window import AuthWindow
         window = AuthWindow()
 
+    if timer:
+        timer.mark("window created")
     window.show()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,103 @@
+"""Time from launching the desktop app to the first paint of its window.
+
+    python startup_timing.py                  # login window
+    python startup_timing.py --token TOKEN    # dashboard, as with a saved token.txt
+    python startup_timing.py --runs 10
+
+Each run starts `python main.py` in a new process with
+CHEMEQUIP_STARTUP_TIMING=1, which makes the app print its startup marks
+(seconds since main.py started running) and quit once its window has painted.
+Reported are the wall time from spawning the process to the first paint
+(interpreter start included) and the median of each mark over the runs. The
+first run also pays for cold disk caches; compare medians. Set
+QT_QPA_PLATFORM=offscreen to run without a display, and see where import time
+goes with `python -X importtime main.py`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+# Modules worth knowing whether startup loaded
+WATCHED_MODULES = ['matplotlib', 'numpy', 'requests', 'msgpack']
+
+
+class StartupTimer(QObject):
+    # Installed by main.py: prints "mark<TAB>name<TAB>seconds" lines and quits
+    # the app after the first paint of a window
+    def __init__(self, app, start):
+        super().__init__(app)
+        self.app = app
+        self.start = start
+        self.mark("application created")
+        app.installEventFilter(self)
+
+    def mark(self, name):
+        print(f"mark\t{name}\t{time.perf_counter() - self.start:.4f}", flush=True)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj.isWidgetType() and obj.isWindow():
+            self.app.removeEventFilter(self)
+            # Once this paint has been handled
+            QTimer.singleShot(0, self.painted)
+        return False
+
+    def painted(self):
+        self.mark("first paint")
+        loaded = [name for name in WATCHED_MODULES if name in sys.modules]
+        print(f"loaded\t{','.join(loaded)}", flush=True)
+        self.app.quit()
+
+
+def run_once(token):
+    with tempfile.TemporaryDirectory() as cwd:
+        if token:
+            with open(os.path.join(cwd, 'token.txt'), 'w') as f:
+                f.write(token)
+        env = {**os.environ, 'CHEMEQUIP_STARTUP_TIMING': '1'}
+        marks, loaded, wall = {}, '', None
+        start = time.perf_counter()
+        with subprocess.Popen([sys.executable, MAIN], cwd=cwd, env=env,
+                              stdout=subprocess.PIPE, text=True) as process:
+            for line in process.stdout:
+                fields = line.rstrip('\n').split('\t')
+                if fields[0] == 'mark':
+                    marks[fields[1]] = float(fields[2])
+                    if fields[1] == 'first paint':
+                        wall = time.perf_counter() - start
+                elif fields[0] == 'loaded':
+                    loaded = fields[1]
+        if wall is None:
+            sys.exit(f"main.py exited ({process.returncode}) before painting a window")
+        return wall, marks, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--token', help="start on the dashboard with this API token")
+    args = parser.parse_args()
+
+    walls, marks, loaded = [], {}, ''
+    for _ in range(args.runs):
+        wall, run_marks, loaded = run_once(args.token)
+        walls.append(wall)
+        for name, seconds in run_marks.items():
+            marks.setdefault(name, []).append(seconds)
+
+    window = 'dashboard' if args.token else 'login window'
+    print(f"{window}, {args.runs} runs (median / min, ms)")
+    print(f"  {'launch -> first paint':<32}{statistics.median(walls) * 1000:8.0f} {min(walls) * 1000:8.0f}")
+    for name, values in marks.items():
+        print(f"  {'main.py -> ' + name:<32}{statistics.median(values) * 1000:8.0f} {min(values) * 1000:8.0f}")
+    print(f"  loaded at first paint: {loaded or '-'}")
+
+
+if __name__ == '__main__':
+    main()
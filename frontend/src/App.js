@@ -11,12 +11,19 @@ import { Input } from './components/ui/input';
 import { Label } from './components/ui/label';
 import { toast } from 'sonner';
 import ExcelUpload from './components/ExcelUpload';
+import { getRows } from './lib/rows';
 
 ChartJS.register(ArcElement, CategoryScale, LinearScale, BarElement, LineElement, PointElement, Title, Tooltip, Legend);
 
 // Using environment variable for API base URL
 const API = process.env.REACT_APP_BACKEND_URL || "/api";
 
+// Summary statistics are null for a column without any numeric value
+const formatValue = (value) => (value == null ? 'N/A' : value.toFixed(2));
+
+// How long an upload is polled for before the dashboard stops waiting on it
+const JOB_TIMEOUT_MS = 10 * 60 * 1000;
+
 function AuthPage() {
   const [isLogin, setIsLogin] = useState(true);
   const [formData, setFormData] = useState({ username: '', email: '', password: '' });
@@ -232,26 +239,65 @@ function Dashboard() {
   const fetchHistory = async () => {
     const token = localStorage.getItem('token');
     try {
+      // The list only needs names and dates; unchanged history revalidates with a 304
       const response = await axios.get(`${API}/history/`, {
-        headers: { "Authorization": `Bearer ${token}` }
+        headers: { "Authorization": `Bearer ${token}` },
+        params: { summary: false },
       });
       setDatasets(response.data);
     } catch (error) {
+      if (error.response?.status === 401) {
+        // Token expired or invalid: sign in again
+        localStorage.removeItem('token');
+        navigate('/');
+        return;
+      }
       console.error("Error fetching history:", error);
     }
   };
 
   const loadDataset = async (datasetId) => {
     const token = localStorage.getItem('token');
+    const headers = { "Authorization": `Bearer ${token}` };
     try {
-      const response = await axios.get(`${API}/datasets/${datasetId}/`, {
-        headers: { "Authorization": `Bearer ${token}` }
-      });
-      setCurrentData(response.data);
+      // Summary without rows, plus only the page of rows the table shows
+      const [detail, rows, aggregates] = await Promise.all([
+        axios.get(`${API}/datasets/${datasetId}/`, { headers, params: { data: false } }),
+        getRows(`${API}/datasets/${datasetId}/rows/`, { headers, params: { limit: 100 } }),
+        // Histogram binned on the server over every row
+        axios.get(`${API}/datasets/${datasetId}/aggregate/`, { headers, params: { histogram: "Flowrate", bins: 20 } }),
+      ]);
+      setCurrentData({ ...detail.data, data: rows.rows, aggregates: aggregates.data });
     } catch (error) {
       toast.error("Error loading dataset");
     }
   };
+  const waitForJob = async (statusUrl, token) => {
+    const headers = { "Authorization": `Bearer ${token}` };
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const { data: job } = await axios.get(statusUrl, { headers });
+      if (job.status === "succeeded" || job.status === "failed") {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 500));
+    }
+    // Still queued or running: it shows up in the history if it finishes later
+    return { status: "failed", error: "The file is taking too long to process; check the history later" };
+  };
+
+  // Plain CSV compresses 8-10x; send it gzipped when the browser can
+  const compressForUpload = async (selected) => {
+    const isCsv = selected.name.toLowerCase().endsWith('.csv');
+    if (!isCsv || typeof CompressionStream === 'undefined' || selected.size < 1024 * 1024) {
+      return selected;
+    }
+    const gzipped = await new Response(
+      selected.stream().pipeThrough(new CompressionStream('gzip'))
+    ).blob();
+    return new File([gzipped], `${selected.name}.gz`, { type: 'application/gzip' });
+  };
+
   const handleUpload = async () => {
     if (!file) {
       toast.error("Please select a file");
@@ -259,24 +305,24 @@ function Dashboard() {
     }
 
     setLoading(true);
-    const formData = new FormData();
-    formData.append("file", file);
-
     const token = localStorage.getItem('token');
-    formData.append("token", token);
 
     try {
+      const formData = new FormData();
+      formData.append("file", await compressForUpload(file));
+      formData.append("token", token);
+
       const response = await axios.post(`${API}/upload/`, formData, {
         headers: { "Content-Type": "multipart/form-data" },
       });
+      // The file is processed in the background; poll the job until it is done
+      const job = await waitForJob(response.data.status_url, token);
+      if (job.status === "failed") {
+        toast.error(job.error || "Upload failed");
+        return;
+      }
       toast.success("File uploaded successfully!");
-      setCurrentData({
-        id: response.data.dataset_id,
-        filename: file.name,
-        summary: response.data.summary,
-        data: response.data.data,
-        uploaded_at: new Date().toISOString(),
-      });
+      await loadDataset(job.dataset_id);
 
       setFile(null);
       fetchHistory();
@@ -363,6 +409,22 @@ function Dashboard() {
       }
     : null;
 
+  const flowrateHistogram = currentData?.aggregates?.histograms?.Flowrate;
+  const flowrateHistData = flowrateHistogram
+    ? {
+        labels: flowrateHistogram.counts.map((_, i) => flowrateHistogram.edges[i].toFixed(1)),
+        datasets: [
+          {
+            label: "Equipment Count",
+            data: flowrateHistogram.counts,
+            backgroundColor: "rgba(67, 147, 195, 0.7)",
+            borderColor: "rgba(67, 147, 195, 1)",
+            borderWidth: 1,
+          },
+        ],
+      }
+    : null;
+
   return (
     <div className="dashboard">
       <nav className="navbar">
@@ -478,7 +540,7 @@ function Dashboard() {
                   </CardHeader>
                   <CardContent>
                     <div className="stat-value">
-                      {currentData.summary.avg_flowrate.toFixed(2)}
+                      {formatValue(currentData.summary.avg_flowrate)}
                     </div>
                   </CardContent>
                 </Card>
@@ -492,7 +554,7 @@ function Dashboard() {
                   </CardHeader>
                   <CardContent>
                     <div className="stat-value">
-                      {currentData.summary.avg_pressure.toFixed(2)}
+                      {formatValue(currentData.summary.avg_pressure)}
                     </div>
                   </CardContent>
                 </Card>
@@ -506,7 +568,7 @@ function Dashboard() {
                   </CardHeader>
                   <CardContent>
                     <div className="stat-value">
-                      {currentData.summary.avg_temperature.toFixed(2)}
+                      {formatValue(currentData.summary.avg_temperature)}
                     </div>
                   </CardContent>
                 </Card>
@@ -542,6 +604,21 @@ function Dashboard() {
                     )}
                   </CardContent>
                 </Card>
+
+                {flowrateHistData && (
+                  <Card className="chart-card">
+                    <CardHeader>
+                      <CardTitle>Flowrate Distribution</CardTitle>
+                      <CardDescription>Equipment count per flowrate range, across all rows</CardDescription>
+                    </CardHeader>
+                    <CardContent>
+                      <Bar
+                        data={flowrateHistData}
+                        options={{ maintainAspectRatio: true, aspectRatio: 2 }}
+                      />
+                    </CardContent>
+                  </Card>
+                )}
               </div>
 
               <Card className="data-table-card">
@@ -0,0 +1,41 @@
+import axios from 'axios';
+import { decode } from '@msgpack/msgpack';
+
+// Row pages are requested as MessagePack, where each column arrives as one
+// typed array (see the backend's api.renderers), and turned into the row
+// objects the tables use. Servers without msgpack answer JSON as before.
+const ACCEPT = 'application/msgpack, application/json;q=0.9';
+
+const floats = (bytes) => new Float64Array(bytes.slice().buffer); // slice: typed arrays need aligned offsets
+
+const columnValues = (name, values) => {
+  if (name === 'Type') {
+    const codes = new Int32Array(values.codes.slice().buffer);
+    return Array.from(codes, (code) => (code < 0 ? null : values.categories[code]));
+  }
+  if (values instanceof Uint8Array) {
+    return Array.from(floats(values), (v) => (Number.isNaN(v) ? null : v));
+  }
+  return values;
+};
+
+export const blockToRows = (block) => {
+  const names = Object.keys(block.columns);
+  const columns = names.map((name) => columnValues(name, block.columns[name]));
+  return Array.from({ length: block.length }, (_, i) =>
+    Object.fromEntries(names.map((name, c) => [name, columns[c][i]]))
+  );
+};
+
+export const getRows = async (url, config = {}) => {
+  const response = await axios.get(url, {
+    ...config,
+    headers: { ...config.headers, Accept: ACCEPT },
+    responseType: 'arraybuffer',
+  });
+  if ((response.headers['content-type'] || '').startsWith('application/msgpack')) {
+    const data = decode(new Uint8Array(response.data));
+    return { ...data, rows: blockToRows(data.rows) };
+  }
+  return JSON.parse(new TextDecoder().decode(response.data));
+};